@@ -14,8 +14,31 @@
 #         6. 可設定Debug模式下,離線以模擬數據操作
 #Rev 2025/9/2 : 1.新增計算on/off比例的門檻設定
 #Rev 2025/10/1: 變更2027能耗公式,型式以有效內容積判定
+#Rev 2026/10/19: 1.各工位新增分層彙總(1分/15分/1小時), 長範圍圖表與平均值改用彙總資料
+#                2.plot_data 僅在記憶體保留最近48小時, 較舊資料移至磁碟(memmap)
+#                3.可設定擷取與存檔於獨立行程執行, 以 shared memory 傳遞樣本
+#                4.GX20溫度以不可變快照發佈, 每筆記錄附上使用的快照序號(GX20Seq)
+#                5.收集中寫入測試日誌, 程式異常結束後可接續同一個測試
+#                6.選用 SQLite 資料庫 (WAL) 批次儲存測試資料與機種資料, 供跨測試查詢
+#                7.背景建立 CSV 記錄目錄與稀疏時間索引 (_catalog.json), 讀取區間時直接 seek
+#                8.REPORT 統計改為分段累計, 可直接對超過記憶體大小的 CSV 檔計算
+#                9.EnergyCalculator 新增陣列版 calculate_array, 供大量容積/耗電量組合掃描
+#               10.PLOT 頁面新增即時能效: WP 滾動斜率推算日耗電量, EF 值與 2018/2027 等級
+#               11.REPORT 頁面新增最佳區間: 掃描所有候選區間, 列出符合溫度條件的區間
+#               12.各工位溫度穩定判定, 圖表以底色標示穩定區段, REPORT 顯示穩定狀態
+#               13.REPORT 可偵測除霜/開門事件, 另列事件表或排除事件期間後計算
+#               14.REPORT 新增周期統計: 各頻道依壓縮機 On/Off 狀態與逐周期的平均/最小/最大/標準差
+#               15.新增 GX20/PW3335 本機模擬器 (device_emulator.py), Emulator_mode 時連線模擬器; PW3335 斷線後自動重連
+#               16.參數頁面新增重播: 已記錄的 CSV 以 GX20/PW3335 相同介面送入收集流程, 可選實際時間/N倍速/最快, 結束時顯示處理量與最大可持續倍速
+#               17.新增執行指標 (metrics.py): 裝置來回時間, 解析/存檔/圖表時間, 延遲取樣, 重新連線與佇列深度,
+#                  裝置連續失敗時以斷路器暫停連線; 新增狀態頁面與本機端點 http://127.0.0.1:9108/metrics
+#               18.LOG 改為佇列式非阻塞記錄 (log_service.py): 檔案輪替, 重複錯誤限制頻率, 附加工位/裝置/耗時欄位
+#               19.狀態頁面新增效能分析: 取樣所有執行緒 N 秒輸出 flame graph 用的 collapsed stack 檔 (也可用 SIGUSR1/Ctrl+Break 切換),
+#                  熱點函式計時 (hot_path_seconds), tracemalloc 與各工位資料結構的記憶體用量
+#               20.新增 Tk 主迴圈停頓監視 (stall_monitor.py): 記錄主迴圈延遲分佈, 停頓超過門檻時擷取主執行緒堆疊, 顯示於狀態頁面並寫入 LOG
+#               21.暫停時的拖曳垂直線改為 blit 只重繪該線, 移動事件合併為約 60 fps, 游標停住後才更新溫度顯示
+#               22.即時溫度與頻道別名標籤只在文字改變且頁面顯示中時更新, 每次輪詢由主執行緒一次套用
 #-------------------------------------------------------------------------------
-import socket
 import time
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox  # 修正：添加 messagebox 的導入
@@ -25,6 +48,7 @@ import pandas as pd  # 修正：添加 pandas 的導入
 import numpy as np
 import threading
 import os,sys
+import signal
 import matplotlib
 import matplotlib.pyplot as plt
 from matplotlib import rcParams
@@ -35,438 +59,71 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.backends._backend_tk import NavigationToolbar2Tk
 import tkinter.font as tkfont
 import matplotlib.dates as mdates
-import tempfile
+import multiprocessing
+from acquisition_worker import AcquisitionClient, csv_writer_active, record_to_row
+from csv_catalog import CatalogIndexer
+from devices import GX20, BreakerOpenError, GX20Snapshot, LOG_PATH, PW3335, STATIONS, log_error, log_info, simulate_gx20_data
+from energy_calculator import EnergyCalculator
+from metrics import REGISTRY, MetricsServer, format_status, timed
+from profiler import MemoryTracker, SamplingProfiler, profile_path
+from report_engine import (RollingSlope, format_phase_statistics, format_report, live_efficiency, report_from_arrays,
+                           report_from_csv, sweep_windows)
+from stall_monitor import TkStallMonitor
+from replay_source import REPLAY_SPEEDS, ReplaySource, format_replay_stats
+from run_database import RunDatabase
+from signal_analysis import SteadyStateDetector, detect_events, phase_statistics, summary_excluding
+from session_journal import SessionJournal, find_interrupted, samples_to_arrays
+from station_store import (StationRollup, StationHistory, ROLLUP_TIERS, HOT_WINDOW_SECONDS, POWER_COLUMN, WP_COLUMN,
+                           rows_between, arrays_between, count_between)
 
 # Set matplotlib default font to Microsoft JhengHei for CJK support
 plt.rcParams['font.family'] = 'Microsoft JhengHei'
 matplotlib.rcParams['axes.unicode_minus'] = False
 
 Debug_mode = False  # 設定為 True 以啟用除錯模式
-
-# 確保 LOG 檔案儲存到執行檔所在目錄或臨時目錄
-if getattr(sys, 'frozen', False):  # 如果是 pyinstaller 打包的執行檔
-    APP_DIR = os.path.dirname(sys.executable)
-else:
-    APP_DIR = os.path.dirname(os.path.abspath(__file__))
-
-LOG_PATH = os.path.join(APP_DIR, "Gx20_Pw3335.log")
-
-# 如果無法寫入執行檔目錄，則使用臨時目錄
-if not os.access(APP_DIR, os.W_OK):
-    LOG_PATH = os.path.join(tempfile.gettempdir(), "Gx20_Pw3335.log")
-
-def log_to_file(message): 
-    """將訊息寫入 LOG 檔案"""
-    try:
-        with open(LOG_PATH, "a", encoding="utf-8") as f:
-            f.write(message + "\n")
-    except Exception as e:
-        print(f"無法寫入 LOG 檔案: {e}")
-
-def log_error(message):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    msg = f"[ERROR] {timestamp} - {message}"
-    print(msg)
-    log_to_file(msg)
-
-def log_info(message):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    msg = f"[INFO] {timestamp} - {message}"
-    print(msg)
-    log_to_file(msg)
-
-class GX20:
-    def __init__(self, host="192.168.1.1", port=34434):
-        self.gsRemoteHost = host
-        self.gnRemotePort = port
-        # 新增：儲存各工位的頻道對應
-        #channel_number = {station_name: {}}
-        self.channel_number = {
-            "工位1": ["0001","0002","0003","0004","0005","0006","0007","0008","0009","0010","0101","0102","0103","0104","0105","0106","0107","0108","0109","0110"],
-            "工位2": ["0201","0202","0203","0204","0205","0206","0207","0208","0209","0210","0301","0302","0303","0304","0305","0306","0307","0308","0309","0310"],
-            "工位3": ["0401","0402","0403","0404","0405","0406","0407","0408","0409","0410","1001","1002","1003","1004","1005","1006","1007","1008","1009","1010"],
-            "工位4": ["0701","0702","0703","0704","0705","0706","0707","0708","0709","0710","0801","0802","0803","0804","0805","0806","0807","0808","0809","0810"],
-            "工位5": ["0501","0502","0503","0504","0505","0506","0507","0508","0509","0510","0601","0602","0603","0604","0605","0606","0607","0608","0609","0610"],
-            "工位6": ["1101","1102","1103","1104","1105","1106","1107","1108","1109","1110","1201","1202","1203","1204","1205","1206","1207","1208","1209","1210"]
-        }
-        self.channels_temp = {
-            "工位1": [0.0] * 20,
-            "工位2": [0.0] * 20,
-            "工位3": [0.0] * 20,
-            "工位4": [0.0] * 20,
-            "工位5": [0.0] * 20,
-            "工位6": [0.0] * 20
-        }
-
-    def parse_scientific_notation(self, value_str):
-        """解析科學記號格式的數值，非數字或大於999時回傳 None"""
-        try:
-            if 'E' in value_str:
-                base, exp = value_str.split('E')
-                value = float(base) * (10 ** int(exp))
-                    # 檢查值是否大於 999
-                    # 25/07/02 檢查是否小於 -40
-                return None if (value > 999 or value < -40) else value
-            
-        except (ValueError, TypeError):
-            return None
-
-    def parse_channel_data(self, line):
-        """解析頻道數據
-        格式: 31字元
-        - 第1字元: 資料狀態 (N/B)
-        - 第3-6字元: 頻道號碼
-        - 第11-18字元: 單位
-        - 第19字元: 正負號
-        - 第20-31字元: 科學符號數值
-        """
-        if len(line) != 31:
-            return None
-            
-        data_type = line[0]  # 資料狀態
-        channel = line[2:6]  # 頻道號碼
-        unit = line[10:18].strip()  # 單位
-        sign = line[18]  # 正負號
-        value_str = sign + line[19:31]  # 科學符號數值
-        
-        return {
-            "type": data_type,
-            "channel": channel,
-            "unit": unit,
-            "value_str": value_str
-        }
-
-    def GX20GetData(self):
-        try:
-            # 建立 TCP 連線
-            with socket.create_connection((self.gsRemoteHost, self.gnRemotePort), timeout=3) as s:
-                # 送出指令
-                s.sendall(b"FData,0,0001,1210\r\n")
-                # 暫停0.5秒
-                time.sleep(0.5)
-                # 接收資料
-                data = s.recv(10240).decode("ascii", errors="ignore")
-                #print("Raw data:", repr(data))
-                
-                # 將資料放入channel_temp
-                for line in data.splitlines():
-                    parsed_data = self.parse_channel_data(line)
-                    if parsed_data:
-                        channel = parsed_data["channel"]
-                        value_str = parsed_data["value_str"]
-                        value = self.parse_scientific_notation(value_str)
-                        if value is not None:
-                            # 將值存入 channel_temp
-                            for station_name, channels in self.channel_number.items():
-                                if channel in channels:
-                                    index = channels.index(channel)
-                                    self.channels_temp[station_name][index] = round(value, 1)
-                                    break
-                        else:
-                            # 如果值無效，則將對應的 channel_temp 設為 None
-                            for station_name, channels in self.channel_number.items():
-                                if channel in channels:
-                                    index = channels.index(channel)
-                                    self.channels_temp[station_name][index] = 999.9
-                                    break
-                #print(f"GX20 channels_temp: {self.channels_temp['工位1']}")
-        except Exception as e:
-            print(f"GX20 connection error: {e}")
-            log_error(f"GX20 connection error: {e}")
-            self.valid_data = {}
-            return None
-
-        return self.channels_temp
-
-    def decode_temperature(self, channels: list[str]) -> list[float]:
-        """
-        根據 self.valid_data 取出指定 channels 的溫度值，沒有資料則回傳 None。
-        """
-        return [
-            self.valid_data.get(ch, {}).get("value", None)
-            for ch in channels
-        ]
-
-    def parse_channels_number(self, station_name, checkbox_index):
-        #從 channel_number 找出 station_name 對應的號碼字串
-        return self.channel_number[station_name][checkbox_index]
-    
-class PW3335:
-    def __init__(self, ip_address, port=3300):
-        self.ip_address = ip_address
-        self.port = port
-        self.sock = None
-
-    def connect(self):
-        """Establish a TCP connection to the power meter."""
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.connect((self.ip_address, self.port))
-
-    def disconnect(self):
-        """Close the TCP connection."""
-        if self.sock:
-            self.sock.close()
-            self.sock = None
-
-    def parse_measurement(self, value_str):
-        """Parse a measurement string and return its numeric value."""
-        return float(value_str.split()[1])
-
-    def query_data(self):
-        """Query voltage, current, power, and accumulated power."""
-        if not self.sock:
-            raise ConnectionError("Socket is not connected to the power meter.")
-        self.sock.sendall(b':MEAS? U,I,P,WH\n')
-        response = self.sock.recv(1024).decode('ascii').strip()
-        try:
-            # Parse the response format: "U +110.14E+0;I +0.0000E+0;P +000.00E+0;WP +00.0000E+0"
-            data = response.split(';')
-            if len(data) == 4:
-                parsed_data = [float(item.split(' ')[-1].replace('E+0', '')) for item in data]
-                return parsed_data
-            else:
-                raise ValueError(f"Unexpected response format: {response}")
-        except Exception as e:
-            print(f"Error parsing response: {response}, Exception: {e}")
-            raise ValueError(f"Failed to parse response: {response}")
-
-class EnergyCalculator:
-    def __init__(self):
-        pass
-    def current_ef_thresholds(self,energy_allowance,fridge_type):
-        if fridge_type == 5:
-            #IF(fridge_type=5,ROUND(N4*1.72,1),ROUND(N4*1.6,1))
-            threshold_lv1 = round(energy_allowance * 1.72,1)
-            threshold_lv2 = round(energy_allowance * 1.54,1)
-            threshold_lv3 = round(energy_allowance * 1.36,1)
-            threshold_lv4 = round(energy_allowance * 1.18,1)
-        else:
-            #IF(fridge_type=5,ROUND(N4*1.72,1),ROUND(N4*1.6,1))
-            threshold_lv1 = round(energy_allowance * 1.6,1)
-            threshold_lv2 = round(energy_allowance * 1.45,1)
-            threshold_lv3 = round(energy_allowance * 1.3,1)
-            threshold_lv4 = round(energy_allowance * 1.15,1)
-        return[ threshold_lv1, threshold_lv2, threshold_lv3, threshold_lv4 ]
-
-    def future_ef_thresholds(self,energy_allowance,fridge_type):
-        if fridge_type == 5:
-            #IF(fridge_type=5,ROUND(N4*1.72,1),ROUND(N4*1.6,1))
-            threshold_lv1 = round(energy_allowance * 1.294,1)
-            threshold_lv2 = round(energy_allowance * 1.221,1)
-            threshold_lv3 = round(energy_allowance * 1.147,1)
-            threshold_lv4 = round(energy_allowance * 1.074,1)
-        else:
-            #IF(fridge_type=5,ROUND(N4*1.72,1),ROUND(N4*1.6,1))
-            threshold_lv1 = round(energy_allowance * 1.308,1)
-            threshold_lv2 = round(energy_allowance * 1.231,1)
-            threshold_lv3 = round(energy_allowance * 1.154,1)
-            threshold_lv4 = round(energy_allowance * 1.077,1)
-        return[ threshold_lv1, threshold_lv2, threshold_lv3, threshold_lv4 ]
-
-
-    def calculate(self, VF, VR, daily_consumption, freezer_temp, fridge_temp, fan_type):
-        """
-        計算冰箱能耗相關指標
-        
-        參數:
-            VR: 冷藏室容積(L)
-            VF: 冷凍室容積(L)
-            daily_consumption: 日耗電量(kWh/日)
-            fridge_temp: 冷藏室溫度(°C), 預設3.0
-            freezer_temp: 冷凍室溫度(°C), 預設-18.0
-        
-        返回:
-            包含所有計算結果的字典
-        """
-        results = {}
-        
-        # 1. 計算K值 (溫度係數)
-        #print(f"冷凍室溫度: {freezer_temp}, 冷藏室溫度: {fridge_temp}")
-        K = self.calculate_K_value(freezer_temp, fridge_temp)
-        #print(f"K值: {K}")
-        # 2. 計算等效內容積
-        # 25/10/01 新增有效內容積 = VR + VF
-        equivalent_volume = self.calculate_equivalent_volume(VR, VF, K)
-        effective_volume = VR + VF
-        
-        # 3. 確定冰箱型式
-        # 25/10/01 2027新能耗改用有效內容積來判斷冰箱型式
-        fridge_type_equivalent = self.determine_fridge_type(equivalent_volume, VR, VF, fan_type)
-        fridge_type_effective = self.determine_fridge_type(effective_volume, VR, VF, fan_type)
-        #print(f"冰箱型式: {fridge_type}")
-
-        # 4. 計算容許耗用能源基準 (每月)
-        energy_allowance = self.calculate_energy_allowance(equivalent_volume, fridge_type_equivalent)
-        
-        # 5. 計算2027容許耗用能源基準
-        future_energy_allowance = self.calculate_future_energy_allowance(equivalent_volume, fridge_type_effective)
-        
-        # 6. 計算耗電量基準 (每月)
-        benchmark_consumption = self.calculate_benchmark_consumption(equivalent_volume, energy_allowance)
-        
-        # 7. 計算2027耗電量基準
-        future_benchmark_consumption = self.calculate_future_benchmark_consumption(equivalent_volume, future_energy_allowance)
-        
-        # 8. 計算實測月耗電量
-        monthly_consumption = round(daily_consumption * 30, 1)
-        
-        # 9. 計算EF值 (能效因子)
-        if monthly_consumption == 0:
-            ef_value = 0.0
-        else:
-            ef_value = round(equivalent_volume / monthly_consumption,1)
-        
-        # 9.1 計算現有效率基準百分比和等級
-        current_ef_thresholds = self.current_ef_thresholds(energy_allowance, fridge_type_equivalent)
-
-        # 10. 計算現有效率基準百分比和等級
-        current_percent, current_grade = self.calculate_current_efficiency(ef_value, current_ef_thresholds)
-        
-        # 10.1 計算2027新效率基準百分比和等級
-        future_ef_thresholds = self.future_ef_thresholds(future_energy_allowance, fridge_type_effective)
-
-        # 11. 計算2027新效率基準百分比和等級
-        future_percent, future_grade = self.calculate_future_efficiency(ef_value, future_ef_thresholds)
-        
-        # 整理所有結果
-        results.update({
-            '冷凍室溫度': freezer_temp,
-            '冷藏室溫度': fridge_temp,
-            'K值': K,
-            'VF(L)': VF,
-            'VR(L)': VR,
-            '有效內容積(L)': effective_volume,
-            '等效內容積(L)': equivalent_volume,
-            '冰箱型式(等效內容積)': fridge_type_equivalent,
-            '冰箱型式(有效內容積)': fridge_type_effective,
-            '\n----能效相關計算結果----': '',
-            'EF值': ef_value,
-            '實測月耗電量(kWh/月)': monthly_consumption,
-            '2018年容許耗用能源基準(L/kWh/月)': energy_allowance,
-            '2018年耗電量基準(kWh/月)': benchmark_consumption,
-            '2018年一級效率EF值': current_ef_thresholds[0],
-            '2018年一級效率百分比(%)': current_percent,
-            '2018年效率等級': current_grade,
-
-            '\n----2027年新能效公式----': '',
-            '2027容許耗用能源基準(L/kWh/月)': future_energy_allowance,
-            '2027年耗電量基準(kWh/月)': future_benchmark_consumption,
-            '2027年一級效率EF值': future_ef_thresholds[0],
-            '2027年一級效率百分比(%)': future_percent,
-            '2027年效率等級': future_grade
-
-        })
-        
-        return results
-    
-    def calculate_K_value(self, freezer_temp, fridge_temp):
-        """計算K值 (溫度係數)"""
-        # 根據公式 K = (30 - 冷凍庫溫度) / (30 - 冷藏庫溫度)
-        #print(f"冷凍庫溫度: {freezer_temp}, 冷藏庫溫度: {fridge_temp}")        
-        return round((30 - freezer_temp) / (30 - fridge_temp), 2)
-    
-    def calculate_equivalent_volume(self, VR, VF, K):
-        """計算等效內容積"""
-        return round(VR + (K * VF), 1)
-    
-    def determine_fridge_type(self, volume, VR, VF, fan_type):
-        """確定冰箱型式"""
-        if VF == 0:  # 只有冷藏室
-            return 5
-        elif volume < 400 and fan_type == 1:
-            return 1  # 假設是風冷式(實際應根據具體設計)
-        elif volume >= 400 and fan_type == 1:
-            return 2
-        elif volume < 400 and fan_type == 0:
-            return 3
-        else:
-            return 4  # 假設是風冷式(實際應根據具體設計)
-    
-    def calculate_energy_allowance(self, equivalent_volume, fridge_type):
-        """計算容許耗用能源基準"""
-        # 根據公式，ROUND(IFS(fridge_type=1,equivalent_volume/(0.037*equivalent_volume+24.3),fridge_type=2,equivalent_volume/(0.031*M4+21),fridge_type=3,equivalent_volume/(0.033*equivalent_volume+19.7),fridge_type=4,equivalent_volume/(0.029*equivalent_volume+17),fridge_type=5,equivalent_volume/(0.033*equivalent_volume+15.8)),1)
-        if fridge_type == 1:
-            return round( equivalent_volume / (0.037 * equivalent_volume + 24.3), 1)
-        elif fridge_type == 2:
-            return round( equivalent_volume / (0.031 * equivalent_volume + 21), 1)
-        elif fridge_type == 3:
-            return round( equivalent_volume / (0.033 * equivalent_volume + 19.7), 1)
-        elif fridge_type == 4:
-            return round( equivalent_volume / (0.029 * equivalent_volume + 17), 1)
-        else:
-            return round( equivalent_volume / (0.033 * equivalent_volume + 15.8), 1)
-    
-    def calculate_future_energy_allowance(self, equivalent_volume, fridge_type):
-        """計算2027年容許耗用能源基準"""
-        # 公式:=ROUND(IFS(F4=1,1.3*M4/(0.037*M4+24.3),F4=2,1.3*M4/(0.031*M4+21),F4=3,1.3*M4/(0.033*M4+19.7),F4=4,1.3*M4/(0.029*M4+17),F4=5,1.36*M4/(0.033*M4+15.8)),1)
-        # F4 = fridge_type, M4 = equivalent_volume
-        if fridge_type == 1:
-            return round( 1.3 * equivalent_volume / (0.037 * equivalent_volume + 24.3), 1)
-        elif fridge_type == 2:
-            return round( 1.3 * equivalent_volume / (0.031 * equivalent_volume + 21), 1)
-        elif fridge_type == 3:
-            return round(1.3 * equivalent_volume / (0.033 * equivalent_volume + 19.7), 1)
-        elif fridge_type == 4:
-            return round(1.3 * equivalent_volume / (0.029 * equivalent_volume + 17), 1)
-        else:
-            return round(1.36 * equivalent_volume / (0.033 * equivalent_volume + 15.8), 1)
-
-    def calculate_benchmark_consumption(self, equivalent_volume, energy_allowance):
-        """計算耗電量基準"""
-        # 根據公式:ROUND(equivalent_volume / energy_allowance, 1)
-        return round(equivalent_volume / energy_allowance, 1)
-    
-    def calculate_future_benchmark_consumption(self, equivalent_volume, future_energy_allowance):
-        """計算2027耗電量基準"""
-        return round(equivalent_volume / future_energy_allowance, 1)
-    
-    def calculate_current_efficiency(self, ef_value, thresholds):
-        # 確定等級
-        if ef_value >= thresholds[0]:
-            grade = "1級"
-            final_percent = round(ef_value / thresholds[0] * 100, 1)
-        elif ef_value >= thresholds[0] * 0.95:
-            grade = "1*級"
-            final_percent = round(ef_value / thresholds[0] * 100, 1)
-        elif ef_value >= thresholds[1]:
-            grade = "2級"
-            final_percent = round(ef_value / thresholds[0] * 100, 1)
-        elif ef_value >= thresholds[2]:
-            grade = "3級"
-            final_percent = round(ef_value / thresholds[0] * 100, 1)
-        elif ef_value >= thresholds[3]:
-            grade = "4級"
-            final_percent = round(ef_value / thresholds[0] * 100, 1)
-        else :
-            grade = "5級"
-            final_percent = round(ef_value / thresholds[0] * 100, 1)
-        
-        return final_percent, grade
-    
-    def calculate_future_efficiency(self, ef_value, thresholds):
-        # 確定等級
-        if ef_value >= thresholds[0]:
-            grade = "1級"
-            final_percent = round(ef_value / thresholds[0] * 100, 1)
-        elif ef_value >= thresholds[0] * 0.95:
-            grade = "1*級"
-            final_percent = round(ef_value / thresholds[0] * 100, 1)
-        elif ef_value >= thresholds[1]:
-            grade = "2級"
-            final_percent = round(ef_value / thresholds[0] * 100, 1)
-        elif ef_value >= thresholds[2]:
-            grade = "3級"
-            final_percent = round(ef_value / thresholds[0] * 100, 1)
-        elif ef_value >= thresholds[3]:
-            grade = "4級"
-            final_percent = round(ef_value / thresholds[0] * 100, 1)
-        else :
-            grade = "5級"
-            final_percent = round(ef_value / thresholds[0] * 100, 1)
-        
-        return final_percent, grade
+Acquisition_process_mode = False  # 設定為 True 時, GX20/PW3335 讀取與 CSV 存檔改由獨立行程執行
+Database_mode = False  # 設定為 True 時, 測試資料同時寫入 SQLite 資料庫 (DATABASE_PATH)
+Emulator_mode = False  # 設定為 True 時連線本機的 GX20/PW3335 模擬器 (device_emulator.py), 不需實驗室網路
+GX20_HOST = "127.0.0.1" if Emulator_mode else "192.168.1.1"
+PLOT_MAX_POINTS = 1200  # 圖表每條線最多繪製的點數, 超過時改用較粗的彙總層
+SWEEP_WINDOWS = {"24hrs": (24 * 3600, None), "12hrs": (12 * 3600, None), "6hrs": (6 * 3600, None),
+                 "3 cycles": (None, 3), "5 cycles": (None, 5)}  # 最佳區間的候選長度: (秒數, 周期數)
+STEADY_WINDOW_SECONDS = 3 * 3600  # 溫度穩定判定的時間窗
+STEADY_DRIFT_LIMIT = 0.25  # 時間窗內溫度漂移 (°C/小時) 不超過此值視為穩定
+EVENT_MODES = ("不分析", "分列事件", "排除事件")  # REPORT 的除霜/開門事件處理方式
+METRICS_PORT = 9108  # 本機指標端點 http://127.0.0.1:9108/metrics (/metrics.json), 0 表示不啟用
+STATUS_REFRESH_MS = 2000  # 狀態頁面更新間隔
+CATALOG_JOIN_SECONDS = 5  # 關閉時等待 CSV 目錄索引結束目前檔案的秒數
+ACQUISITION_EVENTS_MS = 1000  # 擷取行程事件 (工位錯誤/結束) 的檢查間隔
+PROFILE_SECONDS = (10, 30, 60, 300)  # 效能分析的取樣時間選項
+PROFILE_POLL_MS = 500  # 檢查效能分析是否完成的間隔
+PROFILE_SIGNAL = getattr(signal, "SIGUSR1", getattr(signal, "SIGBREAK", None))  # 切換效能分析: kill -USR1 <pid> / Ctrl+Break
+STALL_CHECK_MS = 100  # Tk 主迴圈延遲的量測間隔
+STALL_THRESHOLD_SECONDS = 0.5  # 主迴圈停頓超過此秒數時擷取主執行緒堆疊並記錄
+DRAG_FRAME_MS = 16  # 拖曳垂直線時的重繪間隔 (約 60 fps)
+DRAG_REST_MS = 150  # 拖曳中游標停住此毫秒數後才更新對應的溫度顯示
+TICK_LATE_SECONDS = 1.0  # 取樣週期比設定的記錄頻率晚超過此秒數時視為延遲
+LIVE_EF_WINDOWS = {"3hrs": 3 * 3600, "6hrs": 6 * 3600, "12hrs": 12 * 3600, "24hrs": 24 * 3600}  # 即時能效的 WP 斜率時間窗
+
+# LOG_PATH 由 devices.py 決定 (執行檔所在目錄, 無法寫入時為臨時目錄), 其他資料目錄放在同一處
+# 超出記憶體保留時間的 plot_data 存放目錄
+HISTORY_DIR = os.path.join(os.path.dirname(LOG_PATH), "history")
+# 測試日誌目錄, 供異常結束後接續測試
+JOURNAL_DIR = os.path.join(os.path.dirname(LOG_PATH), "journal")
+# 效能分析結果目錄
+PROFILE_DIR = os.path.join(os.path.dirname(LOG_PATH), "profile")
+DATABASE_PATH = os.path.join(os.path.dirname(LOG_PATH), "lab_data.sqlite3")
+
+def pw3335_ip(station_index):
+    """工位 (0~5) 對應的 PW3335 位址; 模擬器的每台 PW3335 使用不同的本機位址 127.0.0.x"""
+    return f"127.0.0.{station_index + 2}" if Emulator_mode else f"192.168.1.{station_index + 2}"
 
 class DraggableLine:
+    """
+    可拖曳的垂直線。拖曳時只重繪這條線 (blit): 按下時畫一次不含此線的背景並複製起來,
+    之後每次移動只還原背景 + 畫線; 滑鼠移動事件合併為每 DRAG_FRAME_MS 最多重繪一次,
+    on_drag_callback 等游標停住 DRAG_REST_MS (或放開) 後才呼叫。
+    """
     def __init__(self, ax, xdata, ydata, initial_pos, color='red', linestyle='--', linewidth=1, 
                  date_var=None, time_var=None, on_drag_callback=None):
         self.ax = ax
@@ -477,9 +134,19 @@ class DraggableLine:
         self.date_var = date_var
         self.time_var = time_var
         self.on_drag_callback = on_drag_callback
-        self.cid_press = self.line.figure.canvas.mpl_connect('button_press_event', self.on_press)
-        self.cid_release = self.line.figure.canvas.mpl_connect('button_release_event', self.on_release)
-        self.cid_motion = self.line.figure.canvas.mpl_connect('motion_notify_event', self.on_motion)
+        self.background = None  # 拖曳中不含此線的畫面
+        self.pending_x = None  # 尚未重繪的最新位置
+        canvas = self.line.figure.canvas
+        self.frame_timer = canvas.new_timer(interval=DRAG_FRAME_MS)
+        self.frame_timer.single_shot = True
+        self.frame_timer.add_callback(self.draw_pending)
+        self.rest_timer = canvas.new_timer(interval=DRAG_REST_MS)
+        self.rest_timer.single_shot = True
+        self.rest_timer.add_callback(self.fire_callback)
+        self.cid_press = canvas.mpl_connect('button_press_event', self.on_press)
+        self.cid_release = canvas.mpl_connect('button_release_event', self.on_release)
+        self.cid_motion = canvas.mpl_connect('motion_notify_event', self.on_motion)
+        self.cid_draw = canvas.mpl_connect('draw_event', self.on_draw)
         #print("date_var:", type(date_var), "time_var:", type(time_var))
 
     def on_press(self, event):
@@ -489,22 +156,69 @@ class DraggableLine:
         if not contains:
             return
         self.press = True
-        
+        self.line.set_animated(True)
+        self.line.figure.canvas.draw()  # on_draw 取得背景並畫上此線
+
+    def on_draw(self, event):
+        """整張圖重繪後 (按下, 視窗縮放, 動畫更新) 重新取得背景"""
+        if not self.press:
+            return
+        canvas = self.line.figure.canvas
+        self.background = canvas.copy_from_bbox(self.ax.bbox)
+        self.ax.draw_artist(self.line)
+        canvas.blit(self.ax.bbox)
+
     def on_motion(self, event):
         if not self.press or event.inaxes != self.ax:
             return
-        x_pos = event.xdata
-        #print("拖曳到", x_pos)
+        #print("拖曳到", event.xdata)
+        if self.pending_x is None:
+            self.frame_timer.start()
+        self.pending_x = event.xdata
+
+    def draw_pending(self):
+        """每個畫面週期重繪一次最新的位置"""
+        x_pos, self.pending_x = self.pending_x, None
+        if not self.press or x_pos is None:
+            return
         self.line.set_xdata([x_pos, x_pos])
         self.update_text_boxes(x_pos)
-        # 新增：呼叫 callback
+        if self.background is not None:
+            canvas = self.line.figure.canvas
+            canvas.restore_region(self.background)
+            self.ax.draw_artist(self.line)
+            canvas.blit(self.ax.bbox)
         if self.on_drag_callback:
-            self.on_drag_callback(x_pos)
-        self.line.figure.canvas.draw()
-        
+            self.rest_timer.stop()
+            self.rest_timer.start()
+
+    def fire_callback(self):
+        if self.on_drag_callback:
+            self.on_drag_callback(self.get_position())
+
     def on_release(self, event):
+        if not self.press:
+            return
         self.press = False
-        self.line.figure.canvas.draw()
+        self.frame_timer.stop()
+        self.rest_timer.stop()
+        if self.pending_x is not None:
+            x_pos, self.pending_x = self.pending_x, None
+            self.line.set_xdata([x_pos, x_pos])
+            self.update_text_boxes(x_pos)
+        self.fire_callback()
+        self.background = None
+        self.line.set_animated(False)
+        self.line.figure.canvas.draw_idle()
+
+    def disconnect(self):
+        """解除事件綁定並移除此線"""
+        canvas = self.line.figure.canvas
+        self.frame_timer.stop()
+        self.rest_timer.stop()
+        for cid in (self.cid_press, self.cid_release, self.cid_motion, self.cid_draw):
+            canvas.mpl_disconnect(cid)
+        self.line.remove()
         
     def get_position(self):
         return self.line.get_xdata()[0]
@@ -581,16 +295,47 @@ class App:
         self.ws = ws
         self.hs = hs
         self.pause_plot = {}  # 用於控制圖表更新的暫停/恢復
-        self.gx20_instance = GX20()
+        self.gx20_instance = GX20(GX20_HOST)
         self.pw3335_instances = {}
         self.EnergyCalculator = EnergyCalculator()
         self.plot_channel_labels = {} #即時顯示溫度的標籤
+        self.init_ui_batch()
         self.collecting = {}
         self.plot_data = {}
+        self.rollups = {}  # 各工位的分層彙總
+        self.live_slopes = {}  # 各工位即時能效的 WP 滾動斜率
+        self.steady_detectors = {}  # 各工位溫度穩定判定
+        self.steady_since = {}  # 各工位達到穩定狀態的時間, None 表示未穩定
         self.x_start = {}
         self.x_end = {}
         self.collection_threads = {}
         self.stop_events = {}  # 每個工位一個 stop event
+        self.acquisition = None  # 獨立擷取行程 (Acquisition_process_mode)
+        self.replays = {}  # 重播中的工位 -> ReplaySource
+        self.resume_journals = {}  # 待接續測試的日誌
+        self.database = RunDatabase(DATABASE_PATH) if Database_mode else None
+        self.catalog_indexer = CatalogIndexer(on_error=log_error)  # CSV 記錄目錄背景索引
+        self.catalog_indexer.start()
+        self.metrics_server = None  # 本機指標端點
+        if METRICS_PORT:
+            try:
+                self.metrics_server = MetricsServer(METRICS_PORT).start()
+            except OSError as e:
+                log_error(f"App.init:指標端點 127.0.0.1:{METRICS_PORT} 無法啟動: {e}")
+        self.profiler = SamplingProfiler()
+        self.memory_tracker = MemoryTracker()
+        self.stall_monitor = TkStallMonitor(root, STALL_CHECK_MS, STALL_THRESHOLD_SECONDS, on_stall=self.log_stall)
+        self.stall_monitor.start()
+        if PROFILE_SIGNAL is not None:
+            signal.signal(PROFILE_SIGNAL, lambda signum, frame: self.root.after(0, self.toggle_profiler))
+        if self.database is not None:
+            REGISTRY.gauge_function("queue_depth", self.database.pending, "佇列中等待處理的項目數", queue="database")
+        self.gx20_snapshot = GX20Snapshot(0, None, [[999.9] * 20] * len(STATIONS))  # 尚未輪詢前視為無資料
+        if Acquisition_process_mode:
+            try:
+                self.acquisition = AcquisitionClient(Debug_mode, GX20_HOST)
+            except Exception as e:
+                log_error(f"App.init:擷取行程啟動失敗, 改由本行程擷取: {e}")
  
         # 初始化 Notebook（頁面容器）
         self.notebook = ttk.Notebook(root)
@@ -606,15 +351,24 @@ class App:
             self.x_end[f"工位{i}"] = datetime.now()  # 初始化每個工位的 x 軸結束時間
             # 在每個頁面中添加控件
             self.setup_station_page(frame, f"工位{i}")
+        # 狀態頁面
+        status_frame = ttk.Frame(self.notebook)
+        self.notebook.add(status_frame, text="   狀態   ", padding=5)
+        self.setup_status_page(status_frame)
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
         # 綁定窗口關閉事件
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        # 檢查是否有未正常結束的測試
+        self.root.after(1000, self.offer_resume)
+        if self.acquisition is not None:
+            self.root.after(ACQUISITION_EVENTS_MS, self.poll_acquisition_events)
         # 啟動 GX20 連線與資料更新執緒
         threading.Thread(target=self.instant_data_updater, daemon=True).start()
 
         # 初始化 PW3335 實例
-        if not Debug_mode:
+        if not Debug_mode and self.acquisition is None:
             for i in range(1, 7):
-                pw_ip = f"192.168.1.{i + 1}"
+                pw_ip = pw3335_ip(i - 1)
                 try:
                     pw = PW3335(pw_ip)
                     pw.connect()
@@ -627,52 +381,212 @@ class App:
         """持續連線GX20,儲存到self.station_data, 並即時更新各工位PLOT頁面溫度顯示"""
         while True:
             try:
-                if not Debug_mode:
-                    self.gx20_instance.GX20GetData()
-                    # 取得溫度數據
-                    self.gx20_data_dict = self.gx20_instance.channels_temp
+                if self.acquisition is not None:
+                    # 由擷取行程的共享記憶體取得即時溫度快照
+                    self.gx20_snapshot = GX20Snapshot(*self.acquisition.live_snapshot())
+                elif not Debug_mode:
+                    # 取得溫度數據, 連線失敗時保留上一份快照
+                    if self.gx20_instance.GX20GetData() is not None:
+                        self.publish_gx20_snapshot(self.gx20_instance.channels_temp)
 
                 else:
-                    simulation_value = int(datetime.now().strftime("%S")) / 100
                     self.simulation_wh = [0.0] * 7
                     # 實際收集GX20數據, 只模擬電力記錄
                     #self.gx20_instance.GX20GetData()
                     #self.gx20_data_dict = self.gx20_instance.channels_temp
                     # -------------------
                     # 產生6個工位的模擬數據
-                    self.gx20_data_dict = {
-                        "工位1": [round(simulation_value + i * 0.5, 1) for i in range(20)],
-                        "工位2": [round(simulation_value + i * 0.5, 1) for i in range(20)],
-                        "工位3": [round(simulation_value + i * 0.5, 1) for i in range(20)],
-                        "工位4": [round(simulation_value + i * 0.5, 1) for i in range(20)],
-                        "工位5": [round(simulation_value + i * 0.5, 1) for i in range(20)],
-                        "工位6": [round(simulation_value + i * 0.5, 1) for i in range(20)]
-                    }
-
-                # 依照每個工位的頻道設定，更新溫度顯示
+                    self.publish_gx20_snapshot(simulate_gx20_data())
+
+                # 依照每個工位的頻道設定產生溫度文字, 由主執行緒一次套用到顯示中的工位
+                snapshot = self.gx20_snapshot
+                live_temps = {}
                 for i in range(1, 7):
                     station_name = f"工位{i}"
-                    if not self.pause_plot[station_name]:
-                        """更新 PLOT 頁面的頻道讀值顯示"""
-                        if station_name not in self.plot_channel_labels:
-                            return
-                        temp_list = self.gx20_data_dict[station_name]
-                        
-                        # 更新每個工位的instant_temp_label
-                        for j, channel in enumerate(self.gx20_instance.channel_number[station_name]):
-                            if channel in self.plot_channel_labels[station_name]:
-                                label = self.plot_channel_labels[station_name][channel]
-                                if label :
-                                    if temp_list[j] != 999.9:
-                                        label.config(text=f"{temp_list[j]}")
-                                    else:
-                                        label.config(text=f"--")
-                    #print(f"即時溫度{station_name}: {self.gx20_data_dict[station_name]}")
+                    replay = self.replays.get(station_name)
+                    if replay is not None and replay.snapshot is not None:
+                        temp_list = replay.snapshot.station(station_name)  # 重播中顯示記錄的溫度
+                    else:
+                        temp_list = snapshot.station(station_name)
+                    live_temps[station_name] = [f"{temp}" if temp != 999.9 else "--" for temp in temp_list]
+                    #print(f"即時溫度{station_name}: {snapshot.station(station_name)}")
+                self.live_temps = live_temps
+                self.request_ui_flush()
 
             except Exception as e:
                 self.show_error_dialog(f"GX20連線錯誤:", str(e))
             time.sleep(5)  # 每5秒更新一次數據
 
+    def init_ui_batch(self):
+        """
+        UI 批次更新的狀態。取樣/輪詢執行緒只更新資料並呼叫 request_ui_flush, 所有標籤與圖表
+        由主執行緒的 flush_ui 一次套用; label_texts 只在主執行緒讀寫。
+        """
+        self.live_temps = {}  # 最新一次輪詢各工位的溫度文字
+        self.label_texts = {}  # 標籤 -> 目前顯示的文字 (只在文字改變時 config)
+        self.label_updates = REGISTRY.counter("ui_label_updates_total", "實際重新設定文字的標籤數")
+        self.dirty_stations = set()  # 有新樣本, 等待 flush_ui 更新的工位
+        self.ui_flush_pending = False  # 已排入主執行緒尚未執行
+        self.ui_lock = threading.Lock()
+
+    def request_ui_flush(self, station_name=None):
+        """任何執行緒: 標記工位有新樣本 (None 為只有即時溫度), 每個周期只排入一次 flush_ui"""
+        with self.ui_lock:
+            if station_name is not None:
+                self.dirty_stations.add(station_name)
+            if self.ui_flush_pending:
+                return
+            self.ui_flush_pending = True
+        self.root.after(0, self.flush_ui)
+
+    def flush_ui(self):
+        """主執行緒: 顯示中的工位更新即時能效與圖表, 再套用即時溫度; 隱藏的工位由切換頁面與 FuncAnimation 補上"""
+        with self.ui_lock:
+            dirty, self.dirty_stations = self.dirty_stations, set()
+            self.ui_flush_pending = False
+        for station_name in dirty:
+            if not self.station_tab_visible(station_name):
+                continue
+            try:
+                self.show_live_efficiency(station_name)
+                self.update_plot(None, station_name)
+            except Exception as e:
+                log_error(f"flush_ui: {e}", station=station_name)
+        self.apply_live_temps()
+
+    def apply_live_temps(self):
+        """主執行緒: 最新一次輪詢的溫度套用到顯示中且未暫停的工位, 只更新文字有變化的標籤"""
+        for station_name, texts in self.live_temps.items():
+            if self.pause_plot[station_name] or not self.station_tab_visible(station_name):
+                continue
+            channel_labels = self.plot_channel_labels.get(station_name, {})
+            for channel, text in zip(self.gx20_instance.channel_number[station_name], texts):
+                label = channel_labels.get(channel)
+                if label:
+                    self.set_label_text(label, text)
+
+    def set_label_text(self, label, text):
+        """主執行緒: 與標籤目前的文字 (self.label_texts) 不同時才 config"""
+        if self.label_texts.get(label) != text:
+            label.config(text=text)
+            self.label_texts[label] = text
+            self.label_updates.inc()
+
+    def station_tab_visible(self, station_name):
+        """工位的圖表頁面是否正在顯示"""
+        station_notebook = getattr(self, f"{station_name}_station_notebook", None)
+        plot_frame = getattr(self, f"{station_name}_plot_frame", None)
+        if station_notebook is None or plot_frame is None:
+            return True
+        return (self.notebook.select() == str(self.frames[station_name])
+                and station_notebook.select() == str(plot_frame))
+
+    def on_tab_changed(self, event=None):
+        """切換頁面時, 剛顯示的圖表頁面立即補上隱藏期間略過的溫度, 別名與即時能效"""
+        for station_name in self.frames:
+            if self.station_tab_visible(station_name):
+                self.update_alias_labels(station_name)
+                self.show_live_efficiency(station_name)
+        self.apply_live_temps()
+
+    def update_alias_labels(self, station_name):
+        """同步 plot 頁面的 channel_alias_label: 別名欄位有值時顯示別名, 否則顯示頻道序號"""
+        channel_alias_label = getattr(self, f"{station_name}_channel_alias_label", None)
+        ch_aliases = getattr(self, f"{station_name}_ch_aliases", None)
+        # 取得參數頁的 ch_label
+        channel_check = getattr(self, f"{station_name}_channel_check", None)
+        if channel_alias_label and ch_aliases and channel_check:
+            for i in range(20):
+                self.set_label_text(channel_alias_label[i], ch_aliases[i].get() or f"{i+1}")
+
+    def publish_gx20_snapshot(self, data_dict):
+        """以新的不可變快照替換 self.gx20_snapshot (單一參照指定, 各執行緒讀到的一定是完整的一次輪詢)"""
+        snapshot = GX20Snapshot.from_dict(self.gx20_snapshot.seq + 1, datetime.now(), data_dict)
+        self.gx20_snapshot = snapshot
+        return snapshot
+
+    def setup_status_page(self, frame):
+        """狀態頁面: 裝置來回時間, 存檔/圖表時間, 延遲取樣, 重新連線, 斷路器與佇列深度"""
+        endpoint = f"{self.metrics_server.url} (JSON: {self.metrics_server.url}.json)" if self.metrics_server else "未啟用"
+        ttk.Label(frame, text=f"指標端點: {endpoint}").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        status_text = tk.Text(frame, height=40, width=120, wrap="none", foreground="black")
+        status_text.grid(row=1, column=0, padx=5, pady=5, sticky="nsew")
+
+        # 效能分析與記憶體
+        profile_frame = ttk.LabelFrame(frame, text="效能分析")
+        profile_frame.grid(row=0, column=1, rowspan=2, padx=5, pady=5, sticky="nsew")
+        ttk.Label(profile_frame, text="取樣秒數:").grid(row=0, column=0, padx=5, pady=5)
+        profile_seconds_var = tk.IntVar(value=PROFILE_SECONDS[1])
+        profile_seconds_menu = ttk.Combobox(profile_frame, textvariable=profile_seconds_var, state="readonly",
+                                            width=6, foreground="black")
+        profile_seconds_menu['values'] = PROFILE_SECONDS
+        profile_seconds_menu.grid(row=0, column=1, padx=5, pady=5)
+        profile_button = ttk.Button(profile_frame, text="開始分析", command=self.toggle_profiler)
+        profile_button.grid(row=0, column=2, padx=5, pady=5)
+        memory_button = ttk.Button(profile_frame, text="記憶體快照", command=self.memory_snapshot)
+        memory_button.grid(row=0, column=3, padx=5, pady=5)
+        profile_text = tk.Text(profile_frame, height=38, width=90, wrap="none", foreground="black")
+        profile_text.grid(row=1, column=0, columnspan=4, padx=5, pady=5, sticky="nsew")
+        profile_text.insert(tk.END, f"結果目錄: {PROFILE_DIR}\n")
+
+        frame.grid_rowconfigure(1, weight=1)
+        frame.grid_columnconfigure(0, weight=1)
+        self.status_text = status_text
+        self.profile_seconds_var = profile_seconds_var
+        self.profile_button = profile_button
+        self.profile_text = profile_text
+        self.root.after(STATUS_REFRESH_MS, self.refresh_status)
+
+    def show_profile_text(self, text):
+        self.profile_text.delete("1.0", tk.END)
+        self.profile_text.insert(tk.END, text)
+
+    def toggle_profiler(self):
+        """開始或提前結束效能分析 (狀態頁面按鈕或 PROFILE_SIGNAL)"""
+        if self.profiler.running:
+            self.profiler.stop()  # 不等待取樣執行緒, 由 poll_profiler 顯示結果
+            self.show_profile_text("停止中, 寫出已取樣的結果...\n")
+            return
+        seconds = int(self.profile_seconds_var.get())
+        self.profiler.start(seconds, profile_path(PROFILE_DIR))
+        self.profile_button.config(text="停止分析")
+        self.show_profile_text(f"效能分析中 ({seconds} 秒)...\n")
+        log_info(f"效能分析開始 {seconds} 秒")
+        self.root.after(PROFILE_POLL_MS, self.poll_profiler)
+
+    def poll_profiler(self):
+        """主執行緒: 效能分析寫完後更新按鈕與結果"""
+        if self.profiler.result is None:
+            self.root.after(PROFILE_POLL_MS, self.poll_profiler)
+            return
+        path, samples = self.profiler.result
+        self.profile_button.config(text="開始分析")
+        self.show_profile_text(f"{samples} 次取樣 (flame graph 格式):\n{path}\n")
+        log_info(f"效能分析完成: {samples} 次取樣, {path}")
+
+    def memory_snapshot(self):
+        """各工位資料結構用量與 tracemalloc 快照"""
+        stations = {station_name: (history, self.rollups.get(station_name))
+                    for station_name, history in self.plot_data.items() if isinstance(history, StationHistory)}
+        report = self.memory_tracker.report(stations)
+        self.show_profile_text(report)
+        log_info(f"記憶體快照:\n{report}")
+
+    def log_stall(self, seconds, started, stack):
+        """Tk 主迴圈停頓超過 STALL_THRESHOLD_SECONDS: 記錄停頓時間與當時主執行緒的堆疊"""
+        log_info(f"Tk 主迴圈停頓 {seconds:.2f} 秒, 主執行緒堆疊:\n{stack.rstrip()}",
+                 started=datetime.fromtimestamp(started).strftime("%H:%M:%S.%f")[:-3], latency=seconds)
+
+    def refresh_status(self):
+        """每 STATUS_REFRESH_MS 更新狀態頁面"""
+        try:
+            self.status_text.delete("1.0", tk.END)
+            self.status_text.insert(tk.END, format_status(REGISTRY.snapshot()))
+            self.status_text.insert(tk.END, "\n\n" + self.stall_monitor.summary())
+        except Exception as e:
+            log_error(f"refresh_status: {e}")
+        self.root.after(STATUS_REFRESH_MS, self.refresh_status)
+
     def setup_station_page(self, frame, station_name):
         """設置每個工位頁面的控件"""
         station_name = station_name.replace(" ", "")  # 去除空格，統一名稱格式
@@ -690,6 +604,9 @@ class App:
         station_notebook.add(parameter_frame, text="  設定  ")
         station_notebook.add(plot_frame, text="  圖表  ")
         station_notebook.add(snapshot_frame, text="  計算  ")
+        station_notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        setattr(self, f"{station_name}_station_notebook", station_notebook)
+        setattr(self, f"{station_name}_plot_frame", plot_frame)
         
         # 設置 frame 的網格權重，使其可以填滿整個空間
         frame.grid_rowconfigure(0, weight=1)
@@ -732,6 +649,15 @@ class App:
             stop_button = ttk.Button(file_frame, text="Stop", command=lambda: self.stop_collect(station_name), state="disabled")
             stop_button.grid(row=2, column=2, padx=5, pady=5)
 
+            # 重播已記錄的 CSV
+            ttk.Label(file_frame, text="重播速度:").grid(row=3, column=0, padx=5, pady=5)
+            replay_speed_var = tk.StringVar(value="MAX")
+            replay_speed_menu = ttk.Combobox(file_frame, textvariable=replay_speed_var, state="readonly", foreground="black")
+            replay_speed_menu['values'] = list(REPLAY_SPEEDS)
+            replay_speed_menu.grid(row=3, column=1, padx=5, pady=5)
+            replay_button = ttk.Button(file_frame, text="重播...", command=lambda: self.start_replay(station_name), state="normal")
+            replay_button.grid(row=3, column=2, padx=5, pady=5)
+
         # 分割線
         ttk.Separator(frame, orient="horizontal").grid(row=1, column=0, sticky="ew", pady=10)
         
@@ -809,6 +735,8 @@ class App:
         setattr(self, f"{station_name}_frequency_menu", frequency_menu)
         setattr(self, f"{station_name}_start_button", start_button)
         setattr(self, f"{station_name}_stop_button", stop_button)
+        setattr(self, f"{station_name}_replay_speed_var", replay_speed_var)
+        setattr(self, f"{station_name}_replay_button", replay_button)
         setattr(self, f"{station_name}_model_entry", model_entry)
         setattr(self, f"{station_name}_model_entry_var", model_entry_var)
         setattr(self, f"{station_name}_vf_entry", vf_entry)
@@ -836,15 +764,188 @@ class App:
         #工位1 - Enabled Channels: [[4, '', '0005'], [12, 'fn', '0103'], [14, 'fgnfgnvb', '0105']]
         return enabled_channels
 
+    def journal_config(self, station_name):
+        """測試日誌 checkpoint 時記錄的工位設定"""
+        def value(name):
+            var = getattr(self, f"{station_name}_{name}", None)
+            return var.get() if var is not None else None
+        memo_text = getattr(self, f"{station_name}_memo_text", None)
+        return {
+            "file_path": value("file_path_var"),
+            "frequency": value("frequency_var"),
+            "model": value("model_entry_var"),
+            "vf": value("vf_entry_var"),
+            "vr": value("vr_entry_var"),
+            "fan_type": value("fan_type_var"),
+            "onoffthrottle": value("onoffthrottle_entry"),
+            "channel_check": [var.get() for var in getattr(self, f"{station_name}_channel_check", [])],
+            "aliases": [entry.get() for entry in getattr(self, f"{station_name}_ch_aliases", [])],
+            "temp_f": value("temp_f_entry_var"),
+            "temp_r": value("temp_r_entry_var"),
+            "window": [value("start_date"), value("start_time"), value("end_date"), value("end_time")],
+            "x_axis_range": value("x_axis_range_var"),
+            "memo": memo_text.get(1.0, tk.END) if memo_text is not None else "",
+        }
+
+    def run_metadata(self, station_name, file_name):
+        """資料庫 runs 表的機種資料, 頻道名稱與 CSV 標題一致"""
+        config = self.journal_config(station_name)
+        return {
+            "file_name": os.path.abspath(file_name),
+            "model": config["model"],
+            "vf": config["vf"],
+            "vr": config["vr"],
+            "fan_type": config["fan_type"],
+            "temp_f": config["temp_f"],
+            "temp_r": config["temp_r"],
+            "aliases": self.build_csv_header(station_name)[2:22],
+        }
+
+    def restore_station_config(self, station_name, config):
+        """將日誌中的工位設定填回畫面"""
+        for name, key in [("file_path_var", "file_path"), ("frequency_var", "frequency"),
+                          ("model_entry_var", "model"), ("vf_entry_var", "vf"), ("vr_entry_var", "vr"),
+                          ("fan_type_var", "fan_type"), ("onoffthrottle_entry", "onoffthrottle"),
+                          ("temp_f_entry_var", "temp_f"), ("temp_r_entry_var", "temp_r"),
+                          ("x_axis_range_var", "x_axis_range")]:
+            var = getattr(self, f"{station_name}_{name}", None)
+            if var is not None and config.get(key) is not None:
+                var.set(config[key])
+        for var, checked in zip(getattr(self, f"{station_name}_channel_check", []), config.get("channel_check", [])):
+            var.set(checked)
+        for entry, alias in zip(getattr(self, f"{station_name}_ch_aliases", []), config.get("aliases", [])):
+            entry.delete(0, tk.END)
+            entry.insert(0, alias)
+        for name, text in zip(["start_date", "start_time", "end_date", "end_time"], config.get("window", [])):
+            var = getattr(self, f"{station_name}_{name}", None)
+            if var is not None and text:
+                var.set(text)
+        memo_text = getattr(self, f"{station_name}_memo_text", None)
+        if memo_text is not None and config.get("memo"):
+            memo_text.delete(1.0, tk.END)
+            memo_text.insert(tk.END, config["memo"].rstrip("\n"))
+
+    def offer_resume(self):
+        """啟動時詢問是否接續未正常結束的測試"""
+        for station_name, config in find_interrupted(JOURNAL_DIR).items():
+            if station_name not in self.frames:
+                continue
+            checkpoint = datetime.fromtimestamp(config.get("checkpoint_time", 0)).strftime("%Y-%m-%d %H:%M:%S")
+            if messagebox.askyesno(
+                    "接續測試",
+                    f"{station_name} 有未正常結束的測試：\n{config.get('file_name')}\n"
+                    f"最後存檔時間：{checkpoint}\n\n是否接續此測試？"):
+                # 上一個 GUI 的擷取行程會在數秒內停止並釋放 CSV, 期間可重試
+                while csv_writer_active(config["file_name"]) and messagebox.askretrycancel(
+                        "接續測試", f"{config['file_name']}\n仍由上一個擷取行程寫入中, 停止後才能接續。"):
+                    pass
+                try:
+                    self.resume_station(station_name)
+                except Exception as e:
+                    self.show_error_dialog("接續測試失敗", f"{station_name}: {e}")
+            else:
+                SessionJournal(JOURNAL_DIR, station_name).close(finished=True)
+                log_info(f"{station_name} 放棄接續測試 {config.get('file_name')}")
+
+    def resume_station(self, station_name):
+        """由日誌重建 plot_data 與分層彙總, 並接續寫入原本的 CSV; CSV 仍有其他寫入端時不接續"""
+        t0 = time.perf_counter()
+        file_name = SessionJournal(JOURNAL_DIR, station_name).read_config()["file_name"]
+        if csv_writer_active(file_name):
+            raise RuntimeError(f"{file_name} 仍由上一個擷取行程寫入中")
+        journal = SessionJournal.reopen(JOURNAL_DIR, station_name,
+                                        config_provider=lambda: self.journal_config(station_name))
+        self.restore_station_config(station_name, journal.config)
+        recovered = self.recover_csv_tail(journal)
+        times, temps, power, gx20_seq = samples_to_arrays(journal.read_samples())
+        old_history = self.plot_data.get(station_name)
+        if isinstance(old_history, StationHistory):
+            old_history.close()
+        history = StationHistory(os.path.join(HISTORY_DIR, f"{station_name}.bin"), HOT_WINDOW_SECONDS)
+        history.load(times, temps, power, gx20_seq)
+        rollup = StationRollup(ROLLUP_TIERS)
+        rollup.extend(times, np.concatenate([temps, power[:, 2:4]], axis=1))
+        self.plot_data[station_name] = history
+        self.rollups[station_name] = rollup
+        self.resume_journals[station_name] = journal
+        log_info(f"{station_name} 由日誌重建 {len(times)} 筆資料 (其中 {recovered} 筆由 CSV 補回), "
+                 f"耗時 {time.perf_counter() - t0:.3f} 秒, 接續 {journal.config['file_name']}")
+        self.start_collect(station_name, resume=True)
+
+    def recover_csv_tail(self, journal):
+        """
+        CSV 中比日誌最後一筆還新的資料列補進日誌, 回傳筆數。
+        GUI 結束到擷取行程停止之間, 以及 GUI 尚未從共享記憶體讀取的樣本只存在 CSV。
+        """
+        file_name = journal.config["file_name"]
+        if not os.path.exists(file_name):
+            return 0
+        samples = journal.read_samples()
+        # CSV 時間只到秒, 由日誌最後一筆的下一秒開始
+        start = datetime.fromtimestamp(int(samples["t"][-1]) + 1) if len(samples) else None
+        catalog = self.catalog_indexer.catalog(os.path.dirname(file_name))
+        count = 0
+        for row in catalog.read_rows(file_name, start):
+            journal.append(row)
+            count += 1
+        return count
+
     def browse_file(self, file_path_var):
         file_path = filedialog.askdirectory()
         file_path_var.set(file_path)
         self.file_path = file_path  # 將選擇的路徑保存到 self.file_path
 
-    def start_collect(self,station_name):
+    def start_replay(self, station_name):
+        """選擇已記錄的 CSV, 以重播來源取代 GX20/PW3335 開始收集"""
+        if self.collecting.get(station_name):
+            return
+        path = filedialog.askopenfilename(filetypes=[("CSV", "*.csv")])
+        if not path:
+            return
+        speed_var = getattr(self, f"{station_name}_replay_speed_var", None)
+        speed = REPLAY_SPEEDS.get(speed_var.get() if speed_var else "", 0.0)
         try:
-            # 清除舊數據
-            self.plot_data[station_name] = []
+            replay = ReplaySource(path, station_name, speed)
+        except Exception as e:
+            self.show_error_dialog("重播錯誤", f"無法讀取 {path}: {e}")
+            return
+        # 沒有勾選頻道時, 依記錄的標題行填入別名並全部勾選
+        channel_check = getattr(self, f"{station_name}_channel_check")
+        if not self.get_enabled_channel(station_name):
+            ch_aliases = getattr(self, f"{station_name}_ch_aliases")
+            for i, alias in enumerate(replay.entry["aliases"]):
+                channel_check[i].set(1)
+                if not ch_aliases[i].get() and alias != f"Ch{i + 1}":
+                    ch_aliases[i].insert(0, alias)
+        self.replays[station_name] = replay
+        log_info(f"{station_name} 開始重播 {path} (速度 {speed_var.get() if speed_var else speed})")
+        self.start_collect(station_name)
+        if not self.collecting.get(station_name):
+            self.replays.pop(station_name, None)
+
+    def finish_replay(self, station_name, replay):
+        """重播結束 (播放完畢或停止): 記錄處理量統計, 並於主執行緒重設工位狀態"""
+        message = format_replay_stats(replay.stats())
+        log_info(f"{station_name} 重播結束 {replay.path}\n{message}")
+
+        def done():
+            if self.collecting.get(station_name):
+                self.stop_collect(station_name)
+            messagebox.showinfo(f"{station_name} 重播結束", message)
+        self.root.after(0, done)
+
+    def start_collect(self,station_name, resume=False):
+        try:
+            # 清除舊數據 (接續測試時保留由日誌重建的資料)
+            if not resume:
+                old_history = self.plot_data.get(station_name)
+                if isinstance(old_history, StationHistory):
+                    old_history.close()
+                self.plot_data[station_name] = StationHistory(
+                    os.path.join(HISTORY_DIR, f"{station_name}.bin"), HOT_WINDOW_SECONDS)
+                self.rollups[station_name] = StationRollup(ROLLUP_TIERS)
+            self.reset_live_efficiency(station_name)
+            self.reset_steady_state(station_name)
             # 檢查檔案路徑
             file_path_var = getattr(self, f"{station_name}_file_path_var", None)
             if not file_path_var or not file_path_var.get():
@@ -863,6 +964,9 @@ class App:
             pause_button = getattr(self, f"{station_name}_pause_button", None)
             if start_button:
                 start_button.config(state="disabled")
+            replay_button = getattr(self, f"{station_name}_replay_button", None)
+            if replay_button:
+                replay_button.config(state="disabled")
             if stop_button:
                 stop_button.config(state="normal")
             if pause_button:
@@ -900,7 +1004,7 @@ class App:
             
             # 取得工位對應的頻道和 IP
             station_index = int(station_name[-1]) - 1
-            pw_ip = f"192.168.1.{station_index + 2}"
+            pw_ip = pw3335_ip(station_index)
 
             # 啟動數據收集執行緒
             collection_thread = threading.Thread(
@@ -924,6 +1028,8 @@ class App:
             self.collecting[station_name] = False
             if station_name in self.stop_events:
                 self.stop_events[station_name].set()
+            if self.acquisition is not None:
+                self.acquisition.stop_station(station_name)
             # 頁籤移除 []
             for idx in range(self.notebook.index("end")):
                 tab_text = self.notebook.tab(idx, "text")
@@ -937,6 +1043,9 @@ class App:
             pause_button = getattr(self, f"{station_name}_pause_button", None)
             if start_button:
                 start_button.config(state="normal")
+            replay_button = getattr(self, f"{station_name}_replay_button", None)
+            if replay_button:
+                replay_button.config(state="normal")
             if stop_button:
                 stop_button.config(state="disabled")
             if pause_button:
@@ -975,8 +1084,13 @@ class App:
         file_name_entry = getattr(self, f"{station_name}_file_name_entry", None)
         file_path_var = getattr(self, f"{station_name}_file_path_var", None)
         frequency_var = freq.get() if freq else 10
+        journal = None
+        run_id = None
+        replay = self.replays.get(station_name)
         try:
-            if not Debug_mode:
+            if replay is not None:
+                pw = replay.pw3335  # 重播: 電力讀值來自記錄
+            elif not Debug_mode and self.acquisition is None:
                 # 檢查 PW3335 連線
                 pw = self.pw3335_instances.get(pw_ip)
                 if not pw:
@@ -991,8 +1105,25 @@ class App:
             
             if file_path_var:
                 file_path = file_path_var.get()
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                file_name = f"{file_path}/{timestamp}_{station_name}.csv"
+                journal = self.resume_journals.pop(station_name, None)
+                if journal is not None:
+                    # 接續測試: 沿用原本的 CSV 檔
+                    file_name = journal.config["file_name"]
+                    file_path = os.path.dirname(file_name)
+                else:
+                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    file_name = f"{file_path}/{timestamp}_{station_name}.csv"
+                    journal_config = {"file_name": os.path.abspath(file_name), "start_time": datetime.now().isoformat()}
+                    if self.database is not None:
+                        journal_config["run_id"] = self.database.start_run(station_name, self.run_metadata(station_name, file_name))
+                    journal = SessionJournal.create(JOURNAL_DIR, station_name, journal_config,
+                                                    config_provider=lambda: self.journal_config(station_name))
+                if self.database is not None:
+                    run_id = journal.config.get("run_id")
+                    if run_id is None:
+                        # 接續的測試在資料庫啟用前開始
+                        run_id = journal.config["run_id"] = self.database.start_run(
+                            station_name, self.run_metadata(station_name, file_name))
                 if file_name_entry is not None:
                     file_name_entry.config(state="normal")
                     file_name_entry.delete(0, tk.END)
@@ -1000,21 +1131,27 @@ class App:
                     file_name_entry.config(state="readonly")
                 if not os.path.exists(file_path):
                     os.makedirs(file_path)
+                self.catalog_indexer.add_directory(file_path)
                 file_exists = os.path.exists(file_name)
+                if self.acquisition is not None and replay is None:
+                    # 擷取與存檔交給擷取行程, 本執行緒只負責接收樣本與更新圖表
+                    self.acquisition.start_station(station_name, os.path.abspath(file_name),
+                                                   self.build_csv_header(station_name), frequency_var, pw_ip)
+                    self.receive_worker_samples(station_name, journal, run_id)
+                    journal.close(finished=True)
+                    if run_id is not None:
+                        self.database.end_run(run_id)
+                    return
                 with open(file_name, mode="a", newline="", buffering=1, encoding="utf-8") as file:
                     writer = csv.writer(file)
                     # 寫入標題行：僅在檔案不存在時
                     if not file_exists:
-                        header = ["Date", "Time"]
-                        ch_aliases = getattr(self, f"{station_name}_ch_aliases", None)
-                        if ch_aliases:
-                            for i in range(20):
-                                if ch_aliases[i].get():
-                                    header.append(ch_aliases[i].get())
-                                else:
-                                    header.append(f"Ch{i+1}")
-                        header.extend(["U(V)", "I(A)", "P(W)", "WP(Wh)"])
-                        writer.writerow(header)
+                        writer.writerow(self.build_csv_header(station_name))
+                    csv_write = REGISTRY.histogram("csv_write_seconds", "CSV 每筆寫入時間", station=station_name)
+                    late_ticks = REGISTRY.counter("late_ticks_total", "取樣週期延遲次數", station=station_name)
+                    missed_ticks = REGISTRY.counter("missed_ticks_total", "延遲超過一個記錄週期而漏掉的取樣數",
+                                                    station=station_name)
+                    last_tick = None
 
                     while self.collecting[station_name]:
                         if Debug_mode:
@@ -1022,45 +1159,146 @@ class App:
                         else:
                             frequency_var = int(frequency_var)
                         active_ch_list = self.get_enabled_channel(station_name)
-                        now = datetime.now()
+                        tick = time.monotonic()
+                        if last_tick is not None and replay is None:
+                            lateness = tick - last_tick - frequency_var
+                            if lateness > TICK_LATE_SECONDS:
+                                late_ticks.inc()
+                                missed_ticks.inc(int(lateness // frequency_var))
+                        last_tick = tick
+                        if replay is not None:
+                            if not replay.advance():
+                                break  # 記錄播放完畢
+                            # 時間戳記與溫度都來自記錄, 快照只供本工位使用, 不替換 self.gx20_snapshot
+                            now = replay.row[0]
+                            snapshot = GX20Snapshot.from_dict(replay.seq, now, replay.gx20.GX20GetData())
+                            replay.snapshot = snapshot
+                        else:
+                            now = datetime.now()
+                            # 只讀取一次快照參照, 整筆資料都來自同一次輪詢
+                            snapshot = self.gx20_snapshot
                         # 將 99.9 轉為 None
                         temp_data = [
                             None if v == 999.9 else v
-                            for v in self.gx20_data_dict[station_name]
+                            for v in snapshot.station(station_name)
                         ]
-                        if not Debug_mode:
+                        if not Debug_mode or replay is not None:
                             power_data = [None] * 4
+                            query_started = time.perf_counter()
                             try:
                                 power_data = pw.query_data()[:4]
                                 #print(f"{station_name}即時電力: {power_data}")
+                            except BreakerOpenError:
+                                power_data = [None] * 4  # 斷路器開啟中未讀取, 報告與彙總視為無資料
                             except Exception as e:
-                                log_error(f"collect_data.pw.query_data()發生錯誤: {e} at {pw_ip}")
+                                log_error(f"collect_data.pw.query_data()發生錯誤: {e} at {pw_ip}", station=station_name,
+                                          device=f"pw3335@{pw_ip}", latency=time.perf_counter() - query_started)
                                 power_data = [110.0,1,50,1.1]
                         else:
                             # 模擬電力數據
                             power_data = [110.0,1,50,1.1]
 
-                        self.plot_data[station_name].append([now, temp_data, power_data])
+                        row = [now, temp_data, power_data, snapshot.seq]
+                        journal.append(row)
+                        if run_id is not None:
+                            self.database.add_row(run_id, station_name, row)
+                        self.plot_data[station_name].append(row)
+                        self.rollups[station_name].append(now, temp_data, power_data)
+                        self.live_slopes[station_name].add(now.timestamp(), power_data[3])
+                        self.update_steady_state(station_name, now, temp_data, active_ch_list)
                         #print(f"{station_name}最新數據: {self.plot_data[station_name][-1]}")
-                        self.update_plot(None, station_name, active_ch_list)
+                        self.request_ui_flush(station_name)  # 即時能效, 穩定區段與圖表由主執行緒更新
                         
                         date_str = now.strftime("%Y-%m-%d")
                         time_str = now.strftime("%H:%M:%S")
                         # 寫入csv的內容由self.gx20_data_dict[station_name]改為temp_data, 頻道內數據為99.9的位置,改為空值
 
-                        writer.writerow([date_str, time_str] + temp_data + power_data)
+                        with csv_write.time():
+                            writer.writerow([date_str, time_str] + temp_data + power_data + [snapshot.seq])
                         #print(f"collect_data: plot_data{station_name}: {self.plot_data[station_name][-1]}")
                         
                         stop_event = self.stop_events.get(station_name)
-                        if stop_event:
+                        if replay is not None:
+                            if replay.wait(stop_event):
+                                break
+                        elif stop_event:
                             if stop_event.wait(timeout=frequency_var):
                                 break
                         else:
                             time.sleep(frequency_var)
+                # 正常停止: 測試結束, 刪除日誌
+                journal.close(finished=True)
+                if run_id is not None:
+                    self.database.end_run(run_id)
+                if replay is not None:
+                    self.finish_replay(station_name, replay)
         except Exception as e:
             print(f"Error in collect_data: {e}")
             log_error(f"Error in collect_data: {e}")
+            if journal is not None:
+                journal.close(finished=False)  # 保留日誌供之後接續
             self.stop_collect(station_name)
+        finally:
+            if replay is not None:
+                self.replays.pop(station_name, None)
+
+    def build_csv_header(self, station_name):
+        """CSV 標題行: Date, Time, 20個頻道別名, U/I/P/WP"""
+        header = ["Date", "Time"]
+        ch_aliases = getattr(self, f"{station_name}_ch_aliases", None)
+        if ch_aliases:
+            for i in range(20):
+                if ch_aliases[i].get():
+                    header.append(ch_aliases[i].get())
+                else:
+                    header.append(f"Ch{i+1}")
+        header.extend(["U(V)", "I(A)", "P(W)", "WP(Wh)", "GX20Seq"])
+        return header
+
+    def poll_acquisition_events(self):
+        """主執行緒: 處理擷取行程的事件; 工位無法開始或記錄中斷時顯示錯誤並停止該工位"""
+        try:
+            for kind, station_name, message in self.acquisition.poll_events():
+                if kind == "error":
+                    log_error(f"擷取行程: {station_name} {message}", station=station_name)
+                    if self.collecting.get(station_name):
+                        self.stop_collect(station_name)
+                        self.show_error_dialog(f"{station_name} 擷取錯誤", message)
+                elif kind == "stopped" and self.collecting.get(station_name):
+                    log_error(f"擷取行程: {station_name} 記錄已結束, 停止收集", station=station_name)
+                    self.stop_collect(station_name)
+        except Exception as e:
+            log_error(f"poll_acquisition_events: {e}")
+        self.root.after(ACQUISITION_EVENTS_MS, self.poll_acquisition_events)
+
+    def receive_worker_samples(self, station_name, journal, run_id=None):
+        """由擷取行程的共享記憶體讀取本工位樣本, 加入 plot_data 並更新圖表"""
+        station_index = STATIONS.index(station_name)
+        cursor = self.acquisition.write_count()
+        stop_event = self.stop_events.get(station_name)
+        backlog = REGISTRY.gauge("queue_depth", "佇列中等待處理的項目數", queue="acquisition_ring", station=station_name)
+        lost_samples = REGISTRY.counter("ring_lost_total", "GUI 來不及讀取而略過的樣本數", station=station_name)
+        while self.collecting[station_name]:
+            backlog.set(self.acquisition.write_count() - cursor)
+            records, cursor, lost = self.acquisition.read(cursor)
+            if lost:
+                lost_samples.inc(lost)
+                log_error(f"{station_name} GUI 來不及讀取, 略過 {lost} 筆顯示資料 (CSV 不受影響)")
+            records = records[records["station"] == station_index]
+            if len(records):
+                active_ch_list = self.get_enabled_channel(station_name)
+                for record in records:
+                    row = record_to_row(record)
+                    journal.append(row)
+                    if run_id is not None:
+                        self.database.add_row(run_id, station_name, row)
+                    self.plot_data[station_name].append(row)
+                    self.rollups[station_name].append(*row[:3])
+                    self.live_slopes[station_name].add(row[0].timestamp(), row[2][3])
+                    self.update_steady_state(station_name, row[0], row[1], active_ch_list)
+                self.request_ui_flush(station_name)
+            if stop_event and stop_event.wait(timeout=0.5):
+                break
 
     def setup_plot_page(self, frame, station_name):
         """設置 PLOT 頁面的控件"""
@@ -1120,11 +1358,29 @@ class App:
         # calculate button
         calculate_button = ttk.Button(frame, text="平均", command=lambda: self.calculate_average(station_name), width=6)
         calculate_button.grid(row=4, column=0, columnspan=2, padx=5, pady=5)
+
+        # 即時能效: 以最近一段時間的 WP 斜率推算
+        live_frame = ttk.LabelFrame(frame, text="即時能效")
+        live_frame.grid(row=5, column=0, columnspan=2, padx=20, pady=5, sticky="nw")
+        live_window_var = tk.StringVar(value="6hrs")
+        live_window_menu = ttk.Combobox(live_frame, textvariable=live_window_var, state="readonly", width=6, foreground="black")
+        live_window_menu['values'] = list(LIVE_EF_WINDOWS)
+        live_window_menu.grid(row=0, column=0, columnspan=2, padx=5, pady=5, sticky="w")
+        live_window_menu.bind("<<ComboboxSelected>>", lambda event: self.reset_live_efficiency(station_name))
+        live_labels = {}
+        for row, (key, text) in enumerate([("span", "資料"), ("daily", "日耗電量"), ("ef", "EF值"),
+                                           ("grade_2018", "2018"), ("grade_2027", "2027")], start=1):
+            ttk.Label(live_frame, text=text).grid(row=row, column=0, padx=5, pady=2, sticky="w")
+            live_labels[key] = ttk.Label(live_frame, text="--", width=14)
+            live_labels[key].grid(row=row, column=1, padx=5, pady=2, sticky="w")
+        setattr(self, f"{station_name}_live_window_var", live_window_var)
+        setattr(self, f"{station_name}_live_labels", live_labels)
+
         figure = Figure(figsize=(16, 8), dpi=80, facecolor=self.figure_facecolor)
         gs = figure.add_gridspec(2, 1, height_ratios=[7, 3])  # 7:3 高度比例
         canvas = FigureCanvasTkAgg(figure, master=frame)
         canvas_widget = canvas.get_tk_widget()
-        canvas_widget.grid(row=0, rowspan= 5, column=2, padx=5, pady=5)
+        canvas_widget.grid(row=0, rowspan= 6, column=2, padx=5, pady=5)
         ax_temp = figure.add_subplot(gs[0, 0], facecolor=self.figure_temp_color)
         ax_power = figure.add_subplot(gs[1, 0], sharex=ax_temp, facecolor=self.figure_power_color)
         # 減少左右空白
@@ -1183,6 +1439,7 @@ class App:
         # 保存動畫引用，避免被垃圾回收
         setattr(self, f"{station_name}_animation", anim)
 
+    @timed("App.update_plot")
     def update_plot(self, frame, station_name, active_ch_list=None):
         """更新圖表"""
         artists = []
@@ -1199,23 +1456,14 @@ class App:
         # 取得 active_ch_list
         if active_ch_list is None:
             active_ch_list = self.get_enabled_channel(station_name)
-        # --- 新增：同步更新 plot 頁面的 channel_alias_label ---
-        channel_alias_label = getattr(self, f"{station_name}_channel_alias_label", None)
-        ch_aliases = getattr(self, f"{station_name}_ch_aliases", None)
-        # 取得參數頁的 ch_label
-        channel_check = getattr(self, f"{station_name}_channel_check", None)
-        if channel_alias_label and ch_aliases and channel_check:
-            for i in range(20):
-                # 1. 先複製參數頁 ch_label 的標籤名稱
-                label_text = f"{i+1}"
-                # 2. 若 alias_entry 有值, 以 alias_entry 的內容取代
-                if ch_aliases[i].get():
-                    label_text = ch_aliases[i].get()
-                channel_alias_label[i].config(text=label_text)
+        # 同步更新 plot 頁面的 channel_alias_label (隱藏時略過, 切換到該頁面時補上)
+        if self.station_tab_visible(station_name):
+            self.update_alias_labels(station_name)
 
 
         # 更新圖表
         if figure and ax_temp and ax_power and not self.pause_plot[station_name]:
+            render_started = time.perf_counter()
             # 清除舊數據
             ax_temp.clear()
             ax_power.clear()
@@ -1249,12 +1497,30 @@ class App:
             ax_temp.yaxis.grid(True)
             ax_power.yaxis.grid(True)
 
+            # 依顯示範圍挑選彙總層: 每個點代表的秒數超過彙總區間時, 以 bucket 平均值取代原始資料
+            start_ts = self.x_start[station_name].timestamp()
+            end_ts = self.x_end[station_name].timestamp()
+            resolution = (end_ts - start_ts) / PLOT_MAX_POINTS
+            rollup = self.rollups.get(station_name)
+            tier = rollup.select_tier(start_ts, resolution) if rollup else None
+            if tier is not None:
+                centers, mean = tier.series(start_ts, end_ts + 1)
+                x_values = [datetime.fromtimestamp(t) for t in centers]
+                power_values = mean[:, POWER_COLUMN]
+            else:
+                visible_data = rows_between(plot_data, start_ts, end_ts + 1)
+                x_values = [data[0] for data in visible_data]
+                power_values = [data[2][2] if isinstance(data[2], list) and len(data[2]) > 2 else None for data in visible_data]
+
             # 只顯示 active_ch_list 設定的頻道
             for ch_info in active_ch_list:
                 i, alias, channel_num = ch_info
-                temp_values = [data[1][i] for data in plot_data]
+                if tier is not None:
+                    temp_values = mean[:, i]
+                else:
+                    temp_values = [data[1][i] for data in visible_data]
                 label = alias if alias else f"Ch{channel_num}"
-                line, = ax_temp.plot([data[0] for data in plot_data], temp_values, label=label)
+                line, = ax_temp.plot(x_values, temp_values, label=label)
                 artists.append(line)
             # 只顯示啟用的頻道圖例, 若沒設定alias則顯示頻道index
             if active_ch_list:
@@ -1263,11 +1529,16 @@ class App:
                     loc="upper left",
                     prop=self.font_prop)
                 artists.append(legend)
+            # 穩定區段底色
+            steady_since = self.steady_since.get(station_name)
+            if steady_since is not None and steady_since < self.x_end[station_name]:
+                artists.append(ax_temp.axvspan(max(steady_since, self.x_start[station_name]), self.x_end[station_name],
+                                               color="green", alpha=0.1))
             # 更新電力圖表
-            # 修正：power_data 是 list，應用索引而不是字典 key
-            power_values = [data[2][2] if isinstance(data[2], list) and len(data[2]) > 2 else None for data in plot_data]
-            power_line, = ax_power.plot([data[0] for data in plot_data], power_values, label="Power")
+            power_line, = ax_power.plot(x_values, power_values, label="Power")
             artists.append(power_line)
+            REGISTRY.histogram("render_seconds", "update_plot 圖表更新時間", station=station_name).observe(
+                time.perf_counter() - render_started)
         return artists
 
     def _on_showtemp_drag(self, station_name, x_pos):
@@ -1286,13 +1557,13 @@ class App:
         if not plot_data:
             return
         # 找到最接近 dt 的資料
-        closest = min(plot_data, key=lambda x: abs(x[0] - dt))
+        closest = plot_data.nearest(dt)
         temps = closest[1]
         channel_labels = self.plot_channel_labels.get(station_name, {})
         for i, (ch_num) in enumerate(self.gx20_instance.channel_number[station_name]):
             label = channel_labels.get(ch_num)
             if label:
-                label.config(text=f"{temps[i]:.1f}" if temps[i] is not None else "--")
+                self.set_label_text(label, f"{temps[i]:.1f}" if temps[i] is not None else "--")
         # 更新開始時間與結束時間
         if start_date_entry and start_time_entry:
             start_date_entry.delete(0, tk.END)
@@ -1334,10 +1605,7 @@ class App:
                 for d in draggables:
                     # 解除事件綁定
                     try:
-                        d.line.figure.canvas.mpl_disconnect(d.cid_press)
-                        d.line.figure.canvas.mpl_disconnect(d.cid_release)
-                        d.line.figure.canvas.mpl_disconnect(d.cid_motion)
-                        d.line.remove()
+                        d.disconnect()
                     except Exception:
                         pass
                 self._pause_draggables[station_name] = []
@@ -1430,26 +1698,16 @@ class App:
         try:
             # 計算平均值
             plot_data = self.plot_data[station_name]
-            filtered_data = [data for data in plot_data if start_datetime <= data[0] <= end_datetime]
-            if len(filtered_data) == 0:
+            start_ts = start_datetime.to_pydatetime().timestamp()
+            end_ts = end_datetime.to_pydatetime().timestamp()
+            if count_between(plot_data, start_ts, float(np.nextafter(end_ts, np.inf))) == 0:
                 self.show_error_dialog("錯誤", "計算平均-在指定範圍內沒有數據")
                 return
 
-            # 排除 None 的數據再計算平均
-            temp_arrays = []
-            for i in range(len(filtered_data[0][1])):
-                # 取出第 i 個 channel 的所有數據，排除 None
-                ch_values = [data[1][i] for data in filtered_data if data[1][i] is not None]
-                if ch_values:
-                    temp_arrays.append(ch_values)
-                else:
-                    temp_arrays.append([])  # 若全為 None，則為空列表
-            avg_temp = []
-            for ch_values in temp_arrays:
-                if ch_values:
-                    avg_temp.append(np.mean(ch_values))
-                else:
-                    avg_temp.append(float('nan'))
+            # 由彙總層取完整區間, 兩端不足的部分才讀原始資料; 排除 None 的數據再計算平均
+            rollup = self.rollups.get(station_name) or StationRollup([])
+            acc = rollup.aggregate(start_ts, end_ts, lambda s, e: arrays_between(plot_data, s, e))
+            avg_temp = list(acc.mean()[:len(plot_data[0][1])])
 
             # 顯示平均溫度到 plot_channel_labels
             channel_labels = getattr(self, f"{station_name}_channel_labels", None)
@@ -1457,9 +1715,9 @@ class App:
                 for i, label in enumerate(channel_labels.values()):
                     if i < len(avg_temp):
                         if not np.isnan(avg_temp[i]):
-                            label.config(text=f"({avg_temp[i]:.1f})")
+                            self.set_label_text(label, f"({avg_temp[i]:.1f})")
                         else:
-                            label.config(text="(nan)")
+                            self.set_label_text(label, "(nan)")
             #print(avg_text)
         except Exception as e:
             self.show_error_dialog("錯誤", f"計算平均值時發生錯誤: {e}")
@@ -1477,23 +1735,106 @@ class App:
         temp_r_entry_var = tk.StringVar(value="3.0")
         temp_r_entry = ttk.Entry(model_frame, width=5, textvariable=temp_r_entry_var, foreground="black")
         temp_r_entry.grid(row=2, column=4, padx=5, pady=5, sticky="w")
+        # 最佳區間: F/R 溫度頻道 (以逗號分隔的頻道編號) 與區間長度
+        ttk.Label(model_frame, text="F頻道:").grid(row=3, column=1, padx=5, pady=5, sticky="w")
+        f_channels_var = tk.StringVar(value="1")
+        ttk.Entry(model_frame, width=5, textvariable=f_channels_var, foreground="black").grid(row=3, column=2, padx=5, pady=5, sticky="w")
+        ttk.Label(model_frame, text="R頻道:").grid(row=3, column=3, padx=5, pady=5, sticky="w")
+        r_channels_var = tk.StringVar(value="2")
+        ttk.Entry(model_frame, width=5, textvariable=r_channels_var, foreground="black").grid(row=3, column=4, padx=5, pady=5, sticky="w")
+        sweep_length_var = tk.StringVar(value="24hrs")
+        sweep_length_menu = ttk.Combobox(model_frame, textvariable=sweep_length_var, state="readonly", width=8, foreground="black")
+        sweep_length_menu['values'] = list(SWEEP_WINDOWS)
+        sweep_length_menu.grid(row=3, column=5, padx=5, pady=5, sticky="w")
+        # 除霜/開門事件
+        ttk.Label(model_frame, text="事件:").grid(row=4, column=1, padx=5, pady=5, sticky="w")
+        event_mode_var = tk.StringVar(value=EVENT_MODES[0])
+        event_mode_menu = ttk.Combobox(model_frame, textvariable=event_mode_var, state="readonly", width=8, foreground="black")
+        event_mode_menu['values'] = EVENT_MODES
+        event_mode_menu.grid(row=4, column=2, columnspan=2, padx=5, pady=5, sticky="w")
         
         ttk.Button(frame, text="計算平均值", command=lambda: self.snapshot_report(station_name)).grid(row=0, column=1, pady=10)
         ttk.Button(frame, text="儲存結果", command=lambda: self.save_results(station_name)).grid(row=0, column=2, pady=10)
+        ttk.Button(frame, text="檔案報告", command=lambda: self.file_report(station_name)).grid(row=0, column=3, pady=10)
+        ttk.Button(frame, text="最佳區間", command=lambda: self.find_best_window(station_name)).grid(row=0, column=4, pady=10)
+        ttk.Button(frame, text="周期統計", command=lambda: self.phase_report(station_name)).grid(row=0, column=5, pady=10)
 
 
         report_text = tk.Text(frame, height=30, width=100, wrap="word", foreground="black")
-        report_text.grid(row=1, column=0, columnspan=3, padx=5, pady=5)
+        report_text.grid(row=1, column=0, columnspan=6, padx=5, pady=5)
         report_text.insert(tk.END, "NA\n")
         
         setattr(self, f"{station_name}_report_text", report_text)
+        setattr(self, f"{station_name}_f_channels_var", f_channels_var)
+        setattr(self, f"{station_name}_r_channels_var", r_channels_var)
+        setattr(self, f"{station_name}_sweep_length_var", sweep_length_var)
+        setattr(self, f"{station_name}_event_mode_var", event_mode_var)
         setattr(self, f"{station_name}_temp_f_entry_var", temp_f_entry_var)
         setattr(self, f"{station_name}_temp_r_entry_var", temp_r_entry_var)
         setattr(self, f"{station_name}_temp_f_entry", temp_f_entry)
         setattr(self, f"{station_name}_temp_r_entry", temp_r_entry)
 
-    def snapshot_report(self, station_name):
-        """生成報告"""
+    def reset_live_efficiency(self, station_name):
+        """依選擇的時間窗重建即時能效的 WP 斜率 (接續測試或切換時間窗時由既有資料填入)"""
+        live_window_var = getattr(self, f"{station_name}_live_window_var", None)
+        window = LIVE_EF_WINDOWS.get(live_window_var.get() if live_window_var else "", LIVE_EF_WINDOWS["6hrs"])
+        slope = RollingSlope(window)
+        plot_data = self.plot_data.get(station_name)
+        if plot_data:
+            last_ts = plot_data[-1][0].timestamp()
+            times, values = arrays_between(plot_data, last_ts - window, float(np.nextafter(last_ts, np.inf)))
+            slope.extend(times, values[:, WP_COLUMN])
+        self.live_slopes[station_name] = slope
+        self.show_live_efficiency(station_name)
+
+    def reset_steady_state(self, station_name):
+        """重建溫度穩定判定 (接續測試時以既有資料填入最近一個時間窗)"""
+        detector = SteadyStateDetector(STEADY_WINDOW_SECONDS, STEADY_DRIFT_LIMIT)
+        self.steady_detectors[station_name] = detector
+        self.steady_since[station_name] = None
+        plot_data = self.plot_data.get(station_name)
+        if plot_data:
+            last_ts = plot_data[-1][0].timestamp()
+            times, values = arrays_between(plot_data, last_ts - STEADY_WINDOW_SECONDS, float(np.nextafter(last_ts, np.inf)))
+            for t, temps in zip(times.tolist(), values[:, :20].tolist()):
+                detector.add(t, temps)
+            since = detector.station_since([ch[0] for ch in self.get_enabled_channel(station_name)])
+            self.steady_since[station_name] = datetime.fromtimestamp(since) if since is not None else None
+
+    def update_steady_state(self, station_name, now, temp_data, active_ch_list):
+        """加入一筆溫度並更新穩定狀態; 勾選的頻道全部穩定時視為工位穩定"""
+        detector = self.steady_detectors.get(station_name)
+        if detector is None:
+            return
+        detector.add(now.timestamp(), temp_data)
+        since = detector.station_since([ch[0] for ch in active_ch_list])
+        if since is not None and self.steady_since.get(station_name) is None:
+            self.steady_since[station_name] = datetime.fromtimestamp(since)
+            log_info(f"{station_name} 溫度已穩定 (自 {self.steady_since[station_name]:%Y-%m-%d %H:%M:%S}, "
+                     f"{STEADY_WINDOW_SECONDS / 3600:g} 小時漂移 ≤ {STEADY_DRIFT_LIMIT}°C/h)")
+        elif since is None and self.steady_since.get(station_name) is not None:
+            self.steady_since[station_name] = None
+            log_info(f"{station_name} 溫度離開穩定狀態")
+
+    def show_live_efficiency(self, station_name):
+        """主執行緒: 更新即時能效顯示, 每筆樣本只需 O(1) 計算"""
+        live_labels = getattr(self, f"{station_name}_live_labels", None)
+        slope = self.live_slopes.get(station_name)
+        if not live_labels or slope is None:
+            return
+        self.set_label_text(live_labels["span"], f"{slope.span() / 3600:.1f} / {slope.window_seconds / 3600:.0f} hr")
+        daily, results = live_efficiency(slope.slope(), self.report_params(station_name), self.EnergyCalculator)
+        self.set_label_text(live_labels["daily"], f"{daily:.3f} kWh" if daily is not None else "--")
+        if results:
+            self.set_label_text(live_labels["ef"], f"{results['EF值']}")
+            self.set_label_text(live_labels["grade_2018"], f"{results['2018年效率等級']} ({results['2018年一級效率百分比(%)']}%)")
+            self.set_label_text(live_labels["grade_2027"], f"{results['2027年效率等級']} ({results['2027年一級效率百分比(%)']}%)")
+        else:
+            for key in ("ef", "grade_2018", "grade_2027"):
+                self.set_label_text(live_labels[key], "--")
+
+    def report_window(self, station_name):
+        """讀取 REPORT 的統計區間與 On/Off 門檻, 格式錯誤時回傳 None"""
         start_date = getattr(self, f"{station_name}_start_date_entry", None)
         start_time = getattr(self, f"{station_name}_start_time_entry", None)
         end_date = getattr(self, f"{station_name}_end_date_entry", None)
@@ -1505,175 +1846,163 @@ class App:
             start_time = start_time.get() if start_time else ""
             end_date = end_date.get() if end_date else ""
             end_time = end_time.get() if end_time else ""
-            start_datetime = pd.to_datetime(f"{start_date} {start_time}")
-            end_datetime = pd.to_datetime(f"{end_date} {end_time}")
+            start_datetime = pd.to_datetime(f"{start_date} {start_time}").to_pydatetime()
+            end_datetime = pd.to_datetime(f"{end_date} {end_time}").to_pydatetime()
             onoffthrottle = int(onoffthrottle.get()) if onoffthrottle else 0 #2025/9/2 新增計算on/off比例的門檻設定
             if start_datetime >= end_datetime:
                 raise ValueError("結束時間必須晚於開始時間")
         except ValueError as e:
             self.show_error_dialog("錯誤", f"計算:無效的日期或時間格式: {e}")
+            return None
+        return start_datetime, end_datetime, onoffthrottle
+
+    def report_params(self, station_name):
+        """能耗計算參數: 容量, 風扇類型與 snapshot 頁面上的溫度設定"""
+        vf_entry = getattr(self, f"{station_name}_vf_entry", None)
+        vr_entry = getattr(self, f"{station_name}_vr_entry", None)
+        fan_type_var = getattr(self, f"{station_name}_fan_type_var", None)
+        temp_f_entry = getattr(self, f"{station_name}_temp_f_entry", None)
+        temp_r_entry = getattr(self, f"{station_name}_temp_r_entry", None)
+        def is_float(val):
+            try:
+                float(val)
+                return True
+            except (ValueError, TypeError):
+                return False
+        return {
+            "vf": float(vf_entry.get()) if vf_entry and vf_entry.get().isdigit() else 0,
+            "vr": float(vr_entry.get()) if vr_entry and vr_entry.get().isdigit() else 0,
+            "fan_type": fan_type_var.get() if fan_type_var is not None else 0,  # 取得風扇類型的狀態
+            "temp_f": float(temp_f_entry.get()) if temp_f_entry and is_float(temp_f_entry.get()) else 0,
+            "temp_r": float(temp_r_entry.get()) if temp_r_entry and is_float(temp_r_entry.get()) else 0,
+        }
+
+    def show_report(self, station_name, report):
+        report_text = getattr(self, f"{station_name}_report_text", None)
+        if report_text is not None:
+            report_text.delete(1.0, tk.END)  # 清空文字框
+            report_text.insert(tk.END, format_report(report))
+        if not report["results"]:
+            print("無耗電量數據,無法計算能耗")
+
+    @timed("App.snapshot_report")
+    def snapshot_report(self, station_name):
+        """生成報告"""
+        window = self.report_window(station_name)
+        if window is None:
             return
-        #print(f"start_date: {start_date}, start_time: {start_time}")
-        #print(f"end_date: {end_date}, end_time: {end_time}")
+        start_datetime, end_datetime, onoffthrottle = window
         try:
-            # 展開 plot_data
-            # example: plot_data[station_name] = [[datetime, [20個溫度], [電壓、電流、功率、累積功率]]]
-            # plot_data-工位1: [datetime.datetime(2025, 5, 21, 9, 38, 4, 915350), [-11.6, -13.2, 29.9, -17.9, -14.3, -13.1, -10.2, 30.0, 29.9, 29.9, 29.7, 29.8, 29.9, 29.8, 29.8, 29.9, 29.9, 29.9, 30.0, 29.9], [110.02, 0.7605, 44.0, 27.513]]
-            records = []
-            for row in self.plot_data[station_name]:
-                dt = row[0]
-                temps = row[1]  # 20個溫度
-                power = row[2]  # list[電壓、電流、功率、累積功率]
-                record = {
-                    "datetime": dt,
-                }
-                # 加入溫度
-                for i in range(20):
-                    record[f"Ch{i+1}"] = temps[i] if temps and i < len(temps) else None
-                # 加入電力
-                record["功率"] = power[2]
-                record["累積功率"] = power[3]
-                records.append(record)
-            #print(f"records: {records}")
-            # 轉換為 DataFrame
-            df = pd.DataFrame(records)
-            # 轉換 datetime 欄位為 datetime 格式
-            df["datetime"] = pd.to_datetime(df["datetime"])
-            # 設定 datetime 為索引
-            df.set_index("datetime", inplace=True)
-            # 設定開始與結束時間
-            df = df.loc[start_datetime:end_datetime]
-            # 計算 start 和 end 之間的分鐘數
-            time_diff = round((end_datetime - start_datetime).total_seconds() / 60, 1)
-            #print(f"時間差: {time_diff} 分鐘")
-            # 取temps計算平均值avg_temp
-            from typing import Optional
-            avg_temp: list[Optional[float]] = [None] * 20
-            for i in range(20):
-                temp_column = f"Ch{i+1}"
-                if temp_column in df.columns:
-                    avg = round(df[temp_column].mean(), 1) if not df[temp_column].isnull().all() else None
-                    avg_temp[i] = avg
-            #print(f"平均溫度: {avg_temp}")
-
-            avg_power = round(df["功率"].mean(), 1)
-            #print(f"平均溫度: {avg_temp}")
-            #print(f"平均功率: {avg_power}")
-             # 計算電力啟停周期,大於 3W才算啟動
-            power_column = '功率'
-            if power_column in df.columns:
-                # 確保正確建立 power_on 欄位
-                df.loc[:, 'power_on'] = df[power_column] >= onoffthrottle #2025/9/2 新增計算on/off比例的門檻設定
-                # 計算啟停周期次數
-                power_cycles = int(df['power_on'].astype(int).diff().fillna(0).abs().sum() // 2)
-                # 計算大於等於onoffthrottle和小於onoffthrottle的週期數，排除頭尾兩個周期
-                mask = df['power_on']
-                groups = (mask != mask.shift()).cumsum()
-                segments = pd.DataFrame({
-                    '狀態': mask,
-                    '區段編號': groups,
-                    '時間': df.index
-                }).groupby(['區段編號', '狀態']).agg({'時間': ['min', 'max']}).reset_index()
-
-                # 排除頭尾兩個周期
-                if len(segments) > 2:
-                    segments = segments.iloc[1:-1]
-
-                # 計算每個區段的持續時間
-                segments['持續時間'] = (segments[('時間', 'max')] - segments[('時間', 'min')]).dt.total_seconds()
-
-                # 分別計算大於等於,以及小於onoffthrottle的週期數與平均時間
-                above_segments = segments[segments['狀態']]
-                below_segments = segments[~segments['狀態']]
-
-                above_count = len(above_segments)
-                below_count = len(below_segments)
-
-                above_avg_time = (above_segments['持續時間'].mean() / 60) if above_count > 0 else 0
-                below_avg_time = (below_segments['持續時間'].mean() / 60) if below_count > 0 else 0
-
-                # 計算百分比
-                if above_avg_time + below_avg_time > 0:
-                    above_percentage = (above_avg_time / (above_avg_time + below_avg_time)) * 100
-                else:
-                    above_percentage = 0
-                #print(f"啟動次數: {power_cycles}, 大於等於3W的週期數: {above_count}, 小於3W的週期數: {below_count}")
-                #print(f"大於等於3W的平均時間: {above_avg_time:.2f} 分鐘, 小於3W的平均時間: {below_avg_time:.2f} 分鐘")
-                        # 計算 WP(Wh) 欄位的差值
-            wp_column = '累積功率'
-            if wp_column in df.columns:
-                wp_difference = df[wp_column].iloc[-1] - df[wp_column].iloc[0]
-                
-                # 使用線性法推算 24 小時的差值
-                total_seconds = (df.index[-1] - df.index[0]).total_seconds()
-                if (total_seconds > 0):
-                    wp_24h_difference = round((wp_difference / total_seconds) * (24 * 3600),1)
-                else:
-                    wp_24h_difference = 0
-            #print(f"WP(Wh) 差值: {wp_difference}, 24 小時的差值: {wp_24h_difference}")
-
-            # 計算能耗
-            vf_entry = getattr(self, f"{station_name}_vf_entry", None)
-            vr_entry = getattr(self, f"{station_name}_vr_entry", None)
-            fan_type_var = getattr(self, f"{station_name}_fan_type_var", None)
-            vf = float(vf_entry.get()) if vf_entry and vf_entry.get().isdigit() else 0
-            vr = float(vr_entry.get()) if vr_entry and vr_entry.get().isdigit() else 0
-            fan_type_var = getattr(self, f"{station_name}_fan_type_var", None)
-            fan_type = fan_type_var.get() if fan_type_var is not None else 0  # 取得風扇類型的狀態
-            #取得snapshot頁面上的溫度設定
-            temp_f_entry = getattr(self, f"{station_name}_temp_f_entry", None)
-            temp_r_entry = getattr(self, f"{station_name}_temp_r_entry", None)
-            def is_float(val):
-                try:
-                    float(val)
-                    return True
-                except (ValueError, TypeError):
-                    return False
-            temp_f = float(temp_f_entry.get()) if temp_f_entry and is_float(temp_f_entry.get()) else 0
-            temp_r = float(temp_r_entry.get()) if temp_r_entry and is_float(temp_r_entry.get()) else 0
-            #print(f"vf: {vf}, vr: {vr}, fan_type: {fan_type}")
-            #print(f"temp_f: {temp_f}, temp_r: {temp_r}")
-            ef = EnergyCalculator()
-            if isinstance(wp_24h_difference, (int, float)) and vf > 0 and vr > 0:
-                daily_consumption = round(wp_24h_difference / 1000, 3)  # 將 Wh 轉換為 kWh
-                #print(f"每日耗電量: {daily_consumption} kWh")
-                # 計算
-                results = ef.calculate(vf, vr, daily_consumption, temp_f, temp_r, fan_type)
-                #print(f"能耗計算結果: {results}")
-            else:
-                results = None
-                print("無耗電量數據,無法計算能耗")
+            # 統計範圍包含結束時間那一筆
+            times, values = arrays_between(self.plot_data[station_name], start_datetime.timestamp(),
+                                           float(np.nextafter(end_datetime.timestamp(), np.inf)))
+            params = self.report_params(station_name)
+            report = report_from_arrays(times, values, start_datetime, end_datetime, onoffthrottle,
+                                        params, self.EnergyCalculator)
+            report["steady_since"] = self.steady_since.get(station_name)
+            event_mode_var = getattr(self, f"{station_name}_event_mode_var", None)
+            event_mode = event_mode_var.get() if event_mode_var else EVENT_MODES[0]
+            if event_mode != EVENT_MODES[0]:
+                report["events"], report["event_info"] = detect_events(times, values, onoffthrottle)
+                if event_mode == "排除事件":
+                    report["excluded"] = summary_excluding(times, values, report["events"], params, self.EnergyCalculator)
+            self.show_report(station_name, report)
+        except Exception as e:
+            self.show_error_dialog("錯誤", f"生成報告時發生錯誤: {e}")
+            return
 
-            # 顯示結果
+    def phase_report(self, station_name):
+        """統計範圍內各勾選頻道依壓縮機 On/Off 狀態與逐周期的統計"""
+        window = self.report_window(station_name)
+        if window is None:
+            return
+        start_datetime, end_datetime, onoffthrottle = window
+        try:
+            times, values = arrays_between(self.plot_data[station_name], start_datetime.timestamp(),
+                                           float(np.nextafter(end_datetime.timestamp(), np.inf)))
+            if len(times) == 0:
+                raise ValueError("統計範圍內沒有資料")
+            stats = phase_statistics(times, values, onoffthrottle)
+            channels = [(ch[0], ch[1]) for ch in self.get_enabled_channel(station_name)]
             report_text = getattr(self, f"{station_name}_report_text", None)
             if report_text is not None:
-                report_text.delete(1.0, tk.END)  # 清空文字框
-                report_text.insert(tk.END, f"統計範圍：{start_datetime} ~ {end_datetime}\n")
-                report_text.insert(tk.END, f"筆數: {len(df)}\n")
-                report_text.insert(tk.END, f"時間: {time_diff} 分鐘\n")
-                report_text.insert(tk.END, f"平均溫度:\n")
-                for i in range(20):
-                    if avg_temp[i] is not None:
-                        report_text.insert(tk.END, f"Ch{i+1}: {avg_temp[i]:.1f}\n")
-                    else:
-                        report_text.insert(tk.END, f"Ch{i+1}: --\n")
-                report_text.insert(tk.END, f"平均功率: {avg_power} W\n")
-                report_text.insert(tk.END, f"\nON / Off 周期次數：{power_cycles}\n")
-                report_text.insert(tk.END, f"壓縮機判定關閉門檻：{onoffthrottle}\n") #2025/9/2 新增計算on/off比例的門檻設定
-                report_text.insert(tk.END, f"On 的平均時間: {above_avg_time:.1f} 分\n" if above_count > 0 else "On 的平均時間: 無資料\n")
-                report_text.insert(tk.END, f"Off 的平均時間: {below_avg_time:.1f} 分\n" if below_count > 0 else "Off 的平均時間: 無資料\n")
-                report_text.insert(tk.END, f"On / Off 百分比: {above_percentage:.2f}%\n")
-                report_text.insert(tk.END, f"\n電力消耗：{wp_difference:.2f} w / {time_diff} 分\n")
-                report_text.insert(tk.END, f"24 小時電力消耗：{wp_24h_difference:.1f} w\n")
-                report_text.insert(tk.END, f"\n能耗計算：\n")
-                if results:
-                    for key, value in results.items():
-                        report_text.insert(tk.END, f"{key}: {value}\n")
-                else:
-                    report_text.insert(tk.END, "無法計算能耗，請檢查數據\n")
+                report_text.delete(1.0, tk.END)
+                report_text.insert(tk.END, f"統計範圍：{start_datetime} ~ {end_datetime}\n" + format_phase_statistics(stats, channels))
+        except Exception as e:
+            self.show_error_dialog("錯誤", f"周期統計時發生錯誤: {e}")
+
+    def file_report(self, station_name):
+        """對已存檔的 CSV 計算同一區間的報告, 分段讀取不需載入整個檔案"""
+        window = self.report_window(station_name)
+        if window is None:
+            return
+        start_datetime, end_datetime, onoffthrottle = window
+        file_path_var = getattr(self, f"{station_name}_file_path_var", None)
+        file_name = filedialog.askopenfilename(initialdir=file_path_var.get() if file_path_var else None,
+                                               filetypes=[("CSV files", "*.csv")])
+        if not file_name:
+            return
+        try:
+            entry = self.catalog_indexer.catalog(os.path.dirname(file_name)).entry_for(file_name)
+            report = report_from_csv(file_name, start_datetime, end_datetime, onoffthrottle,
+                                     self.report_params(station_name), self.EnergyCalculator, entry)
+            self.show_report(station_name, report)
+            log_info(f"{station_name} 檔案報告 {file_name}: {report['rows']} 筆")
         except Exception as e:
             self.show_error_dialog("錯誤", f"生成報告時發生錯誤: {e}")
+
+    def find_best_window(self, station_name):
+        """掃描整個測試的候選區間, 列出符合 F/R 溫度設定的區間, 並將第一名填入統計範圍"""
+        plot_data = self.plot_data.get(station_name)
+        if not plot_data:
+            self.show_error_dialog("錯誤", f"{station_name} 沒有資料")
+            return
+        try:
+            def channels(name):
+                var = getattr(self, f"{station_name}_{name}", None)
+                return [int(ch) - 1 for ch in var.get().replace(" ", "").split(",") if ch] if var else []
+            f_channels, r_channels = channels("f_channels_var"), channels("r_channels_var")
+            if not all(0 <= ch < 20 for ch in f_channels + r_channels):
+                raise ValueError("頻道編號必須為 1~20")
+            sweep_length_var = getattr(self, f"{station_name}_sweep_length_var", None)
+            length_seconds, cycles = SWEEP_WINDOWS[sweep_length_var.get() if sweep_length_var else "24hrs"]
+            onoffthrottle = getattr(self, f"{station_name}_onoffthrottle_entry", None)
+            onoffthrottle = int(onoffthrottle.get()) if onoffthrottle else 0
+            params = self.report_params(station_name)
+            times, values = arrays_between(plot_data, plot_data[0][0].timestamp(),
+                                           float(np.nextafter(plot_data[-1][0].timestamp(), np.inf)))
+            t0 = time.perf_counter()
+            windows = sweep_windows(times, values, length_seconds, cycles, f_channels, r_channels,
+                                    f_max=params["temp_f"] if f_channels else None,
+                                    r_max=params["temp_r"] if r_channels else None,
+                                    onoffthrottle=onoffthrottle)
+            log_info(f"{station_name} 最佳區間掃描 {len(times)} 筆, 耗時 {time.perf_counter() - t0:.3f} 秒")
+        except Exception as e:
+            self.show_error_dialog("錯誤", f"掃描區間時發生錯誤: {e}")
             return
+        report_text = getattr(self, f"{station_name}_report_text", None)
+        if report_text is not None:
+            report_text.delete(1.0, tk.END)
+            report_text.insert(tk.END, f"F ≤ {params['temp_f']}°C, R ≤ {params['temp_r']}°C, 依 24 小時耗電量排序:\n")
+            if not windows:
+                report_text.insert(tk.END, "沒有符合溫度條件的區間\n")
+            for rank, window in enumerate(windows, 1):
+                report_text.insert(
+                    tk.END,
+                    f"{rank}. {window['start']:%Y-%m-%d %H:%M:%S} ~ {window['end']:%Y-%m-%d %H:%M:%S}  "
+                    f"F: {window['f_temp']:.2f}  R: {window['r_temp']:.2f}  "
+                    f"24 小時: {window['wp_24h']:.1f} w  周期: {window['power_cycles']}  On: {window['duty']:.1f}%\n")
+        if windows:
+            # 統計範圍以秒為單位: 開始時間無條件捨去, 結束時間無條件進位, 確保包含區間頭尾的資料
+            start = windows[0]["start"].replace(microsecond=0)
+            end = windows[0]["end"]
+            if end.microsecond:
+                end = end.replace(microsecond=0) + timedelta(seconds=1)
+            for name, value in [("start_date", f"{start:%Y-%m-%d}"), ("start_time", f"{start:%H:%M:%S}"),
+                                ("end_date", f"{end:%Y-%m-%d}"), ("end_time", f"{end:%H:%M:%S}")]:
+                var = getattr(self, f"{station_name}_{name}", None)
+                if var is not None:
+                    var.set(value)
 
     def save_results(self, station_name):
         """儲存報告"""
@@ -1698,6 +2027,15 @@ class App:
             )
             log_info(f"以下工位正在收集數據，請先停止數據收集再退出程序：\n{', '.join(active_stations)}")
         else:
+            if self.acquisition is not None:
+                self.acquisition.shutdown()
+            if self.metrics_server is not None:
+                self.metrics_server.stop()
+            if self.database is not None:
+                self.database.close()
+            self.catalog_indexer.stop()
+            self.catalog_indexer.join(timeout=CATALOG_JOIN_SECONDS)
+            self.stall_monitor.stop()
             self.root.destroy()
             log_info("程式已關閉")
 
@@ -1708,6 +2046,7 @@ class App:
         log_error(f"{title}: {message}")
     
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # pyinstaller 打包時支援擷取行程
     log_info("程式啟動")
     # 支援 pyinstaller 打包時找資源
     def resource_path(relative_path):
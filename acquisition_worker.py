@@ -0,0 +1,391 @@
+# SAMPO RD2 LAB Data Collection - 獨立擷取行程
+#-------------------------------------------------------------------------------
+# GX20/PW3335 的讀取與 CSV 存檔在獨立行程執行, 每筆樣本寫入 shared_memory 環形
+# 緩衝區; GUI 行程以唯讀方式對應同一塊記憶體取得資料, 不需經過 pickle 複製。
+# GUI 卡住不影響取樣與存檔。GUI 行程結束 (含異常結束) 後, 擷取行程停止所有工位並關閉 CSV 後結束,
+# 不留下無法停止的寫入端; 接續測試時由 CSV 補回日誌未收到的樣本。
+# 每個 CSV 寫入期間持有 CsvWriterLock ({CSV}.lock), 同一個 CSV 不會有兩個行程同時寫入。
+#
+# 共享記憶體配置:
+#   [0, 64)      header int64 x 8: [0]寫入筆數, [1]即時溫度 seqlock 計數(奇數表示寫入中),
+#                [2]即時溫度輪詢時間(us), [3]即時溫度的 GX20 快照序號
+#   [64, 1024)   即時溫度 float64 6x20, 供各工位即時顯示
+#   [1024, ...)  SAMPLE_RECORD x RING_CAPACITY 環形緩衝區
+#-------------------------------------------------------------------------------
+import csv
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from devices import GX20, BreakerOpenError, GX20Snapshot, PW3335, STATIONS, log_error, log_info, simulate_gx20_data
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+TEMP_CHANNELS = 20
+RING_CAPACITY = 65536  # 6 工位 x 10 秒一筆, 約可緩衝 30 小時
+
+SAMPLE_RECORD = np.dtype([
+    ("seq", "<i8"),       # 寫入序號 (從 1 開始), 寫入中為 -1
+    ("station", "<i8"),   # 工位索引 0~5
+    ("t", "<f8"),         # 時間戳記
+    ("temp", "<f8", (TEMP_CHANNELS,)),
+    ("power", "<f8", (4,)),
+    ("gx20_seq", "<i8"),  # 該筆溫度所使用的 GX20 快照序號
+])
+
+_HEADER_OFFSET = 0
+_LIVE_OFFSET = 64
+_RING_OFFSET = 1024
+
+
+class SampleRing:
+    """shared_memory 環形緩衝區, 單一寫入端(擷取行程), 多個唯讀讀取端(GUI)"""
+    def __init__(self, shm, readonly=False):
+        self.shm = shm
+        self.name = shm.name
+        buf = shm.buf
+        self.header = np.ndarray((8,), dtype=np.int64, buffer=buf, offset=_HEADER_OFFSET)
+        self.live = np.ndarray((len(STATIONS), TEMP_CHANNELS), dtype=np.float64, buffer=buf, offset=_LIVE_OFFSET)
+        self.records = np.ndarray((RING_CAPACITY,), dtype=SAMPLE_RECORD, buffer=buf, offset=_RING_OFFSET)
+        self._lock = threading.Lock()
+        if readonly:
+            for array in (self.header, self.live, self.records):
+                array.flags.writeable = False
+
+    @classmethod
+    def create(cls):
+        size = _RING_OFFSET + SAMPLE_RECORD.itemsize * RING_CAPACITY
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        ring = cls(shm)
+        ring.header[:] = 0
+        ring.live[:] = 999.9
+        ring.records["seq"] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name):
+        return cls(shared_memory.SharedMemory(name=name), readonly=True)
+
+    def publish(self, station_index, ts, temps, power, gx20_seq=0):
+        """寫入一筆樣本, None 以 NaN 表示"""
+        with self._lock:
+            n = int(self.header[0])
+            record = self.records[n % RING_CAPACITY]
+            record["seq"] = -1
+            record["station"] = station_index
+            record["t"] = ts
+            record["temp"] = [np.nan if v is None else v for v in temps[:TEMP_CHANNELS]]
+            record["power"] = [np.nan if v is None else v for v in power[:4]]
+            record["gx20_seq"] = gx20_seq
+            record["seq"] = n + 1
+            self.header[0] = n + 1
+
+    def publish_live(self, snapshot):
+        """更新即時溫度快照 (GX20 每次輪詢後呼叫), 以 seqlock 保護讓讀取端不必加鎖"""
+        with self._lock:
+            self.header[1] += 1
+            self.live[:] = snapshot.temps
+            self.header[2] = int(snapshot.poll_time.timestamp() * 1e6)
+            self.header[3] = snapshot.seq
+            self.header[1] += 1
+
+    def live_snapshot(self):
+        """讀取即時溫度快照: (序號, 輪詢時間, 6x20 溫度複本); 讀取期間若有寫入則重讀"""
+        while True:
+            begin = int(self.header[1])
+            if begin % 2 == 0:
+                temps = self.live.copy()
+                seq = int(self.header[3])
+                poll_us = int(self.header[2])
+                if int(self.header[1]) == begin:
+                    poll_time = datetime.fromtimestamp(poll_us / 1e6) if seq else None
+                    return seq, poll_time, temps
+            time.sleep(0)
+
+    def read(self, cursor, retries=3):
+        """
+        讀取 cursor 之後的樣本, 回傳 (樣本陣列複本, 新 cursor, 被覆蓋而遺失的筆數)。
+        每筆以 seq 當 seqlock: 複製前後的 seq 都等於預期序號才算完整; 複製期間被寫入端
+        覆寫 (已繞過一圈) 時重新由目前最舊的有效位置讀取, 超過 retries 次則捨棄不完整的筆數。
+        遺失只影響 GUI 顯示, CSV 已由擷取行程寫入。
+        """
+        lost = 0
+        for _ in range(retries + 1):
+            end = int(self.header[0])
+            if end - cursor > RING_CAPACITY:
+                lost += end - RING_CAPACITY - cursor
+                cursor = end - RING_CAPACITY
+            if end <= cursor:
+                return self.records[:0].copy(), cursor, lost
+            expected = np.arange(cursor, end, dtype=np.int64)
+            index = expected % RING_CAPACITY
+            out = self.records[index]  # 複本
+            valid = (out["seq"] == expected + 1) & (self.records["seq"][index] == expected + 1)
+            if valid.all():
+                return out, end, lost
+        lost += int((~valid).sum())
+        return out[valid], end, lost
+
+    def close(self, unlink=False):
+        self.header = self.live = self.records = None
+        self.shm.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass  # GUI 異常結束時名稱可能已被 resource_tracker 移除, 對應的記憶體不受影響
+
+
+class CsvWriterLock:
+    """
+    CSV 檔的寫入鎖 ({CSV}.lock 的 OS 檔案鎖), 同一個 CSV 只允許一個寫入端。
+    鎖由作業系統在持有的行程結束時釋放, 異常結束也不會殘留。
+    """
+    def __init__(self, file_name):
+        self.path = file_name + ".lock"
+        self._file = None
+
+    def acquire(self):
+        """不等待; 已由其他寫入端持有時回傳 False"""
+        f = open(self.path, "a+b")
+        try:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        if os.name == "nt":
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass  # 其他行程正開啟時 (Windows) 留給最後一個寫入端刪除
+
+
+def csv_writer_active(file_name):
+    """是否有其他寫入端 (例如 GUI 結束時尚未停止的擷取行程) 正在寫入此 CSV"""
+    lock = CsvWriterLock(file_name)
+    if not lock.acquire():
+        return True
+    lock.release()
+    return False
+
+
+def record_to_row(record):
+    """將 SAMPLE_RECORD 轉為 plot_data 格式 [datetime, [20個溫度], [U, I, P, WP], GX20快照序號]"""
+    temps = [None if np.isnan(v) else v for v in record["temp"].tolist()]
+    power = [None if np.isnan(v) else v for v in record["power"].tolist()]
+    return [datetime.fromtimestamp(float(record["t"])), temps, power, int(record["gx20_seq"])]
+
+
+def _record_station(station_name, config, ring, current, stop_event, event_queue, debug_mode):
+    """
+    擷取行程內的單一工位記錄迴圈, 與 App.collect_data 相同的存檔格式。
+    無法開始或記錄中斷時送出 ("error", 工位, token, 訊息), 結束後由 run_worker 送出 "stopped"。
+    CSV 已由其他寫入端持有 CsvWriterLock 時不開始記錄。
+    """
+    station_index = STATIONS.index(station_name)
+    pw_ip = config["pw_ip"]
+    frequency = 1 if debug_mode else int(config["frequency"])
+    file_name = config["file_name"]
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    csv_lock = CsvWriterLock(file_name)
+    if not csv_lock.acquire():
+        log_error(f"acquisition_worker: {station_name} 的 {file_name} 仍由其他行程寫入中", station=station_name)
+        event_queue.put(("error", station_name, config.get("token"), f"{file_name} 仍由其他行程寫入中"))
+        return
+    pw = None
+    if not debug_mode:
+        try:
+            pw = PW3335(pw_ip)
+            pw.connect()
+        except Exception as e:
+            log_error(f"acquisition_worker: {station_name} 的 PW3335 {pw_ip} 未連線: {e}", station=station_name,
+                      device=f"pw3335@{pw_ip}")
+            event_queue.put(("error", station_name, config.get("token"), f"PW3335 {pw_ip} 未連線: {e}"))
+            csv_lock.release()
+            return
+    file_exists = os.path.exists(file_name)
+    try:
+        with open(file_name, mode="a", newline="", buffering=1, encoding="utf-8") as file:
+            writer = csv.writer(file)
+            if not file_exists:
+                writer.writerow(config["header"])
+            log_info(f"acquisition_worker: {station_name} 開始收集數據 {file_name}")
+            while not stop_event.is_set():
+                now = datetime.now()
+                snapshot = current[0]
+                temp_data = [None if v == 999.9 else v for v in snapshot.station(station_name)]
+                if pw is not None:
+                    query_started = time.perf_counter()
+                    try:
+                        power_data = pw.query_data()[:4]
+                    except BreakerOpenError:
+                        power_data = [None] * 4  # 斷路器開啟中未讀取, 報告與彙總視為無資料
+                    except Exception as e:
+                        log_error(f"acquisition_worker.pw.query_data()發生錯誤: {e} at {pw_ip}", station=station_name,
+                                  device=f"pw3335@{pw_ip}", latency=time.perf_counter() - query_started)
+                        power_data = [110.0, 1, 50, 1.1]
+                else:
+                    power_data = [110.0, 1, 50, 1.1]
+                writer.writerow([now.strftime("%Y-%m-%d"), now.strftime("%H:%M:%S")] + temp_data + power_data + [snapshot.seq])
+                ring.publish(station_index, now.timestamp(), temp_data, power_data, snapshot.seq)
+                stop_event.wait(timeout=frequency)
+    except Exception as e:
+        log_error(f"acquisition_worker: {station_name} 記錄錯誤: {e}", station=station_name)
+        event_queue.put(("error", station_name, config.get("token"), f"記錄錯誤: {e}"))
+    finally:
+        if pw is not None:
+            pw.disconnect()
+        csv_lock.release()
+        log_info(f"acquisition_worker: {station_name} 停止收集數據")
+
+
+def run_worker(command_queue, event_queue, debug_mode=False, gx20_host="192.168.1.1"):
+    """擷取行程進入點; 只匯入 devices (不含 GUI), 不會在擷取行程載入 tkinter/matplotlib"""
+    ring = SampleRing.create()
+    event_queue.put(("ready", ring.name))
+    gx20 = GX20(gx20_host)
+    # 目前的 GX20 快照, 輪詢執行緒以替換 current[0] 的方式發佈
+    current = [GX20Snapshot(0, None, [[999.9] * TEMP_CHANNELS] * len(STATIONS))]
+    stations = {}  # station_name -> (thread, stop_event, token)
+    shutdown = threading.Event()
+
+    def poll_gx20():
+        while not shutdown.is_set():
+            try:
+                data = simulate_gx20_data() if debug_mode else gx20.GX20GetData()
+                if data:
+                    current[0] = GX20Snapshot.from_dict(current[0].seq + 1, datetime.now(), data)
+                    ring.publish_live(current[0])
+            except Exception as e:
+                log_error(f"acquisition_worker: GX20 讀取錯誤: {e}")
+            shutdown.wait(5)
+
+    threading.Thread(target=poll_gx20, daemon=True).start()
+    parent = mp.parent_process()
+    while True:
+        try:
+            command = command_queue.get(timeout=1)
+        except queue.Empty:
+            command = None
+        except (EOFError, OSError):
+            command = None
+        for station_name in [s for s, (t, _, _) in stations.items() if not t.is_alive()]:
+            _, _, token = stations.pop(station_name)
+            event_queue.put(("stopped", station_name, token))
+        if command is None:
+            if parent is not None and not parent.is_alive():
+                # GUI 已結束: 沒有人能再停止這些工位, 關閉 CSV 並釋放寫入鎖, 之後由接續測試交給新的擷取行程
+                if stations:
+                    log_info(f"acquisition_worker: GUI 已結束, 停止記錄 {', '.join(stations)}")
+                break
+            continue
+        action = command[0]
+        if action == "start":
+            _, station_name, config = command
+            if station_name in stations:
+                continue
+            stop_event = threading.Event()
+            thread = threading.Thread(
+                target=_record_station,
+                args=(station_name, config, ring, current, stop_event, event_queue, debug_mode),
+                daemon=True)
+            stations[station_name] = (thread, stop_event, config.get("token"))
+            thread.start()
+        elif action == "stop":
+            entry = stations.pop(command[1], None)
+            if entry:
+                entry[1].set()
+                entry[0].join(timeout=5)
+                event_queue.put(("stopped", command[1], entry[2]))
+        elif action == "shutdown":
+            break
+    shutdown.set()
+    for thread, stop_event, _ in stations.values():
+        stop_event.set()
+        thread.join(timeout=5)
+    ring.close(unlink=True)
+    log_info("acquisition_worker: 擷取行程結束")
+
+
+class AcquisitionClient:
+    """GUI 端: 啟動擷取行程, 傳送工位指令並唯讀對應樣本緩衝區"""
+    def __init__(self, debug_mode=False, gx20_host="192.168.1.1", timeout=15):
+        ctx = mp.get_context("spawn")
+        self.command_queue = ctx.Queue()
+        self.event_queue = ctx.Queue()
+        # 非 daemon: GUI 結束時由擷取行程自行停止工位並關閉 CSV, 不會在寫入途中被終止
+        self.process = ctx.Process(target=run_worker, args=(self.command_queue, self.event_queue, debug_mode, gx20_host),
+                                   name="acquisition_worker", daemon=False)
+        self.process.start()
+        kind, name = self.event_queue.get(timeout=timeout)
+        if kind != "ready":
+            raise RuntimeError(f"擷取行程啟動失敗: {kind}")
+        self.ring = SampleRing.attach(name)
+        self.tokens = {}  # 工位 -> 目前這次記錄的 token, 用來忽略上一次記錄遲到的事件
+        self._next_token = 0
+
+    def start_station(self, station_name, file_name, header, frequency, pw_ip):
+        self._next_token += 1
+        self.tokens[station_name] = self._next_token
+        config = {"file_name": file_name, "header": header, "frequency": frequency, "pw_ip": pw_ip,
+                  "token": self._next_token}
+        self.command_queue.put(("start", station_name, config))
+
+    def poll_events(self):
+        """
+        取出擷取行程的事件 (不等待), 只回傳屬於各工位目前這次記錄的:
+        [("error", 工位, 訊息), ("stopped", 工位, None)]
+        """
+        events = []
+        while True:
+            try:
+                event = self.event_queue.get_nowait()
+            except queue.Empty:
+                return events
+            except (EOFError, OSError):
+                return events
+            kind, station_name, token = event[:3]
+            if kind in ("error", "stopped") and token is not None and token == self.tokens.get(station_name):
+                events.append((kind, station_name, event[3] if kind == "error" else None))
+
+    def stop_station(self, station_name):
+        self.command_queue.put(("stop", station_name))
+
+    def live_snapshot(self):
+        return self.ring.live_snapshot()
+
+    def read(self, cursor):
+        return self.ring.read(cursor)
+
+    def write_count(self):
+        return int(self.ring.header[0])
+
+    def shutdown(self, timeout=10):
+        self.command_queue.put(("shutdown",))
+        self.process.join(timeout=timeout)
+        self.ring.close()
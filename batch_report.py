@@ -0,0 +1,173 @@
+# SAMPO RD2 LAB Data Collection - 批次報告
+#-------------------------------------------------------------------------------
+# 對多個已完成的測試記錄 (CSV) 以行程池平行計算 REPORT 統計與能耗, 輸出一個彙總表。
+# 每個測試交給一個子行程, 以 report_engine 分段讀取, 結果與 GUI「計算平均值」相同。
+#
+# 範例:
+#   python batch_report.py D:/測試紀錄 --model SR-X --vf 150 --vr 350 --skip-hours 6 --hours 24 -o summary.csv
+#   python batch_report.py D:/測試紀錄 --params runs.csv -o summary.csv
+# --params 的 CSV 以 file 欄位對應檔名, 其他欄位 (vf, vr, fan_type, temp_f, temp_r, threshold,
+# start, end, skip_hours, hours) 覆寫命令列的預設值。
+#-------------------------------------------------------------------------------
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from csv_catalog import CsvCatalog
+from energy_calculator import EnergyCalculator
+from report_engine import report_from_csv
+
+PARAM_FIELDS = {
+    "vf": float, "vr": float, "fan_type": int, "temp_f": float, "temp_r": float, "threshold": int,
+    "start": str, "end": str, "skip_hours": float, "hours": float,
+}
+
+
+def run_window(entry, params):
+    """依參數決定統計區間: 指定 start/end 時使用絕對時間, 否則為測試開始 skip_hours 後的 hours 小時"""
+    first = datetime.fromtimestamp(entry["first"])
+    last = datetime.fromtimestamp(entry["last"])
+    start = datetime.strptime(params["start"], "%Y-%m-%d %H:%M:%S") if params.get("start") else \
+        first + timedelta(hours=params.get("skip_hours") or 0)
+    if params.get("end"):
+        end = datetime.strptime(params["end"], "%Y-%m-%d %H:%M:%S")
+    elif params.get("hours"):
+        end = start + timedelta(hours=params["hours"])
+    else:
+        end = last
+    return start, min(end, last)
+
+
+def _report_task(path, entry, params):
+    """子行程: 計算單一測試的報告"""
+    started = time.perf_counter()
+    start, end = run_window(entry, params)
+    energy_params = {key: params[key] for key in ("vf", "vr", "fan_type", "temp_f", "temp_r")}
+    report = report_from_csv(path, start, end, params["threshold"], energy_params, EnergyCalculator(), entry)
+    report["elapsed"] = time.perf_counter() - started
+    return report
+
+
+def load_param_table(path):
+    """讀取各測試的參數表, 回傳 {檔名: {參數}}"""
+    table = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            name = os.path.basename(row.pop("file", "") or "")
+            if not name:
+                continue
+            table[name] = {key: PARAM_FIELDS[key](value) for key, value in row.items()
+                           if key in PARAM_FIELDS and value not in (None, "")}
+    return table
+
+
+def summary_row(entry, params, report=None, error=None):
+    row = {
+        "file": entry["file"],
+        "station": entry["station"],
+        "model": entry["model"],
+        "vf": params["vf"], "vr": params["vr"], "fan_type": params["fan_type"],
+        "temp_f": params["temp_f"], "temp_r": params["temp_r"], "threshold": params["threshold"],
+    }
+    if report is not None:
+        row.update({
+            "start": report["start"].strftime("%Y-%m-%d %H:%M:%S"),
+            "end": report["end"].strftime("%Y-%m-%d %H:%M:%S"),
+            "rows": report["rows"],
+            "minutes": report["minutes"],
+        })
+        aliases = entry["aliases"] or [f"Ch{i+1}" for i in range(20)]
+        for i, avg in enumerate(report["avg_temp"]):
+            row[f"Ch{i+1} {aliases[i]}" if aliases[i] != f"Ch{i+1}" else f"Ch{i+1}"] = avg
+        row.update({
+            "avg_power": report["avg_power"],
+            "power_cycles": report["power_cycles"],
+            "on_avg_min": round(report["above_avg_time"], 1),
+            "off_avg_min": round(report["below_avg_time"], 1),
+            "on_percentage": round(report["above_percentage"], 2),
+            "wp_difference": round(report["wp_difference"], 2),
+            "wp_24h": report["wp_24h_difference"],
+        })
+        # 能耗結果中的分隔標題 ("----...----") 只用於畫面顯示
+        row.update({key: value for key, value in (report["results"] or {}).items() if not key.strip().startswith("----")})
+    row["error"] = error or ""
+    return row
+
+
+def write_summary(rows, path):
+    fields = []
+    for row in rows:
+        fields += [key for key in row if key not in fields]
+    fields.remove("error")
+    fields.append("error")
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:  # utf-8-sig 讓 Excel 正確顯示中文
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批次計算測試記錄的 REPORT 統計與能耗")
+    parser.add_argument("directories", nargs="+", help="測試記錄 CSV 目錄")
+    parser.add_argument("--station", help="只處理此工位")
+    parser.add_argument("--model", help="只處理前言 Model: 為此機種的記錄")
+    parser.add_argument("--since", help="只處理此時間 (YYYY-mm-dd) 之後的記錄")
+    parser.add_argument("--params", help="各測試參數表 CSV (file 欄位對應檔名)")
+    parser.add_argument("--vf", type=float, default=0, help="冷凍庫容量(L)")
+    parser.add_argument("--vr", type=float, default=0, help="冷藏庫容量(L)")
+    parser.add_argument("--fan-type", type=int, default=1, help="風扇類型 1:風扇式 0:直冷式")
+    parser.add_argument("--temp-f", type=float, default=-18.0)
+    parser.add_argument("--temp-r", type=float, default=3.0)
+    parser.add_argument("--threshold", type=int, default=5, help="壓縮機判定關閉門檻(W)")
+    parser.add_argument("--start", help="統計開始時間 YYYY-mm-dd HH:MM:SS (所有測試相同)")
+    parser.add_argument("--end", help="統計結束時間 YYYY-mm-dd HH:MM:SS")
+    parser.add_argument("--skip-hours", type=float, default=0, help="未指定 --start 時, 略過測試開始後的時數")
+    parser.add_argument("--hours", type=float, help="未指定 --end 時, 統計的時數 (預設到測試結束)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="平行行程數")
+    parser.add_argument("-o", "--output", default="batch_summary.csv")
+    args = parser.parse_args(argv)
+
+    defaults = {
+        "vf": args.vf, "vr": args.vr, "fan_type": args.fan_type, "temp_f": args.temp_f, "temp_r": args.temp_r,
+        "threshold": args.threshold, "start": args.start, "end": args.end,
+        "skip_hours": args.skip_hours, "hours": args.hours,
+    }
+    param_table = load_param_table(args.params) if args.params else {}
+    since = datetime.strptime(args.since, "%Y-%m-%d") if args.since else None
+    jobs = []
+    for directory in args.directories:
+        catalog = CsvCatalog(directory)
+        catalog.refresh()
+        for entry in catalog.runs(station_name=args.station, model=args.model, start=since):
+            if param_table and entry["file"] not in param_table:
+                continue
+            params = dict(defaults, **param_table.get(entry["file"], {}))
+            jobs.append((catalog.file_path(entry), entry, params))
+    if not jobs:
+        print("沒有符合條件的測試記錄")
+        return 1
+
+    started = time.perf_counter()
+    rows = {}
+    with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(jobs)))) as executor:
+        futures = {executor.submit(_report_task, *job): job for job in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            path, entry, params = futures[future]
+            try:
+                report = future.result()
+                rows[path] = summary_row(entry, params, report)
+                print(f"[{done}/{len(jobs)}] {entry['file']}: {report['rows']} 筆, {report['elapsed']:.1f} 秒")
+            except Exception as e:
+                rows[path] = summary_row(entry, params, error=str(e))
+                print(f"[{done}/{len(jobs)}] {entry['file']}: 錯誤 {e}")
+    write_summary([rows[path] for path, _, _ in jobs], args.output)
+    print(f"完成 {len(jobs)} 個測試, 耗時 {time.perf_counter() - started:.1f} 秒, 彙總表: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,360 @@
+# SAMPO RD2 LAB Data Collection - 效能基準測試
+#-------------------------------------------------------------------------------
+# 以 Agg 後端 (不需視窗) 量測擷取, 繪圖與報告的主要路徑, 結果附加到 JSON 歷史檔,
+# 與上一次的結果比較, 方便在版本之間發現效能退步。
+#   解析   : GX20.parse_channel_data / parse_scientific_notation, 120 頻道 FData 完整解碼 (GX20GetData),
+#            PW3335.query_data 回應解析 (網路以假的 socket 取代, 不含 0.5 秒等待)
+#   各資料量 (預設 1/7/30 天, 10 秒一筆): update_plot (30min/24hrs/ALL) 與 canvas.draw,
+#            show_temp_at_datetime, calculate_average, snapshot_report
+#   重播 (--replay): 以 collect_data 盡快重播已記錄的 CSV, 經過存檔, 日誌, 圖表 (每 5 秒 canvas.draw,
+#            與 FuncAnimation 相同) 與即時分析, 記錄 samples/s 與最大可持續倍速
+#
+# 範例:
+#   python benchmark.py
+#   python benchmark.py --days 1 7 --repeat 3 --label v2026.10
+#   python benchmark.py --days --replay D:/測試紀錄/20260101_000000_工位1.csv
+#-------------------------------------------------------------------------------
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import matplotlib
+matplotlib.use("Agg")  # 必須在匯入 GX20_PW3335 之前設定
+import numpy as np
+from matplotlib.figure import Figure
+
+import GX20_PW3335 as app_module
+import devices
+from device_emulator import gx20_record
+from replay_source import ReplaySource, format_replay_stats
+from station_store import StationHistory, StationRollup, ROLLUP_TIERS
+
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_history.json")
+STATION = "工位1"
+STEP_SECONDS = 10
+REGRESSION_RATIO = 1.2  # 比上一次慢超過此倍數時標示
+DRAW_INTERVAL = 5.0  # 重播時 canvas.draw 的間隔 (秒), 與 FuncAnimation 相同
+
+
+class _Var:
+    """取代 tk 變數與輸入框的最小物件"""
+    def __init__(self, value=""):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+    def delete(self, *args):
+        self.value = ""
+
+    def insert(self, index, text):
+        self.value = text if index == 0 else self.value + text
+
+    def config(self, **kwargs):
+        self.options = kwargs
+
+    configure = config
+
+
+class _Root:
+    """取代 Tk root: after 直接執行 (request_ui_flush 的批次更新在呼叫端同步完成, 計入量測時間)"""
+    def after(self, ms, func, *args):
+        func(*args)
+
+
+def _fail(title, message):
+    raise RuntimeError(f"{title}: {message}")
+
+
+def synthetic_arrays(days, step=STEP_SECONDS, seed=0):
+    """簡單的合成資料 (時間戳記, 溫度 Nx20, 電力 Nx4): 30 分鐘壓縮機周期, 冷凍/冷藏各 10 個頻道"""
+    rng = np.random.default_rng(seed)
+    n = int(days * 86400 / step)
+    start = datetime(2026, 1, 1).timestamp()
+    times = start + np.arange(n) * float(step)
+    phase = (times - start) % 1800
+    on = phase < 900
+    swing = np.where(on, -phase / 900, -1 + (phase - 900) / 900)
+    temps = np.empty((n, 20))
+    temps[:, :10] = -18 + swing[:, None] + rng.normal(0, 0.05, (n, 10))
+    temps[:, 10:] = 3 + 0.5 * swing[:, None] + rng.normal(0, 0.05, (n, 10))
+    temps = np.round(temps, 1)
+    power = np.empty((n, 4))
+    power[:, 0] = 110.0
+    power[:, 2] = np.where(on, 80.0, 1.0)
+    power[:, 1] = power[:, 2] / 100
+    power[:, 3] = np.cumsum(power[:, 2]) * step / 3600
+    return times, temps, power
+
+
+def bench_app(days, spill_dir):
+    """建立不含視窗的 App, 工位1 載入 days 天的合成資料 (days 為 0 時不載入)"""
+    app = app_module.App.__new__(app_module.App)
+    app.gx20_instance = devices.GX20()
+    app.EnergyCalculator = app_module.EnergyCalculator()
+    app.font_prop = None
+    for name in ("pause_plot", "plot_data", "rollups", "x_start", "x_end", "collecting", "plot_channel_labels",
+                 "steady_since", "live_slopes"):
+        setattr(app, name, {})
+    app.show_error_dialog = _fail
+    app.root = _Root()
+    app.init_ui_batch()
+    app.pause_plot[STATION] = False
+    app.collecting[STATION] = True
+
+    history = StationHistory(os.path.join(spill_dir, f"bench_{days}.bin"))
+    rollup = StationRollup(ROLLUP_TIERS)
+    if days:
+        times, temps, power = synthetic_arrays(days)
+        history.load(times, temps, power, np.arange(len(times)))
+        rollup.extend(times, np.concatenate([temps, power[:, 2:4]], axis=1))
+    app.plot_data[STATION] = history
+    app.rollups[STATION] = rollup
+
+    figure = Figure(figsize=(12, 6))
+    setattr(app, f"{STATION}_figure", figure)
+    setattr(app, f"{STATION}_ax_temp", figure.add_subplot(211))
+    setattr(app, f"{STATION}_ax_power", figure.add_subplot(212))
+    setattr(app, f"{STATION}_x_axis_range_var", _Var("30min"))
+    setattr(app, f"{STATION}_channel_check", [_Var(1) for _ in range(20)])
+    setattr(app, f"{STATION}_ch_aliases", [_Var(f"T{i + 1}") for i in range(20)])
+    setattr(app, f"{STATION}_channel_alias_label", [_Var() for _ in range(20)])
+    labels = {channel: _Var() for channel in app.gx20_instance.channel_number[STATION]}
+    app.plot_channel_labels[STATION] = labels
+    setattr(app, f"{STATION}_channel_labels", labels)
+    for name in ("start_date_entry", "start_time_entry", "end_date_entry", "end_time_entry"):
+        setattr(app, f"{STATION}_{name}", _Var())
+    setattr(app, f"{STATION}_onoffthrottle_entry", _Var("5"))
+    setattr(app, f"{STATION}_vf_entry", _Var("150"))
+    setattr(app, f"{STATION}_vr_entry", _Var("350"))
+    setattr(app, f"{STATION}_fan_type_var", _Var(1))
+    setattr(app, f"{STATION}_temp_f_entry", _Var("-18"))
+    setattr(app, f"{STATION}_temp_r_entry", _Var("3"))
+    setattr(app, f"{STATION}_report_text", _Var())
+    if not days:
+        return app, history
+    # 統計範圍: 最後 24 小時 (不足一天時為全部)
+    end = datetime.fromtimestamp(times[-1])
+    start = max(datetime.fromtimestamp(times[0]), end - timedelta(hours=24))
+    for name, value in (("start_date_entry", f"{start:%Y-%m-%d}"), ("start_time_entry", f"{start:%H:%M:%S}"),
+                        ("end_date_entry", f"{end:%Y-%m-%d}"), ("end_time_entry", f"{end:%H:%M:%S}")):
+        getattr(app, f"{STATION}_{name}").set(value)
+    return app, history
+
+
+def gx20_frame(seed=0):
+    """120 頻道的 FData 回應 (與 device_emulator 相同格式)"""
+    rng = np.random.default_rng(seed)
+    records = ["EA"]
+    for channels in devices.GX20().channel_number.values():
+        for channel, value in zip(channels, rng.uniform(-25, 30, len(channels))):
+            records.append(gx20_record("N", channel, float(value)))
+    records.append("EN")
+    return ("\r\n".join(records) + "\r\n").encode("ascii")
+
+
+class _FakeSocket:
+    """固定回應的 socket"""
+    def __init__(self, response):
+        self.response = response
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def sendall(self, data):
+        pass
+
+    def recv(self, size):
+        return self.response[:size]
+
+    def close(self):
+        pass
+
+
+@contextmanager
+def _offline_gx20(frame):
+    """GX20GetData 改連假的 socket 並略過 0.5 秒等待"""
+    create_connection, sleep = devices.socket.create_connection, devices.time.sleep
+    devices.socket.create_connection = lambda *args, **kwargs: _FakeSocket(frame)
+    devices.time.sleep = lambda seconds: None
+    try:
+        yield
+    finally:
+        devices.socket.create_connection, devices.time.sleep = create_connection, sleep
+
+
+def measure(func, repeat):
+    """執行 repeat 次, 回傳 {"min", "median"} 秒數 (先執行一次暖機)"""
+    func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return {"min": min(samples), "median": statistics.median(samples)}
+
+
+def run_parsing(repeat):
+    results = {}
+    gx20 = devices.GX20()
+    frame = gx20_frame()
+    lines = frame.decode("ascii").splitlines()
+
+    def parse_frame():
+        for line in lines:
+            parsed = gx20.parse_channel_data(line)
+            if parsed:
+                gx20.parse_scientific_notation(parsed["value_str"])
+    results["gx20.parse_channel_data+parse_scientific_notation[120ch]"] = measure(parse_frame, repeat * 20)
+    with _offline_gx20(frame):
+        results["gx20.GX20GetData[120ch]"] = measure(gx20.GX20GetData, repeat * 20)
+
+    pw = devices.PW3335("127.0.0.1")
+    pw.sock = _FakeSocket(b"U +110.14E+0;I +0.8165E+0;P +046.80E+0;WP +00012.3456E+0\n")
+    results["pw3335.query_data"] = measure(pw.query_data, repeat * 100)
+    return results
+
+
+def run_dataset(days, repeat, spill_dir):
+    results = {}
+    started = time.perf_counter()
+    app, history = bench_app(days, spill_dir)
+    print(f"  {days} 天資料 {len(history)} 筆, 建立 {time.perf_counter() - started:.1f} 秒")
+    figure = getattr(app, f"{STATION}_figure")
+    active = [[i, f"T{i + 1}", app.gx20_instance.channel_number[STATION][i]] for i in range(20)]
+    range_var = getattr(app, f"{STATION}_x_axis_range_var")
+    for x_range in ("30min", "24hrs", "ALL"):
+        range_var.set(x_range)
+        results[f"update_plot[{x_range}]"] = measure(lambda: app.update_plot(None, STATION, active), repeat)
+        results[f"update_plot+draw[{x_range}]"] = measure(
+            lambda: (app.update_plot(None, STATION, active), figure.canvas.draw()), repeat)
+    middle = history[len(history) // 2][0]
+    results["show_temp_at_datetime"] = measure(lambda: app.show_temp_at_datetime(STATION, middle), repeat * 10)
+    results["calculate_average[24h]"] = measure(lambda: app.calculate_average(STATION), repeat)
+    results["snapshot_report[24h]"] = measure(lambda: app.snapshot_report(STATION), repeat)
+    history.close()
+    return {f"{name}@{days}d": value for name, value in results.items()}
+
+
+class _Indexer:
+    def add_directory(self, directory):
+        pass
+
+
+def run_replay(path, spill_dir):
+    """以 collect_data 盡快重播 CSV, 回傳 (結果, 重播統計)"""
+    app, history = bench_app(0, spill_dir)
+    replay = ReplaySource(path, STATION, speed=0.0)
+    for name in ("live_slopes", "steady_detectors", "resume_journals", "collection_threads"):
+        setattr(app, name, {})
+    app.acquisition = app.database = None
+    app.catalog_indexer = _Indexer()
+    app.replays = {STATION: replay}
+    app.stop_events = {STATION: threading.Event()}
+    app.finish_replay = lambda station_name, source: None
+    setattr(app, f"{STATION}_file_path_var", _Var(spill_dir))
+    setattr(app, f"{STATION}_frequency_var", _Var(10))
+    for i, alias in enumerate(replay.entry["aliases"]):
+        getattr(app, f"{STATION}_ch_aliases")[i].set(alias)
+    app.reset_live_efficiency(STATION)
+    app.reset_steady_state(STATION)
+
+    # collect_data 本身不呼叫 canvas.draw, 依 FuncAnimation 的間隔補上
+    figure = getattr(app, f"{STATION}_figure")
+    update_plot = app.update_plot
+    next_draw = [0.0]
+
+    def update_and_draw(frame, station_name, active_ch_list=None):
+        artists = update_plot(frame, station_name, active_ch_list)
+        if time.perf_counter() >= next_draw[0]:
+            figure.canvas.draw()
+            next_draw[0] = time.perf_counter() + DRAW_INTERVAL
+        return artists
+    app.update_plot = update_and_draw
+
+    journal_dir = app_module.JOURNAL_DIR
+    app_module.JOURNAL_DIR = os.path.join(spill_dir, "journal")
+    try:
+        app.collect_data(STATION, "replay")
+    finally:
+        app_module.JOURNAL_DIR = journal_dir
+        history.close()
+    stats = replay.stats()
+    per_sample = stats["busy_ms"] / 1e3  # 每筆平均處理時間, 只有一次量測
+    return {f"replay.collect_data[{os.path.basename(path)}]": {"min": per_sample, "median": per_sample}}, stats
+
+
+def load_history(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def save_history(path, history):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(history, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="擷取/繪圖/報告效能基準測試 (Agg 後端)")
+    parser.add_argument("--days", type=int, nargs="*", default=[1, 7, 30], help="合成資料天數")
+    parser.add_argument("--repeat", type=int, default=5, help="每項重複次數 (解析類自動加倍)")
+    parser.add_argument("--label", default="", help="此次結果的標籤, 例如版本號")
+    parser.add_argument("--history", default=HISTORY_PATH, help="JSON 歷史檔")
+    parser.add_argument("--replay", help="以 collect_data 盡快重播此 CSV 並量測處理量")
+    parser.add_argument("--no-save", action="store_true", help="只顯示結果, 不寫入歷史檔")
+    args = parser.parse_args(argv)
+
+    results = run_parsing(args.repeat)
+    with tempfile.TemporaryDirectory() as spill_dir:
+        for days in args.days:
+            results.update(run_dataset(days, args.repeat, spill_dir))
+        if args.replay:
+            replay_results, replay_stats = run_replay(args.replay, spill_dir)
+            results.update(replay_results)
+            print(format_replay_stats(replay_stats))
+
+    history = load_history(args.history)
+    previous = history[-1]["results"] if history else {}
+    print(f"{'項目':<60}{'min(ms)':>12}{'median(ms)':>12}{'前次':>10}")
+    for name, value in results.items():
+        ratio = ""
+        if name in previous and previous[name]["min"] > 0:
+            factor = value["min"] / previous[name]["min"]
+            ratio = f"{factor:.2f}x" + (" !" if factor > REGRESSION_RATIO else "")
+        print(f"{name:<60}{value['min'] * 1e3:>12.3f}{value['median'] * 1e3:>12.3f}{ratio:>10}")
+    if not args.no_save:
+        history.append({
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "label": args.label,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "matplotlib": matplotlib.__version__,
+            "platform": platform.platform(),
+            "results": results,
+        })
+        save_history(args.history, history)
+        print(f"結果已寫入 {args.history}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
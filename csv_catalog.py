@@ -0,0 +1,316 @@
+# SAMPO RD2 LAB Data Collection - CSV 測試記錄目錄與稀疏時間索引
+#-------------------------------------------------------------------------------
+# 測試記錄檔名為 {YYYYmmdd_HHMMSS}_{工位}.csv, 檔頭可能有 "DateTime:" / "Model:" 前言,
+# 之後為 Date,Time,20個頻道,U(V),I(A),P(W),WP(Wh)[,GX20Seq] 標題與資料。
+# 每個目錄維護一個 CATALOG_NAME 檔 (JSON), 記錄每個檔案的:
+#   工位, 測試時間, 機種, 頻道別名, 筆數, 起訖時間,
+#   稀疏索引: 每 INDEX_MINUTES 分鐘一筆 [時間戳記, 該行的 byte offset]
+# 收集中的檔案只會從上次掃描的位置接著索引。讀取某一段時間時直接 seek 到
+# 區間開始前最近的索引位置, 不需從檔頭開始解析。
+#-------------------------------------------------------------------------------
+import bisect
+import glob
+import io
+import json
+import os
+import re
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+INDEX_MINUTES = 10
+RESCAN_SECONDS = 300
+CATALOG_NAME = "_catalog.json"
+CATALOG_VERSION = 1
+TEMP_CHANNELS = 20
+FILE_PATTERN = re.compile(r"^(\d{8}_\d{6})_(.+)\.csv$")
+
+
+def _read_preamble(f):
+    """讀取前言與標題行, 回傳 (前言 dict, 標題欄位, 資料開始的 byte offset); f 為二進位檔案"""
+    preamble = {}
+    f.seek(0)
+    while True:
+        line = f.readline()
+        if not line:
+            return preamble, [], f.tell()
+        text = line.decode("utf-8-sig").strip()
+        if text.startswith("Date,"):
+            return preamble, text.split(","), f.tell()
+        key, sep, value = text.partition(":")
+        if sep:
+            preamble[key.strip()] = value.strip()
+
+
+class _LineClock:
+    """由 "YYYY-mm-dd,HH:MM:SS" 開頭的資料行快速取得時間戳記 (日期部分快取)"""
+    def __init__(self):
+        self._days = {}
+
+    def __call__(self, line):
+        day = line[:10]
+        base = self._days.get(day)
+        if base is None:
+            base = self._days[day] = datetime.strptime(day.decode("ascii"), "%Y-%m-%d").timestamp()
+        return base + int(line[11:13]) * 3600 + int(line[14:16]) * 60 + int(line[17:19])
+
+
+def index_file(path, entry=None):
+    """
+    建立或更新單一 CSV 的目錄資料。entry 為上次的結果時, 只從上次掃描結束處接著處理;
+    檔案變小 (被覆寫) 時重新建立。
+    """
+    stat = os.stat(path)
+    if entry is not None and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+        return entry
+    if entry is None or stat.st_size < entry["scanned"]:
+        name = os.path.basename(path)
+        match = FILE_PATTERN.match(name)
+        with open(path, "rb") as f:
+            preamble, columns, data_offset = _read_preamble(f)
+        entry = {
+            "file": name,
+            "run": match.group(1) if match else None,
+            "station": match.group(2) if match else None,
+            "model": preamble.get("Model"),
+            "preamble_time": preamble.get("DateTime"),
+            "columns": columns,
+            "aliases": columns[2:2 + TEMP_CHANNELS],
+            "data_offset": data_offset,
+            "scanned": data_offset,
+            "rows": 0,
+            "first": None,
+            "last": None,
+            "index": [],
+        }
+    clock = _LineClock()
+    step = INDEX_MINUTES * 60
+    index = entry["index"]
+    with open(path, "rb") as f:
+        f.seek(entry["scanned"])
+        offset = entry["scanned"]
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # 寫入中的最後一行, 下次再處理
+            try:
+                t = clock(line)
+            except (ValueError, UnicodeDecodeError):
+                offset += len(line)
+                continue
+            if not index or t >= index[-1][0] + step:
+                index.append([t, offset])
+            if entry["first"] is None:
+                entry["first"] = t
+            entry["last"] = t
+            entry["rows"] += 1
+            offset += len(line)
+    entry["scanned"] = offset
+    entry["size"] = stat.st_size
+    entry["mtime"] = stat.st_mtime
+    return entry
+
+
+def seek_offset(entry, start):
+    """區間開始時間之前最近的索引位置 (byte offset)"""
+    if start is None or not entry["index"]:
+        return entry["data_offset"]
+    times = [t for t, _ in entry["index"]]
+    i = bisect.bisect_right(times, start.timestamp()) - 1
+    return entry["index"][i][1] if i >= 0 else entry["data_offset"]
+
+
+def _open_range(path, entry, start):
+    """開啟檔案並 seek 到 start 前最近的索引位置, 回傳 (二進位檔案, 標題欄位)"""
+    f = open(path, "rb")
+    if entry is None:
+        _, columns, offset = _read_preamble(f)
+    else:
+        columns, offset = entry["columns"], seek_offset(entry, start)
+    f.seek(offset)
+    return f, columns
+
+
+def _row_from_fields(fields, has_seq):
+    def number(text):
+        return float(text) if text else None
+    dt = datetime.strptime(f"{fields[0]} {fields[1]}", "%Y-%m-%d %H:%M:%S")
+    temps = [number(v) for v in fields[2:2 + TEMP_CHANNELS]]
+    power = [number(v) for v in fields[2 + TEMP_CHANNELS:6 + TEMP_CHANNELS]]
+    seq = int(fields[6 + TEMP_CHANNELS]) if has_seq and len(fields) > 6 + TEMP_CHANNELS and fields[6 + TEMP_CHANNELS] else -1
+    return [dt, temps, power, seq]
+
+
+def read_rows(path, start=None, end=None, entry=None):
+    """
+    逐列讀取 [start, end) 區間的資料 (plot_data 格式), 有目錄資料時直接 seek 到區間附近。
+    資料依時間排序, 超過 end 即停止讀取。
+    """
+    f, columns = _open_range(path, entry, start)
+    has_seq = "GX20Seq" in columns
+    with f:
+        for line in io.TextIOWrapper(f, encoding="utf-8", newline=""):
+            fields = line.rstrip("\r\n").split(",")
+            if len(fields) < 2 + TEMP_CHANNELS:
+                continue
+            row = _row_from_fields(fields, has_seq)
+            if start is not None and row[0] < start:
+                continue
+            if end is not None and row[0] >= end:
+                break
+            yield row
+
+
+def read_chunks(path, start=None, end=None, entry=None, chunk_rows=50000, include_end=False):
+    """
+    以 pandas 分段讀取 [start, end) 區間 (include_end 時為 [start, end]), 每段回傳
+    (時間戳記, 溫度 Nx20, 電力 Nx4) numpy 陣列, 空值為 NaN。記憶體用量只與 chunk_rows 有關。
+    """
+    f, columns = _open_range(path, entry, start)
+    names = columns or ["Date", "Time"] + [f"Ch{i}" for i in range(1, TEMP_CHANNELS + 1)] + ["U(V)", "I(A)", "P(W)", "WP(Wh)"]
+    names = [f"{name}#{i}" for i, name in enumerate(names)]  # 頻道別名可能重複
+    start_ts = start.timestamp() if start is not None else -np.inf
+    end_ts = end.timestamp() if end is not None else np.inf
+    with f:
+        reader = pd.read_csv(f, header=None, names=names, usecols=range(6 + TEMP_CHANNELS),
+                             dtype={names[0]: str, names[1]: str}, chunksize=chunk_rows, encoding="utf-8")
+        for chunk in reader:
+            # 與 datetime.timestamp() 相同的本地時間戳記: 每個日期只轉換一次
+            days = {day: datetime.strptime(day, "%Y-%m-%d").timestamp() for day in chunk[names[0]].unique()}
+            times = (chunk[names[0]].map(days).to_numpy(dtype=np.float64)
+                     + pd.to_timedelta(chunk[names[1]]).dt.total_seconds().to_numpy())
+            values = chunk.iloc[:, 2:6 + TEMP_CHANNELS].to_numpy(dtype=np.float64)
+            past_end = times > end_ts if include_end else times >= end_ts
+            keep = (times >= start_ts) & ~past_end
+            if keep.any():
+                yield times[keep], values[keep, :TEMP_CHANNELS], values[keep, TEMP_CHANNELS:]
+            if times.size and past_end[-1]:
+                break
+
+
+class CsvCatalog:
+    """單一目錄的測試記錄目錄"""
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, CATALOG_NAME)
+        self.entries = {}
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CATALOG_VERSION:
+                self.entries = data["files"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def refresh(self):
+        """掃描目錄, 更新新增/成長中的檔案, 移除已刪除的檔案; 回傳是否有變更"""
+        changed = False
+        names = set()
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.csv"))):
+            name = os.path.basename(path)
+            names.add(name)
+            old = self.entries.get(name)
+            try:
+                entry = index_file(path, dict(old, index=list(old["index"])) if old else None)
+            except OSError:
+                continue
+            if entry != old:
+                with self._lock:
+                    self.entries[name] = entry
+                changed = True
+        for name in set(self.entries) - names:
+            with self._lock:
+                del self.entries[name]
+            changed = True
+        if changed:
+            self.save()
+        return changed
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            data = {"version": CATALOG_VERSION, "files": self.entries}
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def runs(self, station_name=None, model=None, start=None, end=None):
+        """查詢測試記錄, start/end 為與測試期間重疊的時間範圍"""
+        with self._lock:
+            entries = list(self.entries.values())
+        result = []
+        for entry in entries:
+            if station_name is not None and entry["station"] != station_name:
+                continue
+            if model is not None and entry["model"] != model:
+                continue
+            if entry["first"] is None:
+                continue
+            if start is not None and entry["last"] < start.timestamp():
+                continue
+            if end is not None and entry["first"] >= end.timestamp():
+                continue
+            result.append(entry)
+        return sorted(result, key=lambda e: e["first"])
+
+    def file_path(self, entry):
+        return os.path.join(self.directory, entry["file"])
+
+    def entry_for(self, path):
+        """取得檔案的目錄資料 (若檔案不在目錄中則即時建立)"""
+        name = os.path.basename(path)
+        with self._lock:
+            entry = self.entries.get(name)
+        if entry is None or os.path.getsize(path) != entry["size"]:
+            entry = index_file(path, dict(entry, index=list(entry["index"])) if entry else None)
+            with self._lock:
+                self.entries[name] = entry
+        return entry
+
+    def read_rows(self, path, start=None, end=None):
+        return read_rows(path, start, end, self.entry_for(path))
+
+    def read_chunks(self, path, start=None, end=None, chunk_rows=50000, include_end=False):
+        return read_chunks(path, start, end, self.entry_for(path), chunk_rows, include_end)
+
+
+class CatalogIndexer(threading.Thread):
+    """背景索引執行緒, 每 RESCAN_SECONDS 秒更新所有登錄目錄的目錄檔"""
+    def __init__(self, interval=RESCAN_SECONDS, on_error=None):
+        super().__init__(name="csv_catalog", daemon=True)
+        self.interval = interval
+        self.on_error = on_error
+        self.catalogs = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()  # 不可命名為 _stop, 會蓋掉 Thread._stop 使 join() 失敗
+
+    def add_directory(self, directory):
+        directory = os.path.abspath(directory)
+        with self._lock:
+            if directory not in self.catalogs:
+                self.catalogs[directory] = CsvCatalog(directory)
+                self._wake.set()
+        return self.catalogs[directory]
+
+    def catalog(self, directory):
+        return self.add_directory(directory)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            with self._lock:
+                catalogs = list(self.catalogs.values())
+            for catalog in catalogs:
+                try:
+                    catalog.refresh()
+                except Exception as e:
+                    if self.on_error is not None:
+                        self.on_error(f"csv_catalog: 索引 {catalog.directory} 錯誤: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
@@ -0,0 +1,264 @@
+# SAMPO RD2 LAB Data Collection - GX20 / PW3335 本機模擬器
+#-------------------------------------------------------------------------------
+# 沒有實驗室網路時, 以本機 TCP 伺服器模擬 GX20 (FData 指令, port 34434) 與每個工位一台
+# PW3335 (:MEAS? 指令, port 3300), 讓收集程式的連線, 解析, 重連與取樣時序都實際執行。
+# 每個工位以簡單的冰箱模型產生資料: 壓縮機依冷凍室溫度上下限 On/Off, 定時除霜 (加熱器),
+# 可選隨機開門; GX20 溫度與 PW3335 電力來自同一個模型, 時間可加速 (--speed)。
+#
+# 位址: GX20 為 127.0.0.1, 工位 n 的 PW3335 為 127.0.0.{n+1} (GX20_PW3335.pw3335_ip),
+# Linux/Windows 的 127.0.0.0/8 都是本機位址。GX20_PW3335.py 設定 Emulator_mode = True 即可連線。
+#
+# 範例:
+#   python device_emulator.py --speed 60
+#   python device_emulator.py --speed 360 --latency 0.05 --jitter 0.1 --drop 0.01 --glitch 0.001 --door-per-hour 0.5
+#-------------------------------------------------------------------------------
+import argparse
+import math
+import random
+import socketserver
+import sys
+import threading
+import time
+
+TEMP_CHANNELS = 20
+GX20_PORT = 34434
+PW3335_PORT = 3300
+MODEL_STEP = 10.0  # 模型積分步長 (模擬秒)
+AMBIENT = 30.0
+
+
+class SimClock:
+    """模擬時間: 由啟動時的實際時間開始, 以 speed 倍速前進"""
+    def __init__(self, speed=1.0):
+        self.speed = speed
+        self.origin = time.time()
+        self._start = time.monotonic()
+
+    def now(self):
+        return self.origin + (time.monotonic() - self._start) * self.speed
+
+
+class StationModel:
+    """
+    單一工位的冰箱模型 (冷凍室/冷藏室兩個溫度, 模擬秒積分):
+      冷凍室: 向環境溫度回溫 (時間常數 4 小時), 壓縮機 On 時降溫, 除霜時加熱
+      冷藏室: 向環境回溫 (6 小時), 與冷凍室耦合 (5 小時)
+      壓縮機: 冷凍室高於設定 + 差動時 On, 低於設定 - 差動時 Off; 每 defrost_hours 除霜 defrost_minutes 分
+    頻道 1~10 為冷凍室各點, 11~20 為冷藏室各點 (各有固定偏差與雜訊)。
+    """
+    def __init__(self, seed, t, door_per_hour=0.0):
+        self.rng = random.Random(seed)
+        self.freezer_set = -20.0 + self.rng.uniform(-2, 2)
+        self.differential = 1.5
+        self.on_power = self.rng.uniform(60, 110)
+        self.heater_power = self.rng.uniform(150, 220)
+        self.defrost_hours = self.rng.choice([6, 8, 12])
+        self.defrost_minutes = 20
+        self.door_per_hour = door_per_hour
+        self.offsets = [self.rng.uniform(-1.0, 1.0) for _ in range(TEMP_CHANNELS)]
+        self.t = t
+        self.freezer = self.freezer_set + self.rng.uniform(-1, 1)
+        self.fridge = 3.0 + self.rng.uniform(-1, 1)
+        self.compressor = False
+        self.on_since = t
+        self.next_defrost = t + self.rng.uniform(0.2, 1.0) * self.defrost_hours * 3600
+        self.defrost_until = None
+        self.power = 0.0
+        self.wh = 0.0
+        self._lock = threading.Lock()
+
+    def _step(self, dt):
+        if self.defrost_until is not None and self.t >= self.defrost_until:
+            self.defrost_until = None
+        if self.defrost_until is None and self.t >= self.next_defrost:
+            self.defrost_until = self.t + self.defrost_minutes * 60
+            self.next_defrost += self.defrost_hours * 3600
+            self.compressor = False
+        defrosting = self.defrost_until is not None
+        if not defrosting:
+            if self.compressor and self.freezer < self.freezer_set - self.differential:
+                self.compressor = False
+            elif not self.compressor and self.freezer > self.freezer_set + self.differential:
+                self.compressor = True
+                self.on_since = self.t
+        minutes = dt / 60
+        self.freezer += (AMBIENT - self.freezer) * dt / (4 * 3600)
+        self.fridge += (AMBIENT - self.fridge) * dt / (6 * 3600) + (self.freezer - self.fridge) * dt / (5 * 3600)
+        if self.compressor:
+            self.freezer -= 0.4 * minutes
+            # 啟動瞬間電流較大
+            self.power = self.on_power * (1 + 0.3 * math.exp(-(self.t - self.on_since) / 60)) + self.rng.gauss(0, 0.5)
+        elif defrosting:
+            self.freezer += 0.15 * minutes
+            self.power = self.heater_power + self.rng.gauss(0, 1.0)
+        else:
+            self.power = 0.8 + self.rng.gauss(0, 0.05)
+        if self.door_per_hour and self.rng.random() < self.door_per_hour * dt / 3600:
+            self.freezer += 2.0
+            self.fridge += 3.0
+        self.wh += max(self.power, 0.0) * dt / 3600
+        self.t += dt
+
+    def advance(self, t):
+        """積分到模擬時間 t"""
+        with self._lock:
+            while self.t < t:
+                self._step(min(MODEL_STEP, t - self.t))
+
+    def temperatures(self):
+        with self._lock:
+            return [(self.freezer if i < TEMP_CHANNELS // 2 else self.fridge) + self.offsets[i] + self.rng.gauss(0, 0.05)
+                    for i in range(TEMP_CHANNELS)]
+
+    def measurement(self):
+        """(U, I, P, WP)"""
+        with self._lock:
+            voltage = 110.0 + self.rng.gauss(0, 0.3)
+            power = max(self.power, 0.0)
+            current = power / (voltage * 0.9) if power > 1 else 0.01
+            return voltage, current, power, self.wh
+
+
+class Faults:
+    """通訊異常設定: 每次回應前延遲 latency + U(0, jitter) 秒, 以 drop 機率直接斷線不回應"""
+    def __init__(self, latency=0.0, jitter=0.0, drop=0.0, glitch=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.drop = drop
+        self.glitch = glitch
+        self.rng = random.Random(seed)
+        self.counts = {"gx20": 0, "pw3335": 0, "dropped": 0, "glitch": 0}
+        self._lock = threading.Lock()
+
+    def delay(self):
+        time.sleep(self.latency + self.rng.uniform(0, self.jitter))
+
+    def should_drop(self):
+        with self._lock:
+            dropped = self.rng.random() < self.drop
+            if dropped:
+                self.counts["dropped"] += 1
+            return dropped
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+
+def gx20_record(status, channel, value, unit="C"):
+    """GX20 FData 的 31 字元記錄: 狀態, 頻道號碼, 單位, 正負號, 科學記號數值"""
+    return f"{status} {channel}    {unit:<8}{'-' if value < 0 else '+'}{abs(value):.6E}"
+
+
+class GX20Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        for line in self.rfile:
+            if not line.strip().startswith(b"FData"):
+                continue
+            if server.faults.should_drop():
+                return
+            now = server.clock.now()
+            records = ["EA"]
+            for channels, model, burnout in server.stations:
+                model.advance(now)
+                for i, (channel, value) in enumerate(zip(channels, model.temperatures())):
+                    if i >= TEMP_CHANNELS - burnout:
+                        records.append(gx20_record("B", channel, 9.999999e99))  # 未接熱電偶 (斷線)
+                    elif server.faults.glitch and server.faults.rng.random() < server.faults.glitch:
+                        server.faults.count("glitch")
+                        records.append(gx20_record("N", channel, server.faults.rng.choice([-99.9, 1.0e4])))
+                    else:
+                        records.append(gx20_record("N", channel, value))
+            records.append("EN")
+            server.faults.delay()
+            self.wfile.write(("\r\n".join(records) + "\r\n").encode("ascii"))
+            server.faults.count("gx20")
+
+
+class PW3335Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        for line in self.rfile:
+            command = line.strip().upper()
+            if command.startswith(b"*IDN?"):
+                self.wfile.write(b"HIOKI,PW3335,000000000,V1.00\n")
+                continue
+            if not command.startswith(b":MEAS?"):
+                continue
+            if server.faults.should_drop():
+                return
+            server.model.advance(server.clock.now())
+            u, i, p, wh = server.model.measurement()
+            server.faults.delay()
+            self.wfile.write(f"U {u:+07.2f}E+0;I {i:+07.4f}E+0;P {p:+07.2f}E+0;WP {wh:+09.4f}E+0\n".encode("ascii"))
+            server.faults.count("pw3335")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+def start_servers(stations=6, speed=1.0, faults=None, seed=0, door_per_hour=0.0, burnout=0,
+                  gx20_host=None, pw3335_hosts=None, channel_numbers=None):
+    """
+    啟動 GX20 與各工位 PW3335 模擬伺服器 (背景執行緒), 回傳 (伺服器清單, 各工位模型)。
+    未指定位址/頻道時使用 devices.GX20 的頻道對應 (Emulator_mode 的位址)。
+    """
+    if gx20_host is None or pw3335_hosts is None or channel_numbers is None:
+        from devices import GX20
+        channel_numbers = channel_numbers or list(GX20().channel_number.values())
+        gx20_host = gx20_host or "127.0.0.1"
+        pw3335_hosts = pw3335_hosts or [f"127.0.0.{i + 2}" for i in range(stations)]
+    faults = faults or Faults(seed=seed)
+    clock = SimClock(speed)
+    models = [StationModel(seed * 100 + i, clock.now(), door_per_hour) for i in range(stations)]
+    servers = []
+    gx20 = _Server((gx20_host, GX20_PORT), GX20Handler)
+    gx20.clock, gx20.faults = clock, faults
+    gx20.stations = [(channel_numbers[i], models[i], burnout) for i in range(stations)]
+    servers.append(gx20)
+    for i in range(stations):
+        pw = _Server((pw3335_hosts[i], PW3335_PORT), PW3335Handler)
+        pw.clock, pw.faults, pw.model = clock, faults, models[i]
+        servers.append(pw)
+    for server in servers:
+        threading.Thread(target=server.serve_forever, name=f"emulator_{server.server_address}", daemon=True).start()
+    return servers, models
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GX20 / PW3335 本機模擬器")
+    parser.add_argument("--stations", type=int, default=6, help="模擬的工位數 (1~6)")
+    parser.add_argument("--speed", type=float, default=1.0, help="模擬時間倍速, 例如 60 表示 1 秒 = 1 分鐘")
+    parser.add_argument("--latency", type=float, default=0.0, help="每次回應前的延遲 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延遲的隨機增加量上限 (秒)")
+    parser.add_argument("--drop", type=float, default=0.0, help="每次指令直接斷線不回應的機率")
+    parser.add_argument("--glitch", type=float, default=0.0, help="GX20 每個頻道回傳超出範圍數值的機率")
+    parser.add_argument("--burnout", type=int, default=0, help="每個工位最後幾個頻道回報斷線 (B)")
+    parser.add_argument("--door-per-hour", type=float, default=0.0, help="每工位每 (模擬) 小時開門次數")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--duration", type=float, default=0, help="執行秒數, 0 表示直到 Ctrl+C")
+    args = parser.parse_args(argv)
+
+    faults = Faults(args.latency, args.jitter, args.drop, args.glitch, args.seed)
+    servers, models = start_servers(args.stations, args.speed, faults, args.seed, args.door_per_hour, args.burnout)
+    for server in servers:
+        print(f"listening {server.server_address[0]}:{server.server_address[1]} ({server.RequestHandlerClass.__name__[:-7]})")
+    started = time.monotonic()
+    try:
+        while not args.duration or time.monotonic() - started < args.duration:
+            time.sleep(min(60, args.duration or 60))
+            states = ", ".join(f"{m.freezer:.1f}/{m.fridge:.1f}°C {m.power:.0f}W" for m in models)
+            print(f"[{time.monotonic() - started:.0f}s] {faults.counts} | {states}")
+    except KeyboardInterrupt:
+        pass
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+# SAMPO RD2 LAB Data Collection - GX20 / PW3335 裝置通訊
+#-------------------------------------------------------------------------------
+# GUI (GX20_PW3335.py) 與擷取行程 (acquisition_worker.py) 共用的非 GUI 部分:
+#   GX20 FData 讀取與解析, PW3335 :MEAS? 查詢, GX20 不可變快照, Debug 模式的模擬溫度, LOG 記錄函式。
+# 不匯入 tkinter/matplotlib, 擷取行程在沒有 GUI 套件的環境也能執行。
+#-------------------------------------------------------------------------------
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from log_service import setup_logging
+from metrics import REGISTRY, CircuitBreaker, timed
+
+
+STATIONS = [f"工位{i}" for i in range(1, 7)]  # GX20 頻道對應的工位
+
+
+# 確保 LOG 檔案儲存到執行檔所在目錄或臨時目錄
+if getattr(sys, 'frozen', False):  # 如果是 pyinstaller 打包的執行檔
+    APP_DIR = os.path.dirname(sys.executable)
+else:
+    APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LOG_PATH = os.path.join(APP_DIR, "Gx20_Pw3335.log")
+
+# 如果無法寫入執行檔目錄，則使用臨時目錄
+if not os.access(APP_DIR, os.W_OK):
+    LOG_PATH = os.path.join(tempfile.gettempdir(), "Gx20_Pw3335.log")
+
+
+def get_logger():
+    """本行程的非阻塞記錄器 (第一次呼叫時建立); 擷取行程寫入另一個 LOG 檔"""
+    if multiprocessing.parent_process() is None:
+        return setup_logging(LOG_PATH)
+    return setup_logging(os.path.splitext(LOG_PATH)[0] + "_acquisition.log")
+
+
+def log_error(message, **fields):
+    """記錄錯誤; fields 為結構化欄位, 例如 station=, device=, latency= (秒)"""
+    get_logger().error(message, extra={"fields": fields})
+
+
+def log_info(message, **fields):
+    get_logger().info(message, extra={"fields": fields})
+
+
+def simulate_gx20_data():
+    """Debug 模式: 產生6個工位的模擬溫度數據"""
+    simulation_value = int(datetime.now().strftime("%S")) / 100
+    return {
+        f"工位{n}": [round(simulation_value + i * 0.5, 1) for i in range(20)]
+        for n in range(1, 7)
+    }
+
+
+class GX20Snapshot:
+    """GX20 單次輪詢的不可變快照(序號, 輪詢時間, 6工位x20頻道溫度), 以替換整個物件的方式發佈, 讀取端不需加鎖"""
+    __slots__ = ("seq", "poll_time", "temps")
+
+    def __init__(self, seq, poll_time, temps):
+        temps = np.array(temps, dtype=float).reshape(len(STATIONS), 20)
+        temps.flags.writeable = False
+        object.__setattr__(self, "seq", seq)
+        object.__setattr__(self, "poll_time", poll_time)
+        object.__setattr__(self, "temps", temps)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("GX20Snapshot is immutable")
+
+    @classmethod
+    def from_dict(cls, seq, poll_time, data_dict):
+        return cls(seq, poll_time, [data_dict[station_name] for station_name in STATIONS])
+
+    def station(self, station_name):
+        """取得工位的20個溫度(list 複本)"""
+        return self.temps[STATIONS.index(station_name)].tolist()
+
+
+class GX20:
+    def __init__(self, host="192.168.1.1", port=34434):
+        self.gsRemoteHost = host
+        self.gnRemotePort = port
+        device = f"gx20@{host}"
+        self.breaker = CircuitBreaker(device)
+        self._round_trip = REGISTRY.histogram("gx20_round_trip_seconds", "GX20 FData 來回時間", device=device)
+        self._parse_time = REGISTRY.histogram("gx20_parse_seconds", "GX20 FData 解析時間", device=device)
+        self._errors = REGISTRY.counter("device_errors_total", "裝置通訊錯誤次數", device=device)
+        # 新增：儲存各工位的頻道對應
+        #channel_number = {station_name: {}}
+        self.channel_number = {
+            "工位1": ["0001","0002","0003","0004","0005","0006","0007","0008","0009","0010","0101","0102","0103","0104","0105","0106","0107","0108","0109","0110"],
+            "工位2": ["0201","0202","0203","0204","0205","0206","0207","0208","0209","0210","0301","0302","0303","0304","0305","0306","0307","0308","0309","0310"],
+            "工位3": ["0401","0402","0403","0404","0405","0406","0407","0408","0409","0410","1001","1002","1003","1004","1005","1006","1007","1008","1009","1010"],
+            "工位4": ["0701","0702","0703","0704","0705","0706","0707","0708","0709","0710","0801","0802","0803","0804","0805","0806","0807","0808","0809","0810"],
+            "工位5": ["0501","0502","0503","0504","0505","0506","0507","0508","0509","0510","0601","0602","0603","0604","0605","0606","0607","0608","0609","0610"],
+            "工位6": ["1101","1102","1103","1104","1105","1106","1107","1108","1109","1110","1201","1202","1203","1204","1205","1206","1207","1208","1209","1210"]
+        }
+        self.channels_temp = {
+            "工位1": [0.0] * 20,
+            "工位2": [0.0] * 20,
+            "工位3": [0.0] * 20,
+            "工位4": [0.0] * 20,
+            "工位5": [0.0] * 20,
+            "工位6": [0.0] * 20
+        }
+
+    def parse_scientific_notation(self, value_str):
+        """解析科學記號格式的數值，非數字或大於999時回傳 None"""
+        try:
+            if 'E' in value_str:
+                base, exp = value_str.split('E')
+                value = float(base) * (10 ** int(exp))
+                    # 檢查值是否大於 999
+                    # 25/07/02 檢查是否小於 -40
+                return None if (value > 999 or value < -40) else value
+            
+        except (ValueError, TypeError):
+            return None
+
+    def parse_channel_data(self, line):
+        """解析頻道數據
+        格式: 31字元
+        - 第1字元: 資料狀態 (N/B)
+        - 第3-6字元: 頻道號碼
+        - 第11-18字元: 單位
+        - 第19字元: 正負號
+        - 第20-31字元: 科學符號數值
+        """
+        if len(line) != 31:
+            return None
+            
+        data_type = line[0]  # 資料狀態
+        channel = line[2:6]  # 頻道號碼
+        unit = line[10:18].strip()  # 單位
+        sign = line[18]  # 正負號
+        value_str = sign + line[19:31]  # 科學符號數值
+        
+        return {
+            "type": data_type,
+            "channel": channel,
+            "unit": unit,
+            "value_str": value_str
+        }
+
+    @timed("GX20.GX20GetData")
+    def GX20GetData(self):
+        if not self.breaker.allow():
+            return None  # 連續連線失敗, 斷路器開啟中暫不連線
+        try:
+            started = time.perf_counter()
+            # 建立 TCP 連線
+            with socket.create_connection((self.gsRemoteHost, self.gnRemotePort), timeout=3) as s:
+                # 送出指令
+                s.sendall(b"FData,0,0001,1210\r\n")
+                # 暫停0.5秒
+                time.sleep(0.5)
+                # 接收資料
+                data = s.recv(10240).decode("ascii", errors="ignore")
+                #print("Raw data:", repr(data))
+                parse_started = time.perf_counter()
+                self._round_trip.observe(parse_started - started)
+                
+                # 將資料放入備用緩衝區, 解析完成後整個替換 channels_temp, 讀取端不會看到解析到一半的資料
+                back_buffer = {station_name: list(temps) for station_name, temps in self.channels_temp.items()}
+                for line in data.splitlines():
+                    parsed_data = self.parse_channel_data(line)
+                    if parsed_data:
+                        channel = parsed_data["channel"]
+                        value_str = parsed_data["value_str"]
+                        value = self.parse_scientific_notation(value_str)
+                        if value is not None:
+                            # 將值存入 channel_temp
+                            for station_name, channels in self.channel_number.items():
+                                if channel in channels:
+                                    index = channels.index(channel)
+                                    back_buffer[station_name][index] = round(value, 1)
+                                    break
+                        else:
+                            # 如果值無效，則將對應的 channel_temp 設為 None
+                            for station_name, channels in self.channel_number.items():
+                                if channel in channels:
+                                    index = channels.index(channel)
+                                    back_buffer[station_name][index] = 999.9
+                                    break
+                self.channels_temp = back_buffer
+                self._parse_time.observe(time.perf_counter() - parse_started)
+                #print(f"GX20 channels_temp: {self.channels_temp['工位1']}")
+        except Exception as e:
+            self._errors.inc()
+            self.breaker.failure()
+            print(f"GX20 connection error: {e}")
+            log_error(f"GX20 connection error: {e}", device=f"gx20@{self.gsRemoteHost}",
+                      latency=time.perf_counter() - started)
+            self.valid_data = {}
+            return None
+
+        self.breaker.success()
+        return self.channels_temp
+
+    def decode_temperature(self, channels: list[str]) -> list[float]:
+        """
+        根據 self.valid_data 取出指定 channels 的溫度值，沒有資料則回傳 None。
+        """
+        return [
+            self.valid_data.get(ch, {}).get("value", None)
+            for ch in channels
+        ]
+
+    def parse_channels_number(self, station_name, checkbox_index):
+        #從 channel_number 找出 station_name 對應的號碼字串
+        return self.channel_number[station_name][checkbox_index]
+    
+
+
+class BreakerOpenError(ConnectionError):
+    """斷路器開啟中, 未實際連線裝置 (該筆讀值應記錄為無資料)"""
+
+
+class PW3335:
+    def __init__(self, ip_address, port=3300):
+        self.ip_address = ip_address
+        self.port = port
+        self.sock = None
+        device = f"pw3335@{ip_address}"
+        self.breaker = CircuitBreaker(device)
+        self._round_trip = REGISTRY.histogram("pw3335_round_trip_seconds", "PW3335 :MEAS? 來回時間", device=device)
+        self._errors = REGISTRY.counter("device_errors_total", "裝置通訊錯誤次數", device=device)
+        self._reconnects = REGISTRY.counter("device_reconnects_total", "斷線後重新連線次數", device=device)
+
+    def connect(self):
+        """Establish a TCP connection to the power meter."""
+        self.sock = socket.create_connection((self.ip_address, self.port), timeout=3)
+
+    def disconnect(self):
+        """Close the TCP connection."""
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def parse_measurement(self, value_str):
+        """Parse a measurement string and return its numeric value."""
+        return float(value_str.split()[1])
+
+    @timed("PW3335.query_data")
+    def query_data(self):
+        """Query voltage, current, power, and accumulated power."""
+        if not self.breaker.allow():
+            raise BreakerOpenError(f"PW3335 {self.ip_address} 連續失敗, 斷路器開啟中暫不連線")
+        state = self.breaker.state
+        try:
+            started = time.perf_counter()
+            if not self.sock:
+                self._reconnects.inc()
+                self.connect()  # 上次斷線, 重新連線
+            self.sock.sendall(b':MEAS? U,I,P,WH\n')
+            response = self.sock.recv(1024).decode('ascii').strip()
+            if not response:
+                raise ConnectionError("Power meter closed the connection.")
+        except OSError:
+            self._errors.inc()
+            self.breaker.failure()
+            if state == "closed" and self.breaker.state == "open":
+                # 狀態改變時記錄一次, 開啟期間不逐筆記錄
+                log_error(f"PW3335 {self.ip_address} 連續 {self.breaker.failures} 次失敗, 斷路器開啟, "
+                          f"{self.breaker.reset_seconds:g} 秒內電力記錄為無資料", device=f"pw3335@{self.ip_address}")
+            self.disconnect()  # 下次查詢時重新連線
+            raise
+        self._round_trip.observe(time.perf_counter() - started)
+        self.breaker.success()
+        if state != "closed":
+            log_info(f"PW3335 {self.ip_address} 恢復連線, 斷路器關閉", device=f"pw3335@{self.ip_address}")
+        try:
+            # Parse the response format: "U +110.14E+0;I +0.0000E+0;P +000.00E+0;WP +00.0000E+0"
+            data = response.split(';')
+            if len(data) == 4:
+                parsed_data = [float(item.split(' ')[-1].replace('E+0', '')) for item in data]
+                return parsed_data
+            else:
+                raise ValueError(f"Unexpected response format: {response}")
+        except Exception as e:
+            print(f"Error parsing response: {response}, Exception: {e}")
+            raise ValueError(f"Failed to parse response: {response}")
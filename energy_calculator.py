@@ -0,0 +1,338 @@
+# SAMPO RD2 LAB Data Collection - 冰箱能源效率計算
+#-------------------------------------------------------------------------------
+# 依日耗電量, 冷凍/冷藏有效內容積與溫度計算 EF 值, 2018/2027 年效率等級與百分比。
+# 逐筆 calculate 供 GUI 的 REPORT 使用; 陣列版 calculate_array 供最佳區間掃描與批次報告。
+# 不匯入 GUI 套件, batch_report 的行程池可在沒有 tkinter 的分析主機上執行。
+#-------------------------------------------------------------------------------
+import numpy as np
+
+
+def round_array(values, ndigits):
+    """
+    與 Python round(x, ndigits) 結果相同的陣列版 round。
+    np.round 以 x*10^n 取整, 只有在接近 .5 進位邊界時可能與 Python 的十進位捨入不同,
+    這些元素改用 Python round 逐一計算。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.round(values, ndigits)
+    scaled = values * 10.0 ** ndigits
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for index in zip(*np.nonzero(near_tie)):
+        result[index] = round(float(values[index]), ndigits)
+    return result
+
+
+class EnergyCalculator:
+    # 冰箱型式 1~5 的容許耗用能源基準係數: V / (a * V + b)
+    ALLOWANCE_A = np.array([0.037, 0.031, 0.033, 0.029, 0.033])
+    ALLOWANCE_B = np.array([24.3, 21, 19.7, 17, 15.8])
+    FUTURE_ALLOWANCE_FACTOR = np.array([1.3, 1.3, 1.3, 1.3, 1.36])
+    # 效率等級門檻係數 [一般型式, 型式5]
+    CURRENT_THRESHOLD_FACTORS = np.array([[1.6, 1.45, 1.3, 1.15], [1.72, 1.54, 1.36, 1.18]])
+    FUTURE_THRESHOLD_FACTORS = np.array([[1.308, 1.231, 1.154, 1.077], [1.294, 1.221, 1.147, 1.074]])
+
+    def __init__(self):
+        pass
+    def current_ef_thresholds(self,energy_allowance,fridge_type):
+        if fridge_type == 5:
+            #IF(fridge_type=5,ROUND(N4*1.72,1),ROUND(N4*1.6,1))
+            threshold_lv1 = round(energy_allowance * 1.72,1)
+            threshold_lv2 = round(energy_allowance * 1.54,1)
+            threshold_lv3 = round(energy_allowance * 1.36,1)
+            threshold_lv4 = round(energy_allowance * 1.18,1)
+        else:
+            #IF(fridge_type=5,ROUND(N4*1.72,1),ROUND(N4*1.6,1))
+            threshold_lv1 = round(energy_allowance * 1.6,1)
+            threshold_lv2 = round(energy_allowance * 1.45,1)
+            threshold_lv3 = round(energy_allowance * 1.3,1)
+            threshold_lv4 = round(energy_allowance * 1.15,1)
+        return[ threshold_lv1, threshold_lv2, threshold_lv3, threshold_lv4 ]
+
+    def future_ef_thresholds(self,energy_allowance,fridge_type):
+        if fridge_type == 5:
+            #IF(fridge_type=5,ROUND(N4*1.72,1),ROUND(N4*1.6,1))
+            threshold_lv1 = round(energy_allowance * 1.294,1)
+            threshold_lv2 = round(energy_allowance * 1.221,1)
+            threshold_lv3 = round(energy_allowance * 1.147,1)
+            threshold_lv4 = round(energy_allowance * 1.074,1)
+        else:
+            #IF(fridge_type=5,ROUND(N4*1.72,1),ROUND(N4*1.6,1))
+            threshold_lv1 = round(energy_allowance * 1.308,1)
+            threshold_lv2 = round(energy_allowance * 1.231,1)
+            threshold_lv3 = round(energy_allowance * 1.154,1)
+            threshold_lv4 = round(energy_allowance * 1.077,1)
+        return[ threshold_lv1, threshold_lv2, threshold_lv3, threshold_lv4 ]
+
+
+    def calculate(self, VF, VR, daily_consumption, freezer_temp, fridge_temp, fan_type):
+        """
+        計算冰箱能耗相關指標
+        
+        參數:
+            VR: 冷藏室容積(L)
+            VF: 冷凍室容積(L)
+            daily_consumption: 日耗電量(kWh/日)
+            fridge_temp: 冷藏室溫度(°C), 預設3.0
+            freezer_temp: 冷凍室溫度(°C), 預設-18.0
+        
+        返回:
+            包含所有計算結果的字典
+        """
+        results = {}
+        
+        # 1. 計算K值 (溫度係數)
+        #print(f"冷凍室溫度: {freezer_temp}, 冷藏室溫度: {fridge_temp}")
+        K = self.calculate_K_value(freezer_temp, fridge_temp)
+        #print(f"K值: {K}")
+        # 2. 計算等效內容積
+        # 25/10/01 新增有效內容積 = VR + VF
+        equivalent_volume = self.calculate_equivalent_volume(VR, VF, K)
+        effective_volume = VR + VF
+        
+        # 3. 確定冰箱型式
+        # 25/10/01 2027新能耗改用有效內容積來判斷冰箱型式
+        fridge_type_equivalent = self.determine_fridge_type(equivalent_volume, VR, VF, fan_type)
+        fridge_type_effective = self.determine_fridge_type(effective_volume, VR, VF, fan_type)
+        #print(f"冰箱型式: {fridge_type}")
+
+        # 4. 計算容許耗用能源基準 (每月)
+        energy_allowance = self.calculate_energy_allowance(equivalent_volume, fridge_type_equivalent)
+        
+        # 5. 計算2027容許耗用能源基準
+        future_energy_allowance = self.calculate_future_energy_allowance(equivalent_volume, fridge_type_effective)
+        
+        # 6. 計算耗電量基準 (每月)
+        benchmark_consumption = self.calculate_benchmark_consumption(equivalent_volume, energy_allowance)
+        
+        # 7. 計算2027耗電量基準
+        future_benchmark_consumption = self.calculate_future_benchmark_consumption(equivalent_volume, future_energy_allowance)
+        
+        # 8. 計算實測月耗電量
+        monthly_consumption = round(daily_consumption * 30, 1)
+        
+        # 9. 計算EF值 (能效因子)
+        if monthly_consumption == 0:
+            ef_value = 0.0
+        else:
+            ef_value = round(equivalent_volume / monthly_consumption,1)
+        
+        # 9.1 計算現有效率基準百分比和等級
+        current_ef_thresholds = self.current_ef_thresholds(energy_allowance, fridge_type_equivalent)
+
+        # 10. 計算現有效率基準百分比和等級
+        current_percent, current_grade = self.calculate_current_efficiency(ef_value, current_ef_thresholds)
+        
+        # 10.1 計算2027新效率基準百分比和等級
+        future_ef_thresholds = self.future_ef_thresholds(future_energy_allowance, fridge_type_effective)
+
+        # 11. 計算2027新效率基準百分比和等級
+        future_percent, future_grade = self.calculate_future_efficiency(ef_value, future_ef_thresholds)
+        
+        # 整理所有結果
+        results.update({
+            '冷凍室溫度': freezer_temp,
+            '冷藏室溫度': fridge_temp,
+            'K值': K,
+            'VF(L)': VF,
+            'VR(L)': VR,
+            '有效內容積(L)': effective_volume,
+            '等效內容積(L)': equivalent_volume,
+            '冰箱型式(等效內容積)': fridge_type_equivalent,
+            '冰箱型式(有效內容積)': fridge_type_effective,
+            '\n----能效相關計算結果----': '',
+            'EF值': ef_value,
+            '實測月耗電量(kWh/月)': monthly_consumption,
+            '2018年容許耗用能源基準(L/kWh/月)': energy_allowance,
+            '2018年耗電量基準(kWh/月)': benchmark_consumption,
+            '2018年一級效率EF值': current_ef_thresholds[0],
+            '2018年一級效率百分比(%)': current_percent,
+            '2018年效率等級': current_grade,
+
+            '\n----2027年新能效公式----': '',
+            '2027容許耗用能源基準(L/kWh/月)': future_energy_allowance,
+            '2027年耗電量基準(kWh/月)': future_benchmark_consumption,
+            '2027年一級效率EF值': future_ef_thresholds[0],
+            '2027年一級效率百分比(%)': future_percent,
+            '2027年效率等級': future_grade
+
+        })
+        
+        return results
+    
+    def calculate_array(self, VF, VR, daily_consumption, freezer_temp, fridge_temp, fan_type):
+        """
+        calculate 的陣列版: 參數可為 numpy 陣列或純量 (自動 broadcast), 一次計算 2018 與 2027 兩套流程。
+        回傳與 calculate 相同鍵值的 dict (不含顯示用的分隔標題), 每個值為陣列, 數值與 calculate 逐筆計算完全相同。
+        容許耗用能源基準為 0 等無效組合得到 inf/nan, 不會像 calculate 一樣拋出例外。
+        """
+        VF, VR, daily_consumption, freezer_temp, fridge_temp, fan_type = np.broadcast_arrays(
+            *(np.asarray(v, dtype=np.float64) for v in (VF, VR, daily_consumption, freezer_temp, fridge_temp, fan_type)))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            K = round_array((30 - freezer_temp) / (30 - fridge_temp), 2)
+            equivalent_volume = round_array(VR + (K * VF), 1)
+            effective_volume = VR + VF
+            fridge_type_equivalent = self.determine_fridge_type_array(equivalent_volume, VF, fan_type)
+            fridge_type_effective = self.determine_fridge_type_array(effective_volume, VF, fan_type)
+            eq_index = fridge_type_equivalent - 1
+            ef_index = fridge_type_effective - 1
+            energy_allowance = round_array(
+                equivalent_volume / (self.ALLOWANCE_A[eq_index] * equivalent_volume + self.ALLOWANCE_B[eq_index]), 1)
+            future_energy_allowance = round_array(
+                self.FUTURE_ALLOWANCE_FACTOR[ef_index] * equivalent_volume
+                / (self.ALLOWANCE_A[ef_index] * equivalent_volume + self.ALLOWANCE_B[ef_index]), 1)
+            benchmark_consumption = round_array(equivalent_volume / energy_allowance, 1)
+            future_benchmark_consumption = round_array(equivalent_volume / future_energy_allowance, 1)
+            monthly_consumption = round_array(daily_consumption * 30, 1)
+            ef_value = np.where(monthly_consumption == 0, 0.0,
+                                round_array(equivalent_volume / np.where(monthly_consumption == 0, 1, monthly_consumption), 1))
+            current_thresholds = round_array(
+                energy_allowance[..., None] * self.CURRENT_THRESHOLD_FACTORS[(fridge_type_equivalent == 5).astype(int)], 1)
+            future_thresholds = round_array(
+                future_energy_allowance[..., None] * self.FUTURE_THRESHOLD_FACTORS[(fridge_type_effective == 5).astype(int)], 1)
+            current_percent, current_grade = self.calculate_efficiency_array(ef_value, current_thresholds)
+            future_percent, future_grade = self.calculate_efficiency_array(ef_value, future_thresholds)
+        return {
+            '冷凍室溫度': freezer_temp,
+            '冷藏室溫度': fridge_temp,
+            'K值': K,
+            'VF(L)': VF,
+            'VR(L)': VR,
+            '有效內容積(L)': effective_volume,
+            '等效內容積(L)': equivalent_volume,
+            '冰箱型式(等效內容積)': fridge_type_equivalent,
+            '冰箱型式(有效內容積)': fridge_type_effective,
+            'EF值': ef_value,
+            '實測月耗電量(kWh/月)': monthly_consumption,
+            '2018年容許耗用能源基準(L/kWh/月)': energy_allowance,
+            '2018年耗電量基準(kWh/月)': benchmark_consumption,
+            '2018年一級效率EF值': current_thresholds[..., 0],
+            '2018年一級效率百分比(%)': current_percent,
+            '2018年效率等級': current_grade,
+            '2027容許耗用能源基準(L/kWh/月)': future_energy_allowance,
+            '2027年耗電量基準(kWh/月)': future_benchmark_consumption,
+            '2027年一級效率EF值': future_thresholds[..., 0],
+            '2027年一級效率百分比(%)': future_percent,
+            '2027年效率等級': future_grade,
+        }
+
+    def determine_fridge_type_array(self, volume, VF, fan_type):
+        """determine_fridge_type 的陣列版"""
+        return np.select(
+            [VF == 0, (volume < 400) & (fan_type == 1), (volume >= 400) & (fan_type == 1), (volume < 400) & (fan_type == 0)],
+            [5, 1, 2, 3], default=4)
+
+    def calculate_efficiency_array(self, ef_value, thresholds):
+        """calculate_current_efficiency / calculate_future_efficiency 的陣列版, thresholds 最後一維為 4 個等級門檻"""
+        final_percent = round_array(ef_value / thresholds[..., 0] * 100, 1)
+        grade = np.select(
+            [ef_value >= thresholds[..., 0], ef_value >= thresholds[..., 0] * 0.95, ef_value >= thresholds[..., 1],
+             ef_value >= thresholds[..., 2], ef_value >= thresholds[..., 3]],
+            ["1級", "1*級", "2級", "3級", "4級"], default="5級")
+        return final_percent, grade
+
+    def calculate_K_value(self, freezer_temp, fridge_temp):
+        """計算K值 (溫度係數)"""
+        # 根據公式 K = (30 - 冷凍庫溫度) / (30 - 冷藏庫溫度)
+        #print(f"冷凍庫溫度: {freezer_temp}, 冷藏庫溫度: {fridge_temp}")        
+        return round((30 - freezer_temp) / (30 - fridge_temp), 2)
+    
+    def calculate_equivalent_volume(self, VR, VF, K):
+        """計算等效內容積"""
+        return round(VR + (K * VF), 1)
+    
+    def determine_fridge_type(self, volume, VR, VF, fan_type):
+        """確定冰箱型式"""
+        if VF == 0:  # 只有冷藏室
+            return 5
+        elif volume < 400 and fan_type == 1:
+            return 1  # 假設是風冷式(實際應根據具體設計)
+        elif volume >= 400 and fan_type == 1:
+            return 2
+        elif volume < 400 and fan_type == 0:
+            return 3
+        else:
+            return 4  # 假設是風冷式(實際應根據具體設計)
+    
+    def calculate_energy_allowance(self, equivalent_volume, fridge_type):
+        """計算容許耗用能源基準"""
+        # 根據公式，ROUND(IFS(fridge_type=1,equivalent_volume/(0.037*equivalent_volume+24.3),fridge_type=2,equivalent_volume/(0.031*M4+21),fridge_type=3,equivalent_volume/(0.033*equivalent_volume+19.7),fridge_type=4,equivalent_volume/(0.029*equivalent_volume+17),fridge_type=5,equivalent_volume/(0.033*equivalent_volume+15.8)),1)
+        if fridge_type == 1:
+            return round( equivalent_volume / (0.037 * equivalent_volume + 24.3), 1)
+        elif fridge_type == 2:
+            return round( equivalent_volume / (0.031 * equivalent_volume + 21), 1)
+        elif fridge_type == 3:
+            return round( equivalent_volume / (0.033 * equivalent_volume + 19.7), 1)
+        elif fridge_type == 4:
+            return round( equivalent_volume / (0.029 * equivalent_volume + 17), 1)
+        else:
+            return round( equivalent_volume / (0.033 * equivalent_volume + 15.8), 1)
+    
+    def calculate_future_energy_allowance(self, equivalent_volume, fridge_type):
+        """計算2027年容許耗用能源基準"""
+        # 公式:=ROUND(IFS(F4=1,1.3*M4/(0.037*M4+24.3),F4=2,1.3*M4/(0.031*M4+21),F4=3,1.3*M4/(0.033*M4+19.7),F4=4,1.3*M4/(0.029*M4+17),F4=5,1.36*M4/(0.033*M4+15.8)),1)
+        # F4 = fridge_type, M4 = equivalent_volume
+        if fridge_type == 1:
+            return round( 1.3 * equivalent_volume / (0.037 * equivalent_volume + 24.3), 1)
+        elif fridge_type == 2:
+            return round( 1.3 * equivalent_volume / (0.031 * equivalent_volume + 21), 1)
+        elif fridge_type == 3:
+            return round(1.3 * equivalent_volume / (0.033 * equivalent_volume + 19.7), 1)
+        elif fridge_type == 4:
+            return round(1.3 * equivalent_volume / (0.029 * equivalent_volume + 17), 1)
+        else:
+            return round(1.36 * equivalent_volume / (0.033 * equivalent_volume + 15.8), 1)
+
+    def calculate_benchmark_consumption(self, equivalent_volume, energy_allowance):
+        """計算耗電量基準"""
+        # 根據公式:ROUND(equivalent_volume / energy_allowance, 1)
+        return round(equivalent_volume / energy_allowance, 1)
+    
+    def calculate_future_benchmark_consumption(self, equivalent_volume, future_energy_allowance):
+        """計算2027耗電量基準"""
+        return round(equivalent_volume / future_energy_allowance, 1)
+    
+    def calculate_current_efficiency(self, ef_value, thresholds):
+        # 確定等級
+        if ef_value >= thresholds[0]:
+            grade = "1級"
+            final_percent = round(ef_value / thresholds[0] * 100, 1)
+        elif ef_value >= thresholds[0] * 0.95:
+            grade = "1*級"
+            final_percent = round(ef_value / thresholds[0] * 100, 1)
+        elif ef_value >= thresholds[1]:
+            grade = "2級"
+            final_percent = round(ef_value / thresholds[0] * 100, 1)
+        elif ef_value >= thresholds[2]:
+            grade = "3級"
+            final_percent = round(ef_value / thresholds[0] * 100, 1)
+        elif ef_value >= thresholds[3]:
+            grade = "4級"
+            final_percent = round(ef_value / thresholds[0] * 100, 1)
+        else :
+            grade = "5級"
+            final_percent = round(ef_value / thresholds[0] * 100, 1)
+        
+        return final_percent, grade
+    
+    def calculate_future_efficiency(self, ef_value, thresholds):
+        # 確定等級
+        if ef_value >= thresholds[0]:
+            grade = "1級"
+            final_percent = round(ef_value / thresholds[0] * 100, 1)
+        elif ef_value >= thresholds[0] * 0.95:
+            grade = "1*級"
+            final_percent = round(ef_value / thresholds[0] * 100, 1)
+        elif ef_value >= thresholds[1]:
+            grade = "2級"
+            final_percent = round(ef_value / thresholds[0] * 100, 1)
+        elif ef_value >= thresholds[2]:
+            grade = "3級"
+            final_percent = round(ef_value / thresholds[0] * 100, 1)
+        elif ef_value >= thresholds[3]:
+            grade = "4級"
+            final_percent = round(ef_value / thresholds[0] * 100, 1)
+        else :
+            grade = "5級"
+            final_percent = round(ef_value / thresholds[0] * 100, 1)
+        
+        return final_percent, grade
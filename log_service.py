@@ -0,0 +1,140 @@
+# SAMPO RD2 LAB Data Collection - 非阻塞記錄
+#-------------------------------------------------------------------------------
+# log_error/log_info 只把記錄放進佇列 (QueueHandler, put_nowait), 由背景的 QueueListener
+# 執行緒寫入檔案與主控台, 取樣執行緒不會因為開檔/寫檔而停住:
+#   - 檔案依大小輪替 (LOG_MAX_BYTES x LOG_BACKUPS), 或設定 rotation="midnight" 每天輪替
+#   - 相同的訊息在 RATE_LIMIT_SECONDS 內只寫一次, 下一次寫入時附上略過的筆數
+#   - 結構化欄位 (station, device, latency ...) 附加在訊息後: "... | station=工位1 device=pw3335@..."
+#   - 佇列已滿 (寫檔嚴重落後) 時直接丟棄並計數, 不等待
+# 每個行程各自一個 listener; 擷取行程寫入另一個檔案, 避免兩個行程同時輪替同一個檔案。
+#-------------------------------------------------------------------------------
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+from metrics import REGISTRY
+
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 5
+RATE_LIMIT_SECONDS = 60
+QUEUE_SIZE = 10000
+LOGGER_NAME = "lab"
+
+
+class RateLimitFilter(logging.Filter):
+    """相同等級, 訊息與欄位 (不含 latency) 在 interval 秒內只放行第一筆, 之後放行的那一筆附上略過的筆數"""
+    def __init__(self, interval=RATE_LIMIT_SECONDS, max_keys=1000):
+        super().__init__()
+        self.interval = interval
+        self.max_keys = max_keys
+        self._seen = {}  # (等級, 訊息, 欄位) -> [上次放行時間, 略過筆數]
+
+    def filter(self, record):
+        fields = getattr(record, "fields", None) or {}
+        key = (record.levelno, record.getMessage(),
+               tuple(sorted((k, str(v)) for k, v in fields.items() if k != "latency")))
+        now = record.created
+        entry = self._seen.get(key)
+        if entry is not None and now - entry[0] < self.interval:
+            entry[1] += 1
+            return False
+        record.suppressed = entry[1] if entry is not None else 0
+        self._seen[key] = [now, 0]
+        if len(self._seen) > self.max_keys:
+            # 清除已超過時間窗的訊息
+            self._seen = {k: v for k, v in self._seen.items() if now - v[0] < self.interval}
+        return True
+
+
+class LabFormatter(logging.Formatter):
+    """與原本 log_to_file 相同的 "[ERROR] 時間 - 訊息" 格式, 後面加上結構化欄位"""
+    def format(self, record):
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
+        text = f"[{record.levelname}] {timestamp} - {record.getMessage()}"
+        fields = getattr(record, "fields", None)
+        if fields:
+            text += " | " + " ".join(f"{key}={_field_text(value)}" for key, value in fields.items())
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            text += f" (上次記錄後略過 {suppressed} 筆相同訊息)"
+        if record.exc_info:
+            text += "\n" + self.formatException(record.exc_info)
+        return text
+
+
+def _field_text(value):
+    return f"{value:.3f}" if isinstance(value, float) else str(value)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """佇列已滿時丟棄記錄, 呼叫端永遠不會等待"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = REGISTRY.counter("log_dropped_total", "記錄佇列已滿而丟棄的筆數")
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped.inc()
+
+
+class _RateLimitedListener(logging.handlers.QueueListener):
+    """每筆記錄只經過一次頻率限制, 再交給所有 handler (檔案與主控台的結果一致)"""
+    def __init__(self, log_queue, *handlers, rate_limit=None):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.rate_limit = rate_limit or RateLimitFilter()
+
+    def handle(self, record):
+        if self.rate_limit.filter(record):
+            super().handle(record)
+
+
+_lock = threading.Lock()
+_listener = None
+
+
+def setup_logging(path, rotation="size", console=True):
+    """建立本行程的記錄器 (只會建立一次), 回傳 logging.Logger"""
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    with _lock:
+        if _listener is not None:
+            return logger
+        if rotation == "size":
+            file_handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8", delay=True)
+        else:
+            file_handler = logging.handlers.TimedRotatingFileHandler(
+                path, when=rotation, backupCount=LOG_BACKUPS, encoding="utf-8", delay=True)
+        handlers = [file_handler]
+        if console and sys.stdout is not None:  # pyinstaller 視窗程式沒有主控台
+            handlers.append(logging.StreamHandler(sys.stdout))
+        formatter = LabFormatter()
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        log_queue = queue.Queue(QUEUE_SIZE)
+        REGISTRY.gauge_function("queue_depth", log_queue.qsize, "佇列中等待處理的項目數", queue="log")
+        _listener = _RateLimitedListener(log_queue, *handlers)
+        _listener.start()
+        logger.addHandler(_DroppingQueueHandler(log_queue))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        atexit.register(shutdown_logging)
+    return logger
+
+
+def shutdown_logging():
+    """寫完佇列中剩下的記錄並停止 listener"""
+    global _listener
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -0,0 +1,326 @@
+# SAMPO RD2 LAB Data Collection - 執行指標與裝置斷路器
+#-------------------------------------------------------------------------------
+# 各執行緒共用的指標登錄 (REGISTRY), 記錄:
+#   直方圖: GX20/PW3335 每台裝置的來回時間, GX20 解析時間, 各工位 CSV 寫入與圖表更新時間
+#   計數器: 裝置錯誤, 重新連線, 斷路器跳脫, 延遲/漏掉的取樣週期
+#   量測值: 佇列深度 (可用函式在讀取時才計算)
+#   timed 裝飾器: 熱點函式的執行時間 hot_path_seconds{function=...}
+# 斷路器: 裝置連續失敗 failure_threshold 次後開啟, reset_seconds 內直接略過連線 (不必等連線逾時),
+#   之後放行一次試探 (half_open), 成功則關閉。
+# 指標以本機 HTTP 端點提供 (只接受 127.0.0.1):
+#   /metrics       Prometheus text format
+#   /metrics.json  JSON
+# 擷取行程 (Acquisition_process_mode) 內的指標屬於該行程, 不會出現在 GUI 的端點。
+#-------------------------------------------------------------------------------
+import bisect
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # 秒
+BREAKER_STATES = ("closed", "open", "half_open")
+
+
+def _label_text(labels):
+    return ",".join(f'{key}="{value}"' for key, value in labels)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, func=None):
+        self._func = func
+        self._value = 0.0
+
+    def set(self, value):
+        self._value = value
+
+    @property
+    def value(self):
+        if self._func is not None:
+            try:
+                return self._func()
+            except Exception:
+                return None
+        return self._value
+
+
+class Histogram:
+    """固定上界的累計直方圖 (與 Prometheus 相同), 另外記錄最大值與最後一筆"""
+    kind = "histogram"
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._lock = threading.Lock()
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # 最後一格為 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.last = None
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+            self.last = value
+            if value > self.max:
+                self.max = value
+
+    @contextmanager
+    def time(self):
+        """以 with 區塊的執行時間 (秒) 加入一筆"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def quantile(self, q):
+        """由 bucket 估計分位數 (bucket 內線性內插, 不超過最大值)"""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = q * self.count
+            total, lower = 0, 0.0
+            for bound, count in zip(self.bounds + (self.max,), self.counts):
+                if count and total + count >= rank:
+                    upper = min(bound, self.max)
+                    return lower + (upper - lower) * (rank - total) / count
+                total += count
+                lower = bound
+            return self.max
+
+    def summary(self):
+        with self._lock:
+            count, total, vmax, last = self.count, self.sum, self.max, self.last
+        return {"count": count, "sum": total, "mean": total / count if count else None,
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95), "max": vmax, "last": last}
+
+
+class MetricsRegistry:
+    """以 (名稱, 標籤) 取得或建立指標; 同名稱的指標必須是同一種類"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}  # name -> {labels tuple: metric}
+        self._docs = {}
+        self._kinds = {}
+        self.breakers = {}  # 名稱 -> CircuitBreaker
+
+    def _get(self, name, kind, factory, doc, labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            if self._kinds.setdefault(name, kind) != kind:
+                raise ValueError(f"指標 {name} 已登錄為 {self._kinds[name]}")
+            if doc:
+                self._docs.setdefault(name, doc)
+            family = self._metrics.setdefault(name, {})
+            metric = family.get(key)
+            if metric is None:
+                metric = family[key] = factory()
+            return metric
+
+    def counter(self, name, doc="", **labels):
+        return self._get(name, "counter", Counter, doc, labels)
+
+    def gauge(self, name, doc="", **labels):
+        return self._get(name, "gauge", Gauge, doc, labels)
+
+    def gauge_function(self, name, func, doc="", **labels):
+        """讀取時才呼叫 func 的量測值 (例如佇列深度); 同標籤再次登錄時換成新的 func"""
+        gauge = self._get(name, "gauge", Gauge, doc, labels)
+        gauge._func = func
+        return gauge
+
+    def histogram(self, name, doc="", buckets=DEFAULT_BUCKETS, **labels):
+        return self._get(name, "histogram", lambda: Histogram(buckets), doc, labels)
+
+    def _families(self):
+        with self._lock:
+            return [(name, self._kinds[name], self._docs.get(name, ""), list(family.items()))
+                    for name, family in sorted(self._metrics.items())]
+
+    def prometheus_text(self):
+        lines = []
+        for name, kind, doc, family in self._families():
+            if doc:
+                lines.append(f"# HELP {name} {doc}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in family:
+                text = _label_text(labels)
+                if kind == "histogram":
+                    with metric._lock:
+                        counts, count, total = list(metric.counts), metric.count, metric.sum
+                    cumulative = 0
+                    for bound, n in zip(metric.bounds + (float("inf"),), counts):
+                        cumulative += n
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f"{name}_bucket{{{text + ',' if text else ''}le=\"{le}\"}} {cumulative}")
+                    suffix = f"{{{text}}}" if text else ""
+                    lines.append(f"{name}_sum{suffix} {total}")
+                    lines.append(f"{name}_count{suffix} {count}")
+                else:
+                    value = metric.value
+                    if value is not None:
+                        lines.append(f"{name}{{{text}}} {value}" if text else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """JSON 格式: {"time", "metrics": {名稱: [{"labels", 數值或直方圖摘要}]}, "breakers": {名稱: 狀態}}"""
+        metrics = {}
+        for name, kind, _, family in self._families():
+            entries = metrics[name] = []
+            for labels, metric in family:
+                entry = {"labels": dict(labels)}
+                if kind == "histogram":
+                    entry.update(metric.summary())
+                else:
+                    entry["value"] = metric.value
+                entries.append(entry)
+        with self._lock:
+            breakers = {name: breaker.state for name, breaker in self.breakers.items()}
+        return {"time": time.time(), "metrics": metrics, "breakers": breakers}
+
+
+REGISTRY = MetricsRegistry()
+
+
+def timed(name, registry=REGISTRY):
+    """裝飾器: 每次呼叫的執行時間記錄到 hot_path_seconds{function=name}"""
+    def decorate(func):
+        histogram = registry.histogram("hot_path_seconds", "熱點函式執行時間", function=name)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+class CircuitBreaker:
+    """裝置斷路器: closed (正常) -> 連續失敗 -> open (略過) -> reset_seconds 後 half_open (試一次)"""
+    def __init__(self, name, failure_threshold=3, reset_seconds=30.0, registry=REGISTRY):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+        self._trips = registry.counter("circuit_breaker_trips_total", "斷路器開啟次數", device=name)
+        registry.gauge_function("circuit_breaker_state", lambda: BREAKER_STATES.index(self.state),
+                                "斷路器狀態 0=closed 1=open 2=half_open", device=name)
+        with registry._lock:
+            registry.breakers[name] = self
+
+    def allow(self):
+        """是否可以連線; open 超過 reset_seconds 時轉為 half_open 放行一次"""
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self.state = "half_open"
+            return True
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = "closed"
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self._trips.inc()
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            body, content_type = self.registry.prometheus_text(), "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/metrics.json":
+            body, content_type = json.dumps(self.registry.snapshot(), ensure_ascii=False), "application/json; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # 不輸出每個請求
+
+
+class MetricsServer:
+    """本機指標 HTTP 端點 (背景執行緒)"""
+    def __init__(self, port, registry=REGISTRY, host="127.0.0.1"):
+        handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics_server", daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def format_status(snapshot):
+    """狀態頁面的文字: 斷路器, 直方圖 (次數/平均/p50/p95/最大, 毫秒) 與計數器/量測值"""
+    lines = []
+    if snapshot["breakers"]:
+        lines.append("斷路器: " + ", ".join(f"{name} {state}" for name, state in sorted(snapshot["breakers"].items())))
+        lines.append("")
+    histograms, values = [], []
+    for name, entries in snapshot["metrics"].items():
+        for entry in entries:
+            labels = ",".join(str(v) for v in entry["labels"].values())
+            title = f"{name}[{labels}]" if labels else name
+            (histograms if "count" in entry else values).append((title, entry))
+    if histograms:
+        lines.append(f"{'項目':<48}{'次數':>8}{'平均ms':>10}{'p50ms':>10}{'p95ms':>10}{'最大ms':>10}")
+        for title, entry in histograms:
+            ms = [f"{entry[k] * 1e3:.1f}" if entry[k] is not None else "--" for k in ("mean", "p50", "p95", "max")]
+            lines.append(f"{title:<48}{entry['count']:>8}" + "".join(f"{v:>10}" for v in ms))
+        lines.append("")
+    for title, entry in values:
+        value = entry["value"]
+        lines.append(f"{title:<48}{value if value is not None else '--':>8}")
+    return "\n".join(lines)
@@ -0,0 +1,154 @@
+# SAMPO RD2 LAB Data Collection - 執行中效能分析
+#-------------------------------------------------------------------------------
+# 不需重新啟動程式即可查看時間花在哪裡:
+#   SamplingProfiler: 背景執行緒每 interval 秒以 sys._current_frames() 取樣所有執行緒的呼叫堆疊
+#     (牆上時間, 等待中的執行緒也會出現), 持續 N 秒或手動停止後寫出 collapsed stack 檔:
+#     每行 "執行緒名稱;外層函式;...;內層函式 次數", 可直接給 flamegraph.pl / speedscope / inferno
+#   MemoryTracker: tracemalloc 快照, 依程式行列出配置最多的位置與上次快照之後的增量,
+#     並列出各工位資料結構 (StationHistory 記憶體/磁碟, StationRollup 陣列) 的用量
+# 熱點函式的計時見 metrics.timed (hot_path_seconds)。
+#-------------------------------------------------------------------------------
+import collections
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+PROFILE_INTERVAL = 0.005  # 取樣間隔 (秒)
+THREAD_NAMES_REFRESH = 200  # 每取樣幾次重新取得執行緒名稱 (出現新的執行緒時也會重新取得)
+
+
+def _frame_label(code, cache):
+    label = cache.get(code)
+    if label is None:
+        name = getattr(code, "co_qualname", code.co_name)
+        label = cache[code] = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+    return label
+
+
+class SamplingProfiler:
+    """所有執行緒的取樣式效能分析, 結果為 collapsed stack 檔"""
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.path = None
+        self.result = None  # 完成後為 (path, 取樣次數), 由呼叫端輪詢 (不從取樣執行緒回呼)
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds, path):
+        """開始取樣 seconds 秒, 完成後寫入 path 並設定 result"""
+        if self.running:
+            raise RuntimeError("效能分析已在執行中")
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.path = path
+        self.result = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(seconds,), name="sampling_profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=0):
+        """
+        提前結束 (仍會寫出已取樣的結果)。預設不等待取樣執行緒, 可在 Tk 主執行緒呼叫;
+        完成與否以 result 判斷。timeout 為 None 時等到寫完為止。
+        """
+        self._stop.set()
+        if self._thread is not None and timeout != 0:
+            self._thread.join(timeout)
+
+    def _run(self, seconds):
+        own = threading.get_ident()
+        labels = {}
+        names = {}
+        deadline = time.monotonic() + seconds
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            frames = sys._current_frames()
+            if self.samples % THREAD_NAMES_REFRESH == 0 or not names.keys() >= frames.keys():
+                names = {t.ident: t.name.replace(";", ":") for t in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code, labels))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+            self._stop.wait(self.interval)
+        self.write(self.path)
+        self.result = (self.path, self.samples)
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def profile_path(directory):
+    return os.path.join(directory, f"profile_{datetime.now():%Y%m%d_%H%M%S}.folded")
+
+
+def _size(nbytes):
+    return f"{nbytes / 1e6:.1f} MB"
+
+
+class MemoryTracker:
+    """tracemalloc 快照與各工位資料結構用量; 第一次呼叫時才開始追蹤"""
+    def __init__(self, frames=1):
+        self.frames = frames
+        self.previous = None
+
+    def report(self, stations, top=15):
+        """
+        stations: {工位: (StationHistory, StationRollup)}, 回傳報告文字。
+        tracemalloc 只追蹤開始之後的配置, 第一次呼叫時開始並以當時的快照為比較基準。
+        """
+        lines = [f"{'工位':<8}{'記憶體筆數':>12}{'記憶體(估計)':>14}{'磁碟筆數':>12}{'磁碟檔案':>12}{'彙總陣列':>12}"]
+        for station_name, (history, rollup) in stations.items():
+            usage = history.memory_usage()
+            rollup_bytes = sum(rollup.memory_usage().values()) if rollup is not None else 0
+            lines.append(f"{station_name:<8}{usage['hot_rows']:>12}{_size(usage['hot_bytes']):>14}"
+                         f"{usage['spilled_rows']:>12}{_size(usage['spilled_bytes']):>12}{_size(rollup_bytes):>12}")
+        lines.append("")
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self.previous = self._snapshot()
+            lines.append("tracemalloc 已開始追蹤, 再取一次快照可看到之後的配置與增量")
+            return "\n".join(lines)
+        snapshot = self._snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        lines.append(f"tracemalloc: 目前 {_size(current)}, 峰值 {_size(peak)}")
+        lines.append(f"配置最多的位置 (前 {top}):")
+        for stat in snapshot.statistics("lineno")[:top]:
+            frame = stat.traceback[0]
+            lines.append(f"  {_size(stat.size):>10} {stat.count:>9} 個  {os.path.basename(frame.filename)}:{frame.lineno}")
+        if self.previous is not None:
+            lines.append(f"上次快照之後的增量 (前 {top}):")
+            for stat in snapshot.compare_to(self.previous, "lineno")[:top]:
+                frame = stat.traceback[0]
+                lines.append(f"  {stat.size_diff / 1e6:>+9.2f} MB {stat.count_diff:>+9} 個  "
+                             f"{os.path.basename(frame.filename)}:{frame.lineno}")
+        self.previous = snapshot
+        return "\n".join(lines)
+
+    @staticmethod
+    def _snapshot():
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+
+    def stop(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.previous = None
@@ -0,0 +1,132 @@
+# SAMPO RD2 LAB Data Collection - 測試記錄重播
+#-------------------------------------------------------------------------------
+# 將已記錄的 CSV 以與 GX20/PW3335 相同的介面 (GX20GetData / query_data) 逐筆送回
+# App.collect_data, 完整經過 plot_data/彙總, CSV 與日誌/資料庫存檔, 圖表與即時分析,
+# 用來重現過去測試的 UI 變慢或驗證修改。
+#   播放速度: 1 = 實際時間, N = N 倍速, 0 = 盡快 (MAX)
+#   時間戳記沿用記錄的時間, 不使用系統時間
+# 統計:
+#   處理時間 = 每筆從取得樣本到開始等待下一筆 (包含存檔, 圖表與分析)
+#   最大可持續倍速 = 記錄時間長度 / 處理時間總和; 播放速度超過此值時會越來越落後 (延遲)
+#-------------------------------------------------------------------------------
+import time
+
+from acquisition_worker import STATIONS, TEMP_CHANNELS
+from csv_catalog import index_file, read_rows
+
+REPLAY_SPEEDS = {"1x": 1.0, "10x": 10.0, "60x": 60.0, "600x": 600.0, "MAX": 0.0}  # 播放速度選項
+
+
+class ReplayGX20:
+    """與 GX20.GX20GetData 相同格式的重播溫度: 重播工位為目前這筆記錄, 其他工位無資料 (999.9)"""
+    def __init__(self, source):
+        self.source = source
+        self.channels_temp = {station_name: [999.9] * TEMP_CHANNELS for station_name in STATIONS}
+
+    def GX20GetData(self):
+        temps = self.source.row[1]
+        channels_temp = dict(self.channels_temp)
+        channels_temp[self.source.station_name] = [999.9 if v is None else v for v in temps]
+        self.channels_temp = channels_temp
+        return self.channels_temp
+
+
+class ReplayPW3335:
+    """與 PW3335 相同介面的重播電力: query_data 回傳目前這筆記錄的 U, I, P, WP"""
+    def __init__(self, source):
+        self.source = source
+
+    def connect(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def query_data(self):
+        return list(self.source.row[2])  # 記錄中缺少的讀值維持 None, 與原始 CSV 相同
+
+
+class ReplaySource:
+    """單一工位的重播來源: 依播放速度逐筆提供記錄, 並統計處理時間與延遲"""
+    def __init__(self, path, station_name, speed=1.0):
+        self.path = path
+        self.station_name = station_name
+        self.speed = speed
+        self.gx20 = ReplayGX20(self)
+        self.pw3335 = ReplayPW3335(self)
+        self.snapshot = None  # 最近一筆的 GX20Snapshot, 供即時溫度顯示
+        self.row = None
+        self.count = 0
+        self.busy = 0.0
+        self.max_lag = 0.0
+        self.started = None
+        self.first_time = None
+        self.entry = index_file(path)  # 目錄資料: 頻道別名, 機種, 筆數, 起訖時間
+        self._rows = read_rows(path, entry=self.entry)
+        self._next = next(self._rows, None)
+        self._wake = None
+
+    @property
+    def seq(self):
+        """目前這筆的 GX20 快照序號, 記錄沒有 GX20Seq 時以筆數代替"""
+        return self.row[3] if self.row[3] >= 0 else self.count
+
+    def advance(self):
+        """取得下一筆記錄, 播放完畢回傳 False"""
+        if self._next is None:
+            return False
+        if self.started is None:
+            self.started = self._wake = time.perf_counter()
+            self.first_time = self._next[0]
+        self.row = self._next
+        self.count += 1
+        self._next = next(self._rows, None)
+        return True
+
+    def wait(self, stop_event=None):
+        """處理完一筆後等到下一筆的播放時間; 收到停止時回傳 True"""
+        now = time.perf_counter()
+        self.busy += now - self._wake
+        delay = 0.0
+        if self.speed > 0 and self._next is not None:
+            due = self.started + (self._next[0] - self.first_time).total_seconds() / self.speed
+            delay = due - now
+            self.max_lag = max(self.max_lag, -delay)
+        if delay > 0:
+            stopped = stop_event.wait(delay) if stop_event is not None else time.sleep(delay)
+        else:
+            stopped = stop_event is not None and stop_event.is_set()
+        self._wake = time.perf_counter()
+        return bool(stopped)
+
+    @property
+    def finished(self):
+        return self._next is None
+
+    def stats(self):
+        """重播統計: 筆數, 耗時, samples/s, 實際倍速, 最大可持續倍速, 每筆處理時間與最大延遲"""
+        wall = time.perf_counter() - self.started if self.started is not None else 0.0
+        span = (self.row[0] - self.first_time).total_seconds() if self.row is not None else 0.0
+        return {
+            "samples": self.count,
+            "total": self.entry["rows"],
+            "wall_seconds": wall,
+            "record_seconds": span,
+            "samples_per_second": self.count / wall if wall > 0 else None,
+            "speedup": span / wall if wall > 0 else None,
+            "max_speedup": span / self.busy if self.busy > 0 else None,
+            "busy_ms": self.busy / self.count * 1e3 if self.count else None,
+            "max_lag_seconds": self.max_lag,
+        }
+
+
+def format_replay_stats(stats):
+    """重播統計的文字"""
+    def number(value, fmt):
+        return format(value, fmt) if value is not None else "--"
+    return "\n".join([
+        f"筆數: {stats['samples']} / {stats['total']}, 記錄長度 {stats['record_seconds'] / 3600:.2f} 小時, 耗時 {stats['wall_seconds']:.1f} 秒",
+        f"處理量: {number(stats['samples_per_second'], '.1f')} samples/s, 每筆處理 {number(stats['busy_ms'], '.2f')} ms",
+        f"實際倍速: {number(stats['speedup'], '.1f')}x, 最大可持續倍速: {number(stats['max_speedup'], '.1f')}x",
+        f"最大延遲: {stats['max_lag_seconds']:.2f} 秒",
+    ])
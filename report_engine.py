@@ -0,0 +1,472 @@
+# SAMPO RD2 LAB Data Collection - 串流報告計算
+#-------------------------------------------------------------------------------
+# REPORT 頁面的統計 (各頻道平均溫度, 平均功率, 壓縮機 On/Off 區段, WP 差值與 24 小時推算,
+# 能耗計算) 以分段方式累計, 資料來源可以是記憶體中的 plot_data 或任意大小的 CSV 檔。
+# 每段資料為 (時間戳記, 彙總向量矩陣 n x ROLLUP_COLUMNS); 累計狀態只有各欄的部分和與
+# On/Off 區段清單, 記憶體用量與資料筆數無關。
+#-------------------------------------------------------------------------------
+import math
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+from csv_catalog import read_chunks
+from station_store import POWER_COLUMN, TEMP_CHANNELS, WP_COLUMN
+
+MAX_EVENT_LINES = 50  # 報告中列出的事件數上限
+MAX_CYCLE_LINES = 200  # 周期統計列出的區段數上限
+
+
+class ReportAccumulator:
+    """分段累計 REPORT 統計; 分段方式不影響結果"""
+    def __init__(self, onoffthrottle):
+        self.onoffthrottle = onoffthrottle
+        self.rows = 0
+        self.count = np.zeros(TEMP_CHANNELS + 1, dtype=np.int64)  # 20 個溫度 + 功率
+        self._sums = [[] for _ in range(TEMP_CHANNELS + 1)]       # 各段的部分和, 最後以 math.fsum 合計
+        self.first_time = self.last_time = None
+        self.first_wp = self.last_wp = None
+        self.segments = []  # 已結束的 On/Off 區段 [(是否 On, 持續秒數)]
+        self._state = None
+        self._segment_start = None
+
+    def add(self, times, values):
+        """加入一段依時間排序的資料"""
+        if len(times) == 0:
+            return
+        columns = values[:, :POWER_COLUMN + 1]
+        valid = ~np.isnan(columns)
+        self.count += valid.sum(axis=0)
+        for i, total in enumerate(np.where(valid, columns, 0.0).sum(axis=0).tolist()):
+            self._sums[i].append(total)
+        if self.first_time is None:
+            self.first_time = float(times[0])
+            self.first_wp = float(values[0, WP_COLUMN])
+            self._state = bool(values[0, POWER_COLUMN] >= self.onoffthrottle)
+            self._segment_start = self.first_time
+        # On/Off 區段: 功率 >= 門檻為 On (NaN 視為 Off); 區段持續時間為區段內第一筆到最後一筆
+        state = values[:, POWER_COLUMN] >= self.onoffthrottle
+        previous = np.concatenate([[self._state], state[:-1]])
+        for i in np.flatnonzero(state != previous).tolist():
+            end = float(times[i - 1]) if i > 0 else self.last_time
+            self.segments.append((self._state, end - self._segment_start))
+            self._state = bool(state[i])
+            self._segment_start = float(times[i])
+        self.rows += len(times)
+        self.last_time = float(times[-1])
+        self.last_wp = float(values[-1, WP_COLUMN])
+
+    def _mean(self, column):
+        if self.count[column] == 0:
+            return None
+        return math.fsum(self._sums[column]) / int(self.count[column])
+
+    def result(self, start, end, params=None, calculator=None):
+        """
+        完成統計。params 為能耗計算參數 dict (vf, vr, fan_type, temp_f, temp_r),
+        calculator 為 EnergyCalculator; vf/vr 有效時才計算能耗。
+        """
+        if self.rows == 0:
+            raise ValueError("統計範圍內沒有資料")
+        avg_temp = []
+        for i in range(TEMP_CHANNELS):
+            mean = self._mean(i)
+            avg_temp.append(float(np.round(mean, 1)) if mean is not None else None)
+        mean_power = self._mean(POWER_COLUMN)
+        avg_power = float(np.round(mean_power, 1)) if mean_power is not None else float("nan")
+        # 排除頭尾兩個不完整的區段
+        segments = self.segments + [(self._state, self.last_time - self._segment_start)]
+        power_cycles = len(self.segments) // 2
+        if len(segments) > 2:
+            segments = segments[1:-1]
+        above = [duration for on, duration in segments if on]
+        below = [duration for on, duration in segments if not on]
+        above_avg_time = math.fsum(above) / len(above) / 60 if above else 0
+        below_avg_time = math.fsum(below) / len(below) / 60 if below else 0
+        if above_avg_time + below_avg_time > 0:
+            above_percentage = above_avg_time / (above_avg_time + below_avg_time) * 100
+        else:
+            above_percentage = 0
+        wp_difference = self.last_wp - self.first_wp
+        total_seconds = self.last_time - self.first_time
+        wp_24h_difference = round(wp_difference / total_seconds * (24 * 3600), 1) if total_seconds > 0 else 0
+        results = None
+        if params is not None and calculator is not None and params["vf"] > 0 and params["vr"] > 0:
+            daily_consumption = round(wp_24h_difference / 1000, 3)  # 將 Wh 轉換為 kWh
+            results = calculator.calculate(params["vf"], params["vr"], daily_consumption,
+                                           params["temp_f"], params["temp_r"], params["fan_type"])
+        return {
+            "start": start,
+            "end": end,
+            "rows": self.rows,
+            "minutes": round((end - start).total_seconds() / 60, 1),
+            "avg_temp": avg_temp,
+            "avg_power": avg_power,
+            "onoffthrottle": self.onoffthrottle,
+            "power_cycles": power_cycles,
+            "above_count": len(above),
+            "below_count": len(below),
+            "above_avg_time": above_avg_time,
+            "below_avg_time": below_avg_time,
+            "above_percentage": above_percentage,
+            "wp_difference": wp_difference,
+            "wp_24h_difference": wp_24h_difference,
+            "results": results,
+        }
+
+
+class RollingSlope:
+    """
+    固定時間窗 (window_seconds) 的最小平方法斜率, 每筆樣本 O(1) 更新。
+    channels 為 None 時每筆為單一數值; 指定 channels 時每筆為各頻道數值, 各頻道分別略過無資料的樣本,
+    以向量一次更新所有頻道。
+    累計量以窗內第一筆為原點, 移出的筆數達到窗內筆數時重新計算一次, 避免長時間累積誤差。
+    """
+    def __init__(self, window_seconds, channels=None):
+        self.window_seconds = window_seconds
+        self.channels = channels
+        self.samples = deque()  # (時間戳記, 各頻道數值陣列)
+        self._rebuild()
+
+    def _rebuild(self):
+        width = self.channels or 1
+        self.origin = None  # (時間戳記, 各頻道數值), 無資料的頻道以 0 為原點
+        self.n, self.sx, self.sy, self.sxx, self.sxy = (np.zeros(width) for _ in range(5))
+        if self.samples:
+            times = np.fromiter((t for t, _ in self.samples), dtype=np.float64, count=len(self.samples))
+            values = np.array([y for _, y in self.samples])
+            valid = ~np.isnan(values)
+            self.origin = (times[0], np.where(valid[0], values[0], 0.0))
+            x = (times - times[0])[:, None]
+            v = np.where(valid, values - self.origin[1], 0.0)
+            self.n = valid.sum(axis=0).astype(np.float64)
+            self.sx = (valid * x).sum(axis=0)
+            self.sy = v.sum(axis=0)
+            self.sxx = (valid * x * x).sum(axis=0)
+            self.sxy = (x * v).sum(axis=0)
+        self._evicted = 0
+
+    def _vector(self, y):
+        if self.channels is None:
+            return np.array([np.nan if y is None else y], dtype=np.float64)
+        return np.array([np.nan if v is None else v for v in y[:self.channels]], dtype=np.float64)
+
+    def _accumulate(self, t, y, valid, sign):
+        x = t - self.origin[0]
+        v = np.where(valid, y - self.origin[1], 0.0)
+        w = valid * sign
+        self.n += w
+        self.sx += w * x
+        self.sy += sign * v
+        self.sxx += w * x * x
+        self.sxy += sign * x * v
+
+    def add(self, t, y):
+        """加入一筆 (時間戳記, 數值或各頻道數值); None/NaN 表示無資料, 全部無資料時略過"""
+        y = self._vector(y)
+        valid = ~np.isnan(y)
+        if not valid.any():
+            return
+        if self.origin is None:
+            self.origin = (t, np.where(valid, y, 0.0))
+        self.samples.append((t, y))
+        self._accumulate(t, y, valid, 1.0)
+        while self.samples[0][0] < t - self.window_seconds:
+            old_t, old_y = self.samples.popleft()
+            self._accumulate(old_t, old_y, ~np.isnan(old_y), -1.0)
+            self._evicted += 1
+        if self._evicted >= len(self.samples):
+            self._rebuild()
+
+    def extend(self, times, values):
+        """批次加入依時間排序的 (時間戳記陣列, 數值陣列或 n x channels 矩陣), 最後重新計算一次累計量"""
+        values = np.asarray(values, dtype=np.float64).reshape(len(times), self.channels or 1)
+        keep = ~np.isnan(values).all(axis=1)
+        self.samples.extend(zip(np.asarray(times)[keep].tolist(), values[keep]))
+        while self.samples and self.samples[0][0] < self.samples[-1][0] - self.window_seconds:
+            self.samples.popleft()
+        self._rebuild()
+
+    def reset(self, window_seconds=None):
+        if window_seconds is not None:
+            self.window_seconds = window_seconds
+        self.samples.clear()
+        self._rebuild()
+
+    def span(self):
+        """窗內資料涵蓋的秒數"""
+        return self.samples[-1][0] - self.samples[0][0] if self.samples else 0.0
+
+    def slope(self):
+        """每秒的變化量; 單一數值時資料不足回傳 None, 各頻道時資料不足的頻道為 NaN"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            denominator = self.n * self.sxx - self.sx * self.sx
+            slope = np.where((self.n >= 2) & (denominator > 0),
+                             (self.n * self.sxy - self.sx * self.sy) / denominator, np.nan)
+        if self.channels is None:
+            return None if np.isnan(slope[0]) else float(slope[0])
+        return slope
+
+
+def live_efficiency(wp_slope, params, calculator):
+    """
+    由 WP(Wh) 斜率 (Wh/秒) 推算日耗電量並計算能耗; 與 REPORT 相同使用 kWh 取到小數 3 位。
+    回傳 (日耗電量 kWh, calculate 結果或 None)
+    """
+    if wp_slope is None:
+        return None, None
+    daily_consumption = round(wp_slope * 24 * 3600 / 1000, 3)
+    if params["vf"] > 0 and params["vr"] > 0:
+        return daily_consumption, calculator.calculate(params["vf"], params["vr"], daily_consumption,
+                                                       params["temp_f"], params["temp_r"], params["fan_type"])
+    return daily_consumption, None
+
+
+def on_off_segments(times, power, onoffthrottle):
+    """
+    On/Off 區段索引: 回傳 (各區段第一筆索引, 各區段最後一筆索引, 是否 On)。
+    與 ReportAccumulator 相同, 功率 >= 門檻為 On, NaN 視為 Off。
+    """
+    state = power >= onoffthrottle
+    starts = np.concatenate([[0], np.flatnonzero(state[1:] != state[:-1]) + 1])
+    ends = np.concatenate([starts[1:] - 1, [len(times) - 1]])
+    return starts, ends, state[starts]
+
+
+def sweep_windows(times, values, length_seconds=None, cycles=None, f_channels=(), r_channels=(),
+                  f_max=None, r_max=None, r_min=None, onoffthrottle=5, rank_by="energy", limit=10):
+    """
+    對每個候選區間計算 REPORT 指標並找出符合溫度條件的區間。
+    候選區間: length_seconds 指定時, 以每一筆資料為起點、涵蓋 length_seconds 的區間;
+    cycles 指定時, 以每個 On 區段開始為起點、涵蓋 cycles 個完整 On/Off 周期的區間。
+    各指標以累積和與區段索引 O(1) 取得, 不需對每個區間重新計算:
+      f_temp / r_temp : f_channels / r_channels 各頻道平均溫度的平均
+      wp_24h          : (最後一筆 WP - 第一筆 WP) 以線性法推算 24 小時
+      power_cycles    : 區間內 On/Off 切換次數 // 2
+      duty            : 排除頭尾區段後, On 平均時間 / (On + Off 平均時間) x 100
+    溫度條件: f_temp <= f_max, r_temp <= r_max, r_temp >= r_min (None 表示不限制)。
+    依 rank_by ("energy": 24 小時耗電量由低到高, "margin": 溫度餘裕由大到小) 排序,
+    挑出彼此不重疊的前 limit 個區間, 回傳 dict 清單。
+    """
+    n = len(times)
+    if n < 2:
+        return []
+    temps = values[:, :TEMP_CHANNELS]
+    valid = ~np.isnan(temps)
+    temp_sum = np.vstack([np.zeros(TEMP_CHANNELS), np.cumsum(np.where(valid, temps, 0.0), axis=0)])
+    temp_count = np.vstack([np.zeros(TEMP_CHANNELS, dtype=np.int64), np.cumsum(valid, axis=0)])
+    wp = values[:, WP_COLUMN]
+    seg_start, seg_end, seg_on = on_off_segments(times, values[:, POWER_COLUMN], onoffthrottle)
+    seg_of = np.repeat(np.arange(len(seg_start)), seg_end - seg_start + 1)  # 每一筆所屬的區段編號
+    duration = times[seg_end] - times[seg_start]
+    on_duration = np.concatenate([[0.0], np.cumsum(np.where(seg_on, duration, 0.0))])
+    off_duration = np.concatenate([[0.0], np.cumsum(np.where(seg_on, 0.0, duration))])
+    on_count = np.concatenate([[0], np.cumsum(seg_on)])
+    off_count = np.concatenate([[0], np.cumsum(~seg_on)])
+
+    if cycles:
+        first_seg = np.flatnonzero(seg_on)
+        first_seg = first_seg[first_seg + 2 * cycles - 1 < len(seg_start)]
+        lo = seg_start[first_seg]
+        hi = seg_end[first_seg + 2 * cycles - 1]
+    else:
+        lo = np.arange(n)
+        hi = np.searchsorted(times, times + length_seconds, side="right") - 1
+        # 只保留完整涵蓋 length_seconds 的區間 (允許一個取樣間隔的誤差)
+        step = float(np.median(np.diff(times)))
+        keep = times[hi] - times[lo] >= length_seconds - step
+        lo, hi = lo[keep], hi[keep]
+    if len(lo) == 0:
+        return []
+
+    def channel_mean(channels):
+        if not channels:
+            return np.full(len(lo), np.nan)
+        channels = list(channels)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = (temp_sum[hi + 1][:, channels] - temp_sum[lo][:, channels]) / \
+                    (temp_count[hi + 1][:, channels] - temp_count[lo][:, channels])
+        return np.nanmean(means, axis=1) if np.isfinite(means).any() else np.full(len(lo), np.nan)
+
+    f_temp = channel_mean(f_channels)
+    r_temp = channel_mean(r_channels)
+    span = times[hi] - times[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        wp_24h = np.where(span > 0, (wp[hi] - wp[lo]) / span * (24 * 3600), 0.0)
+    first, last = seg_of[lo], seg_of[hi]
+    power_cycles = (last - first) // 2
+    # 內部區段為完整區段; 區間內只有 1~2 個區段時與 REPORT 相同, 以截斷後的頭尾區段計算
+    inner_on = on_duration[last] - on_duration[first + 1]
+    inner_off = off_duration[last] - off_duration[first + 1]
+    inner_on_count = on_count[last] - on_count[first + 1]
+    inner_off_count = off_count[last] - off_count[first + 1]
+    few = last - first < 2
+    head = np.minimum(times[seg_end[first]], times[hi]) - times[lo]
+    tail = times[hi] - times[seg_start[last]]
+    head_on, tail_on = seg_on[first], seg_on[last]
+    two = few & (last > first)
+    inner_on = np.where(few, np.where(head_on, head, 0.0) + np.where(two & tail_on, tail, 0.0), inner_on)
+    inner_off = np.where(few, np.where(head_on, 0.0, head) + np.where(two & ~tail_on, tail, 0.0), inner_off)
+    inner_on_count = np.where(few, head_on.astype(int) + (two & tail_on), inner_on_count)
+    inner_off_count = np.where(few, (~head_on).astype(int) + (two & ~tail_on), inner_off_count)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        on_avg = np.where(inner_on_count > 0, inner_on / np.maximum(inner_on_count, 1) / 60, 0.0)
+        off_avg = np.where(inner_off_count > 0, inner_off / np.maximum(inner_off_count, 1) / 60, 0.0)
+        duty = np.where(on_avg + off_avg > 0, on_avg / (on_avg + off_avg) * 100, 0.0)
+
+    ok = np.ones(len(lo), dtype=bool)
+    margin = np.full(len(lo), np.inf)
+    if f_max is not None:
+        ok &= f_temp <= f_max
+        margin = np.minimum(margin, f_max - f_temp)
+    if r_max is not None:
+        ok &= r_temp <= r_max
+        margin = np.minimum(margin, r_max - r_temp)
+    if r_min is not None:
+        ok &= r_temp >= r_min
+        margin = np.minimum(margin, r_temp - r_min)
+    candidates = np.flatnonzero(ok)
+    order = candidates[np.argsort(wp_24h[candidates] if rank_by == "energy" else -margin[candidates], kind="stable")]
+    chosen = []
+    for k in order.tolist():
+        if any(lo[k] <= hi[c] and lo[c] <= hi[k] for c in chosen):
+            continue
+        chosen.append(k)
+        if len(chosen) >= limit:
+            break
+    return [{
+        "start": datetime.fromtimestamp(float(times[lo[k]])),
+        "end": datetime.fromtimestamp(float(times[hi[k]])),
+        "rows": int(hi[k] - lo[k] + 1),
+        "f_temp": float(f_temp[k]),
+        "r_temp": float(r_temp[k]),
+        "wp_24h": float(wp_24h[k]),
+        "power_cycles": int(power_cycles[k]),
+        "on_avg_time": float(on_avg[k]),
+        "off_avg_time": float(off_avg[k]),
+        "duty": float(duty[k]),
+        "margin": float(margin[k]),
+    } for k in chosen]
+
+
+def report_from_arrays(times, values, start, end, onoffthrottle, params=None, calculator=None):
+    """記憶體中的資料 (arrays_between 的結果) 計算報告"""
+    accumulator = ReportAccumulator(onoffthrottle)
+    accumulator.add(times, values)
+    return accumulator.result(start, end, params, calculator)
+
+
+def report_from_csv(path, start, end, onoffthrottle, params=None, calculator=None, entry=None, chunk_rows=50000):
+    """
+    分段讀取 CSV 檔計算 start ~ end (含 end) 的報告, 記憶體用量只與 chunk_rows 有關。
+    entry 為 csv_catalog 的目錄資料, 有的話直接 seek 到 start 附近。
+    """
+    accumulator = ReportAccumulator(onoffthrottle)
+    # 與記憶體路徑 (arrays_between 到 nextafter(end)) 相同, 以時間戳記比較並包含 end 那一筆
+    for times, temps, power in read_chunks(path, start, end, entry, chunk_rows, include_end=True):
+        accumulator.add(times, np.concatenate([temps, power[:, 2:4]], axis=1))
+    return accumulator.result(start, end, params, calculator)
+
+
+def format_events(report):
+    """除霜/開門事件表 (signal_analysis.detect_events) 與排除事件後的統計"""
+    events = report["events"]
+    info = report.get("event_info") or {}
+    lines = ["", f"事件：除霜 {sum(e['kind'] == '除霜' for e in events)} 次, 開門 {sum(e['kind'] == '開門' for e in events)} 次"]
+    if info.get("compressor_power") is not None:
+        lines.append(f"壓縮機運轉功率: {info['compressor_power']:.1f} W")
+    if info.get("period_hours") is not None:
+        lines.append(f"除霜周期: {info['period_hours']:.1f} 小時 (自相關 {info['strength']:.2f})")
+    for event in events[:MAX_EVENT_LINES]:
+        text = f"  {event['kind']} {event['start']:%m-%d %H:%M:%S} ~ {event['end']:%H:%M:%S} ({event['minutes']:.1f} 分)"
+        if event["kind"] == "除霜":
+            text += f" 最大功率 {event['peak_power']:.1f} W, 耗電 {event['energy']:.1f} Wh"
+        else:
+            text += f" 最大升溫 {event['max_rise']:.1f}°C, 頻道 {','.join(map(str, event['channels']))}"
+        lines.append(text)
+    if len(events) > MAX_EVENT_LINES:
+        lines.append(f"  ... 其餘 {len(events) - MAX_EVENT_LINES} 個事件未列出")
+    excluded = report.get("excluded")
+    if excluded is not None:
+        lines.append(f"排除事件後: {excluded['rows']} 筆, {excluded['hours']:.1f} 小時")
+        lines.append("  平均溫度: " + ", ".join(f"Ch{i+1} {avg:.1f}" for i, avg in enumerate(excluded["avg_temp"]) if avg is not None))
+        lines.append(f"  平均功率: {excluded['avg_power']} W")
+        lines.append(f"  24 小時電力消耗：{excluded['wp_24h']:.1f} w")
+        for key, value in (excluded["results"] or {}).items():
+            lines.append(f"  {key}: {value}")
+    return lines
+
+
+def format_phase_statistics(stats, channels):
+    """
+    周期統計 (signal_analysis.phase_statistics) 的文字: 各狀態合併統計與逐區段表。
+    channels 為 [(頻道索引, 別名)]; 逐區段表每個頻道列出 平均(幅度), 幅度為 On 降溫 / Off 回溫。
+    """
+    segments, states = stats["segments"], stats["states"]
+    lines = [f"壓縮機判定關閉門檻：{stats['onoffthrottle']}", ""]
+    for state, name in ((True, "On"), (False, "Off")):
+        summary = states[state]
+        if summary is None:
+            lines.append(f"壓縮機 {name}: 無完整區段")
+            continue
+        lines.append(f"壓縮機 {name}: {summary['segments']} 段, 平均 {summary['seconds'] / summary['segments'] / 60:.1f} 分")
+        for i, alias in channels:
+            if summary["count"][i] == 0:
+                lines.append(f"  Ch{i+1} {alias}: --")
+                continue
+            lines.append(f"  Ch{i+1} {alias}: 平均 {summary['mean'][i]:.2f} 最小 {summary['min'][i]:.1f} "
+                         f"最大 {summary['max'][i]:.1f} 標準差 {summary['std'][i]:.2f}")
+    lines.append("")
+    lines.append("區段  狀態  開始            分鐘   " + "  ".join(f"Ch{i+1} 平均(幅度)" for i, _ in channels))
+    total = len(segments["start"])
+    for k in range(min(total, MAX_CYCLE_LINES)):
+        cells = []
+        for i, _ in channels:
+            mean, swing = segments["mean"][k, i], segments["swing"][k, i]
+            cells.append("--" if np.isnan(mean) else f"{mean:.1f}({swing:.1f})")
+        lines.append(f"{k + 1:>4}  {'On ' if segments['on'][k] else 'Off'}   "
+                     f"{datetime.fromtimestamp(segments['start'][k]):%m-%d %H:%M:%S}  {segments['seconds'][k] / 60:5.1f}  "
+                     + "  ".join(cells))
+    if total > MAX_CYCLE_LINES:
+        lines.append(f"... 其餘 {total - MAX_CYCLE_LINES} 個區段未列出")
+    return "\n".join(lines) + "\n"
+
+
+def format_report(report):
+    """REPORT 頁面顯示的文字"""
+    lines = [
+        f"統計範圍：{report['start']} ~ {report['end']}",
+        f"筆數: {report['rows']}",
+        f"時間: {report['minutes']} 分鐘",
+        "平均溫度:",
+    ]
+    for i, avg in enumerate(report["avg_temp"]):
+        lines.append(f"Ch{i+1}: {avg:.1f}" if avg is not None else f"Ch{i+1}: --")
+    lines.append(f"平均功率: {report['avg_power']} W")
+    lines.append("")
+    lines.append(f"ON / Off 周期次數：{report['power_cycles']}")
+    lines.append(f"壓縮機判定關閉門檻：{report['onoffthrottle']}")
+    lines.append(f"On 的平均時間: {report['above_avg_time']:.1f} 分" if report["above_count"] > 0 else "On 的平均時間: 無資料")
+    lines.append(f"Off 的平均時間: {report['below_avg_time']:.1f} 分" if report["below_count"] > 0 else "Off 的平均時間: 無資料")
+    lines.append(f"On / Off 百分比: {report['above_percentage']:.2f}%")
+    lines.append("")
+    lines.append(f"電力消耗：{report['wp_difference']:.2f} w / {report['minutes']} 分")
+    lines.append(f"24 小時電力消耗：{report['wp_24h_difference']:.1f} w")
+    if "steady_since" in report:
+        steady_since = report["steady_since"]
+        if steady_since is None:
+            lines.append("穩定狀態：尚未穩定")
+        else:
+            inside = "統計範圍皆在穩定狀態內" if report["start"] >= steady_since else "統計範圍包含未穩定的資料"
+            lines.append(f"穩定狀態：自 {steady_since:%Y-%m-%d %H:%M:%S} 起穩定 ({inside})")
+    if "events" in report:
+        lines += format_events(report)
+    lines.append("")
+    lines.append("能耗計算：")
+    if report["results"]:
+        for key, value in report["results"].items():
+            lines.append(f"{key}: {value}")
+    else:
+        lines.append("無法計算能耗，請檢查數據")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,222 @@
+# SAMPO RD2 LAB Data Collection - SQLite 測試資料庫
+#-------------------------------------------------------------------------------
+# 選用的本機資料庫 (WAL 模式), 與 CSV 並存:
+#   runs    : 每次測試一筆, 記錄工位, CSV 檔名, 機種, VF/VR, 風扇型式, 頻道別名
+#   samples : 每筆樣本一列, 以 (station, t) 與 (run_id, t) 建立索引
+# 收集執行緒只把資料放入佇列, 由單一寫入執行緒批次寫入 (每 BATCH_ROWS 筆或
+# BATCH_SECONDS 秒一個 transaction); 查詢使用各自的連線, WAL 模式下讀寫互不阻擋。
+#-------------------------------------------------------------------------------
+import json
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+TEMP_CHANNELS = 20
+BATCH_ROWS = 500
+BATCH_SECONDS = 5.0
+
+TEMP_COLUMNS = [f"ch{i}" for i in range(1, TEMP_CHANNELS + 1)]
+POWER_COLUMNS = ["u", "i", "p", "wp"]
+SAMPLE_COLUMNS = ["run_id", "station", "t"] + TEMP_COLUMNS + POWER_COLUMNS + ["gx20_seq"]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    station TEXT NOT NULL,
+    file_name TEXT,
+    model TEXT,
+    vf REAL,
+    vr REAL,
+    fan_type INTEGER,
+    temp_f REAL,
+    temp_r REAL,
+    aliases TEXT,
+    start_time REAL NOT NULL,
+    end_time REAL
+);
+CREATE INDEX IF NOT EXISTS runs_model ON runs (model, start_time);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    station TEXT NOT NULL,
+    t REAL NOT NULL,
+    {", ".join(f"{c} REAL" for c in TEMP_COLUMNS + POWER_COLUMNS)},
+    gx20_seq INTEGER
+);
+CREATE INDEX IF NOT EXISTS samples_station_t ON samples (station, t);
+CREATE INDEX IF NOT EXISTS samples_run_t ON samples (run_id, t);
+"""
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class RunDatabase:
+    """測試資料庫, 寫入由背景執行緒批次處理"""
+    def __init__(self, path):
+        self.path = path
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="run_database", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # WAL 模式下斷電最多遺失最後一個 transaction
+        return conn
+
+    def start_run(self, station_name, meta):
+        """新增一次測試, 回傳 run_id; meta 為 file_name/model/vf/vr/fan_type/temp_f/temp_r/aliases"""
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO runs (station, file_name, model, vf, vr, fan_type, temp_f, temp_r, aliases, start_time)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (station_name, meta.get("file_name"), meta.get("model"),
+                     _to_float(meta.get("vf")), _to_float(meta.get("vr")), meta.get("fan_type"),
+                     _to_float(meta.get("temp_f")), _to_float(meta.get("temp_r")),
+                     json.dumps(meta.get("aliases", []), ensure_ascii=False), time.time()))
+            return cursor.lastrowid
+        finally:
+            conn.close()
+
+    def add_row(self, run_id, station_name, row):
+        """加入一筆 plot_data 資料列 [datetime, [20個溫度], [U, I, P, WP], GX20快照序號]"""
+        temps = list(row[1][:TEMP_CHANNELS]) + [None] * (TEMP_CHANNELS - len(row[1]))
+        power = list((row[2] or [])[:4])
+        power += [None] * (4 - len(power))
+        seq = row[3] if len(row) > 3 else None
+        self._queue.put(("row", (run_id, station_name, row[0].timestamp(), *temps, *power, seq)))
+
+    def end_run(self, run_id):
+        self._queue.put(("end", (time.time(), run_id)))
+
+    def pending(self):
+        """尚未寫入的佇列項目數"""
+        return self._queue.qsize()
+
+    def flush(self):
+        """等待佇列中的資料全部寫入"""
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        done.wait()
+
+    def close(self):
+        self._queue.put(("close", None))
+        self._writer.join()
+
+    def _write_loop(self):
+        conn = self._connect()
+        insert = f"INSERT INTO samples ({', '.join(SAMPLE_COLUMNS)}) VALUES ({', '.join('?' * len(SAMPLE_COLUMNS))})"
+        pending = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                kind, payload = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                kind, payload = "timeout", None
+            if kind == "row":
+                pending.append(payload)
+                if deadline is None:
+                    deadline = time.monotonic() + BATCH_SECONDS
+                if len(pending) < BATCH_ROWS:
+                    continue
+            if pending:
+                with conn:
+                    conn.executemany(insert, pending)
+                pending = []
+            deadline = None
+            if kind == "end":
+                with conn:
+                    conn.execute("UPDATE runs SET end_time = ? WHERE id = ?", payload)
+            elif kind == "flush":
+                payload.set()
+            elif kind == "close":
+                break
+        conn.close()
+
+    # ---- 查詢 ----
+    def _select(self, sql, params=()):
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def arrays_between(self, station_name, start, end):
+        """
+        取得工位在 [start, end) 區間的資料 (走 samples_station_t 索引)
+        回傳 (時間戳記, 溫度 Nx20, 電力 Nx4), 無資料為 NaN
+        """
+        rows = self._select(
+            f"SELECT t, {', '.join(TEMP_COLUMNS + POWER_COLUMNS)} FROM samples"
+            " WHERE station = ? AND t >= ? AND t < ? ORDER BY t",
+            (station_name, start.timestamp(), end.timestamp()))
+        data = np.array(rows, dtype=np.float64).reshape(-1, 1 + TEMP_CHANNELS + 4)
+        return data[:, 0], data[:, 1:1 + TEMP_CHANNELS], data[:, 1 + TEMP_CHANNELS:]
+
+    def rows_between(self, station_name, start, end):
+        """同 arrays_between, 回傳 plot_data 格式的資料列"""
+        rows = self._select(
+            f"SELECT t, {', '.join(TEMP_COLUMNS + POWER_COLUMNS)}, gx20_seq FROM samples"
+            " WHERE station = ? AND t >= ? AND t < ? ORDER BY t",
+            (station_name, start.timestamp(), end.timestamp()))
+        return [[datetime.fromtimestamp(r[0]), list(r[1:1 + TEMP_CHANNELS]),
+                 list(r[1 + TEMP_CHANNELS:5 + TEMP_CHANNELS]), r[-1]] for r in rows]
+
+    def find_runs(self, model=None, station_name=None, since=None):
+        """依機種/工位/開始時間查詢測試, 回傳 dict 清單"""
+        where, params = [], []
+        if model is not None:
+            where.append("model = ?")
+            params.append(model)
+        if station_name is not None:
+            where.append("station = ?")
+            params.append(station_name)
+        if since is not None:
+            where.append("start_time >= ?")
+            params.append(since.timestamp())
+        sql = ("SELECT id, station, file_name, model, vf, vr, fan_type, temp_f, temp_r, aliases, start_time, end_time"
+               " FROM runs")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        runs = []
+        for r in self._select(sql + " ORDER BY start_time", params):
+            runs.append({
+                "id": r[0], "station": r[1], "file_name": r[2], "model": r[3], "vf": r[4], "vr": r[5],
+                "fan_type": r[6], "temp_f": r[7], "temp_r": r[8], "aliases": json.loads(r[9] or "[]"),
+                "start_time": datetime.fromtimestamp(r[10]),
+                "end_time": datetime.fromtimestamp(r[11]) if r[11] is not None else None,
+            })
+        return runs
+
+    def runs_with_channel_below(self, alias, threshold, model=None, statistic="MAX"):
+        """
+        查詢別名為 alias 的頻道溫度低於 threshold 的測試, 例如「機種 X 冷凍室低於 -18°C」。
+        statistic: "MAX" 表示整個測試都低於門檻, "AVG" 表示平均低於門檻, "MIN" 表示曾經低於門檻。
+        各 run 的統計以 samples_run_t 索引範圍掃描取得, 不需讀取 CSV。
+        """
+        if statistic not in ("MAX", "AVG", "MIN"):
+            raise ValueError(f"不支援的統計方式: {statistic}")
+        matches = []
+        for run in self.find_runs(model=model):
+            if alias not in run["aliases"]:
+                continue
+            column = TEMP_COLUMNS[run["aliases"].index(alias)]
+            value = self._select(f"SELECT {statistic}({column}) FROM samples WHERE run_id = ?", (run["id"],))[0][0]
+            if value is not None and value < threshold:
+                run[statistic.lower()] = value
+                matches.append(run)
+        return matches
@@ -0,0 +1,143 @@
+# SAMPO RD2 LAB Data Collection - 測試日誌 (write-ahead journal)
+#-------------------------------------------------------------------------------
+# 每個工位收集期間寫入兩個檔案:
+#   {工位}.wal  : 固定長度的二進位樣本記錄 (JOURNAL_RECORD), 每筆樣本 append 並 flush
+#   {工位}.json : 工位設定 (CSV 檔名, 機種資料, 頻道/別名, 計算區間...), 定期 checkpoint
+#                 時以暫存檔 + os.replace 原子更新, 同時對 .wal 做 fsync
+# 正常按下 Stop 後刪除日誌; 程式當掉或重開機後, 啟動時可由日誌接續同一個測試。
+#-------------------------------------------------------------------------------
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+TEMP_CHANNELS = 20
+CHECKPOINT_SECONDS = 60
+
+JOURNAL_RECORD = np.dtype([
+    ("t", "<f8"),                        # 時間戳記
+    ("temp", "<f4", (TEMP_CHANNELS,)),   # 溫度 (解析度 0.1°C, float32 足夠), NaN 表示無資料
+    ("power", "<f8", (4,)),              # U, I, P, WP
+    ("gx20_seq", "<i4"),                 # GX20 快照序號
+])
+
+
+class SessionJournal:
+    """單一工位的測試日誌"""
+    def __init__(self, directory, station_name, config_provider=None):
+        self.station_name = station_name
+        self.wal_path = os.path.join(directory, f"{station_name}.wal")
+        self.config_path = os.path.join(directory, f"{station_name}.json")
+        self.config_provider = config_provider
+        self.config = {}
+        self.sample_count = 0
+        self._wal = None
+        self._last_checkpoint = 0.0
+
+    @classmethod
+    def create(cls, directory, station_name, config, config_provider=None):
+        """開始新的測試: 清空舊日誌並寫入設定"""
+        os.makedirs(directory, exist_ok=True)
+        journal = cls(directory, station_name, config_provider)
+        journal._wal = open(journal.wal_path, "wb")
+        journal.config = dict(config)
+        journal.checkpoint()
+        return journal
+
+    @classmethod
+    def reopen(cls, directory, station_name, config_provider=None):
+        """接續中斷的測試: 截掉寫到一半的最後一筆, 之後的樣本接著 append"""
+        journal = cls(directory, station_name, config_provider)
+        journal.config = journal.read_config()
+        size = os.path.getsize(journal.wal_path) if os.path.exists(journal.wal_path) else 0
+        complete = size - size % JOURNAL_RECORD.itemsize
+        journal._wal = open(journal.wal_path, "ab")
+        if complete != size:
+            journal._wal.truncate(complete)
+        journal.sample_count = complete // JOURNAL_RECORD.itemsize
+        journal.checkpoint()
+        return journal
+
+    def read_config(self):
+        with open(self.config_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def read_samples(self):
+        """讀取所有完整的樣本記錄 (結構化 numpy 陣列)"""
+        if not os.path.exists(self.wal_path):
+            return np.empty(0, dtype=JOURNAL_RECORD)
+        count = os.path.getsize(self.wal_path) // JOURNAL_RECORD.itemsize
+        return np.fromfile(self.wal_path, dtype=JOURNAL_RECORD, count=count)
+
+    def append(self, row):
+        """寫入一筆 plot_data 資料列 [datetime, [20個溫度], [U, I, P, WP], GX20快照序號]"""
+        record = np.zeros(1, dtype=JOURNAL_RECORD)
+        record["t"] = row[0].timestamp()
+        temps = [np.nan if v is None else v for v in row[1][:TEMP_CHANNELS]]
+        record["temp"][0, :len(temps)] = temps
+        power = [np.nan if v is None else v for v in (row[2] or [])[:4]]
+        record["power"][0] = power + [np.nan] * (4 - len(power))
+        record["gx20_seq"] = row[3] if len(row) > 3 else -1
+        self._wal.write(record.tobytes())
+        self._wal.flush()
+        self.sample_count += 1
+        if time.monotonic() - self._last_checkpoint >= CHECKPOINT_SECONDS:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """fsync 樣本並原子更新設定檔"""
+        if self._wal is not None:
+            self._wal.flush()
+            os.fsync(self._wal.fileno())
+        if self.config_provider is not None:
+            try:
+                self.config.update(self.config_provider())
+            except Exception:
+                pass  # 讀不到 GUI 設定時沿用上次的內容
+        self.config["active"] = True
+        self.config["sample_count"] = self.sample_count
+        self.config["checkpoint_time"] = time.time()
+        tmp_path = self.config_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.config, f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.config_path)
+        self._last_checkpoint = time.monotonic()
+
+    def close(self, finished=True):
+        """結束日誌; finished=True 表示測試正常結束, 刪除日誌檔"""
+        if self._wal is not None:
+            if not finished:
+                self.checkpoint()
+            self._wal.close()
+            self._wal = None
+        if finished:
+            for path in (self.wal_path, self.config_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def find_interrupted(directory):
+    """找出未正常結束的工位日誌, 回傳 {工位: 設定}"""
+    interrupted = {}
+    for config_path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        station_name = os.path.splitext(os.path.basename(config_path))[0]
+        try:
+            with open(config_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if config.get("active"):
+            interrupted[station_name] = config
+    return interrupted
+
+
+def samples_to_arrays(samples):
+    """將日誌記錄轉為 StationHistory.load 使用的 (時間, 溫度, 電力, 快照序號) 陣列"""
+    temps = np.round(samples["temp"].astype(np.float64), 1)
+    return samples["t"].copy(), temps, samples["power"].copy(), samples["gx20_seq"].astype(np.int64)
@@ -0,0 +1,288 @@
+# SAMPO RD2 LAB Data Collection - 溫度/電力訊號分析
+#-------------------------------------------------------------------------------
+# SteadyStateDetector : 各頻道溫度穩定判定, 以 report_engine.RollingSlope 的各頻道斜率每筆樣本 O(1) 更新
+# detect_events       : 除霜 (加熱器功率高於壓縮機) 與開門 (溫度急升) 事件, 整段陣列向量化計算
+# event_period        : 以 FFT 自相關估計除霜周期
+# phase_statistics    : 依壓縮機 On/Off 區段分組的各頻道 mean/min/max/std (np.*.reduceat 區段縮減)
+#-------------------------------------------------------------------------------
+import math
+from datetime import datetime
+
+import numpy as np
+
+from report_engine import RollingSlope, on_off_segments
+from station_store import POWER_COLUMN, TEMP_CHANNELS, WP_COLUMN
+
+
+class SteadyStateDetector:
+    """
+    以固定時間窗 (window_seconds) 內各頻道的線性回歸斜率 (RollingSlope) 判定是否穩定:
+    窗內資料涵蓋整個時間窗, 且 |斜率| <= drift_limit (°C/小時)。
+    時間窗遠大於壓縮機周期時, 斜率即為周期平均後的溫度漂移。
+    """
+    def __init__(self, window_seconds, drift_limit, channels=TEMP_CHANNELS, min_samples=10):
+        self.window_seconds = window_seconds
+        self.drift_limit = drift_limit
+        self.channels = channels
+        self.min_samples = min_samples
+        self.regression = RollingSlope(window_seconds, channels)
+        self.since = np.full(channels, np.nan)  # 各頻道開始穩定的時間戳記, NaN 表示未穩定
+
+    def add(self, t, temps):
+        """加入一筆 (時間戳記, 各頻道溫度); None/NaN 表示無資料"""
+        self.regression.add(t, temps)
+        steady = self.steady()
+        self.since = np.where(steady, np.where(np.isnan(self.since), t, self.since), np.nan)
+
+    def span(self):
+        return self.regression.span()
+
+    def drift(self):
+        """各頻道溫度漂移 (°C/小時), 資料不足為 NaN"""
+        return self.regression.slope() * 3600
+
+    def steady(self):
+        """各頻道是否穩定 (bool 陣列)"""
+        full = self.span() >= self.window_seconds * 0.95
+        with np.errstate(invalid="ignore"):
+            return full & (self.regression.n >= self.min_samples) & (np.abs(self.drift()) <= self.drift_limit)
+
+    def station_since(self, channels):
+        """指定頻道全部穩定時, 回傳最後一個頻道開始穩定的時間戳記, 否則 None"""
+        if not channels:
+            return None
+        since = self.since[list(channels)]
+        return None if np.isnan(since).any() else float(since.max())
+
+
+def _runs(mask):
+    """bool 陣列中連續 True 區段的 (起始索引, 結束索引)"""
+    padded = np.concatenate([[False], mask, [False]])
+    change = np.flatnonzero(padded[1:] != padded[:-1])
+    return change[0::2], change[1::2] - 1
+
+
+def _merge_runs(times, starts, ends, gap_seconds):
+    """合併間隔小於 gap_seconds 的區段"""
+    if len(starts) == 0:
+        return starts, ends
+    keep = np.concatenate([[True], times[starts[1:]] - times[ends[:-1]] > gap_seconds])
+    group = np.cumsum(keep) - 1
+    merged_ends = np.zeros(group[-1] + 1, dtype=ends.dtype)
+    np.maximum.at(merged_ends, group, ends)
+    return starts[keep], merged_ends
+
+
+def event_period(times, signal, min_period=2 * 3600, max_period=72 * 3600):
+    """
+    以 FFT 自相關估計訊號周期: 先內插到等間隔時間軸, 在 min_period ~ max_period 之間找自相關最大值。
+    回傳 (周期秒數, 自相關係數), 資料不足時回傳 (None, 0.0)
+    """
+    valid = ~np.isnan(signal)
+    if valid.sum() < 3 or times[-1] - times[0] < 2 * min_period:
+        return None, 0.0
+    step = float(np.median(np.diff(times)))
+    grid = np.arange(times[0], times[-1], step)
+    x = np.interp(grid, times[valid], signal[valid])
+    x -= x.mean()
+    spectrum = np.fft.rfft(x, 2 * len(x))
+    autocorrelation = np.fft.irfft(spectrum * np.conj(spectrum))[:len(x)]
+    if autocorrelation[0] <= 0:
+        return None, 0.0
+    autocorrelation /= autocorrelation[0]
+    lo = int(min_period / step)
+    hi = min(int(max_period / step), len(x) // 2)
+    if hi <= lo:
+        return None, 0.0
+    lag = lo + int(np.argmax(autocorrelation[lo:hi]))
+    return lag * step, float(autocorrelation[lag])
+
+
+def detect_events(times, values, onoffthrottle=5, channels=None, heater_factor=1.5, min_heater_seconds=120,
+                  rise_rate=0.5, recovery_seconds=1800, merge_seconds=300):
+    """
+    偵測除霜與開門事件, times/values 為 arrays_between 格式 (時間戳記, n x ROLLUP_COLUMNS)。
+      除霜: 功率高於壓縮機運轉功率 (On 時功率中位數) x heater_factor, 持續 min_heater_seconds 以上
+      開門: 任一頻道溫度上升速率 > rise_rate (°C/分), 且不在除霜期間及除霜後 recovery_seconds 內;
+            事件結束於各上升頻道回到事件前溫度 +0.5°C 以內, 最長 recovery_seconds
+    間隔小於 merge_seconds 的同類事件合併。回傳 (事件清單, 除霜周期資訊 dict)。
+    """
+    n = len(times)
+    events = []
+    if n < 3:
+        return events, {"period_hours": None, "strength": 0.0, "compressor_power": None}
+    channels = list(range(TEMP_CHANNELS)) if channels is None else list(channels)
+    power = values[:, POWER_COLUMN]
+    wp = values[:, WP_COLUMN]
+    with np.errstate(invalid="ignore"):
+        on = power >= onoffthrottle
+        compressor_power = float(np.nanmedian(power[on])) if on.any() else np.nan
+        heater = power > compressor_power * heater_factor if not np.isnan(compressor_power) else np.zeros(n, dtype=bool)
+    starts, ends = _merge_runs(times, *_runs(heater), merge_seconds)
+    long_enough = times[ends] - times[starts] >= min_heater_seconds
+    defrost_starts, defrost_ends = starts[long_enough], ends[long_enough]
+    for s, e in zip(defrost_starts.tolist(), defrost_ends.tolist()):
+        events.append({
+            "kind": "除霜",
+            "start": datetime.fromtimestamp(float(times[s])),
+            "end": datetime.fromtimestamp(float(times[e])),
+            "minutes": (times[e] - times[s]) / 60,
+            "peak_power": float(np.nanmax(power[s:e + 1])),
+            "energy": float(wp[e] - wp[s]),
+            "first": s, "last": e,
+        })
+
+    # 開門: 溫度上升速率, 排除除霜與除霜後的回溫期間
+    temps = values[:, channels]
+    with np.errstate(invalid="ignore"):
+        rate = np.diff(temps, axis=0) / np.diff(times)[:, None] * 60
+        rising = np.concatenate([[False], (rate > rise_rate).any(axis=1)])
+    excluded = np.zeros(n, dtype=bool)
+    if len(defrost_starts):
+        edges = np.searchsorted(times, times[defrost_ends] + recovery_seconds, side="right")
+        marks = np.zeros(n + 1, dtype=np.int64)
+        np.add.at(marks, defrost_starts, 1)
+        np.add.at(marks, edges, -1)
+        excluded = np.cumsum(marks[:-1]) > 0
+    starts, ends = _merge_runs(times, *_runs(rising & ~excluded), merge_seconds)
+    for s, e in zip(starts.tolist(), ends.tolist()):
+        before = temps[max(s - 1, 0)]
+        with np.errstate(invalid="ignore"):
+            risen = (rate[s - 1:e] > rise_rate).any(axis=0) if s > 0 else np.zeros(len(channels), dtype=bool)
+        limit = np.searchsorted(times, times[e] + recovery_seconds, side="right")
+        with np.errstate(invalid="ignore"):
+            recovered = (temps[e:limit][:, risen] <= before[risen] + 0.5).all(axis=1)
+        end = e + int(np.argmax(recovered)) if recovered.any() else limit - 1
+        events.append({
+            "kind": "開門",
+            "start": datetime.fromtimestamp(float(times[s - 1] if s > 0 else times[s])),
+            "end": datetime.fromtimestamp(float(times[end])),
+            "minutes": (times[end] - times[max(s - 1, 0)]) / 60,
+            "max_rise": float(np.nanmax(temps[s:end + 1][:, risen] - before[risen])) if risen.any() else 0.0,
+            "channels": [channels[i] + 1 for i in np.flatnonzero(risen).tolist()],
+            "first": max(s - 1, 0), "last": end,
+        })
+    events.sort(key=lambda event: event["first"])
+
+    # 除霜周期: 有除霜事件時以加熱器訊號, 否則以功率訊號的自相關估計
+    signal = heater.astype(np.float64) if len(defrost_starts) else power
+    period, strength = event_period(times, signal)
+    return events, {
+        "period_hours": period / 3600 if period is not None else None,
+        "strength": strength,
+        "compressor_power": None if np.isnan(compressor_power) else compressor_power,
+    }
+
+
+def event_mask(n, events):
+    """事件期間的 bool 遮罩"""
+    marks = np.zeros(n + 1, dtype=np.int64)
+    for event in events:
+        marks[event["first"]] += 1
+        marks[event["last"] + 1] -= 1
+    return np.cumsum(marks[:-1]) > 0
+
+
+def summary_excluding(times, values, events, params=None, calculator=None):
+    """
+    排除事件期間後的平均溫度, 平均功率與 24 小時耗電量:
+    耗電量為各段非事件期間 WP 差值總和 / 非事件期間時間總和 x 24 小時。
+    params/calculator 同 ReportAccumulator.result, vf/vr 有效時以排除後的耗電量計算能耗。
+    """
+    keep = ~event_mask(len(times), events)
+    starts, ends = _runs(keep)
+    kept = values[keep, :POWER_COLUMN + 1]
+    count = (~np.isnan(kept)).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(count > 0, np.nansum(kept, axis=0) / count, np.nan)
+    temps, avg_power = means[:TEMP_CHANNELS], float(means[POWER_COLUMN])
+    seconds = float((times[ends] - times[starts]).sum())
+    energy = float(np.nansum(values[ends, WP_COLUMN] - values[starts, WP_COLUMN]))
+    wp_24h = round(energy / seconds * 24 * 3600, 1) if seconds > 0 else 0
+    results = None
+    if params is not None and calculator is not None and params["vf"] > 0 and params["vr"] > 0:
+        results = calculator.calculate(params["vf"], params["vr"], round(wp_24h / 1000, 3),
+                                       params["temp_f"], params["temp_r"], params["fan_type"])
+    return {
+        "rows": int(keep.sum()),
+        "avg_temp": [None if np.isnan(v) else float(np.round(v, 1)) for v in temps.tolist()],
+        "avg_power": round(avg_power, 1),
+        "hours": seconds / 3600,
+        "wp_24h": wp_24h,
+        "results": results,
+    }
+
+
+def _segment_sums(values, starts):
+    """
+    各區段各欄的 (筆數, 總和, 平方和, 最小, 最大) 與原點, NaN 不計。總和與平方和以各欄整體平均為原點,
+    避免抵銷誤差。以頻道為主的連續陣列沿時間軸 reduceat (比沿 axis=0 快), 結果為 區段數 x 欄數。
+    """
+    columns = np.ascontiguousarray(values.T)
+    valid = ~np.isnan(columns)
+    column_count = valid.sum(axis=1)
+    center = np.where(column_count > 0, np.nansum(columns, axis=1) / np.maximum(column_count, 1), 0.0)
+    x = np.where(valid, columns - center[:, None], 0.0)
+    return (np.add.reduceat(valid, starts, axis=1).T,
+            np.add.reduceat(x, starts, axis=1).T,
+            np.add.reduceat(x * x, starts, axis=1).T,
+            np.fmin.reduceat(columns, starts, axis=1).T,
+            np.fmax.reduceat(columns, starts, axis=1).T,
+            center)
+
+
+def _moments(count, total, squares, center):
+    """由筆數/總和/平方和求 (平均, 標準差), 無資料為 NaN"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        std = np.sqrt(np.maximum(squares - total * mean, 0.0) / (count - 1))
+    return np.where(count > 0, mean + center, np.nan), np.where(count > 1, std, np.nan)
+
+
+def phase_statistics(times, values, onoffthrottle=5):
+    """
+    依壓縮機 On/Off 區段 (report_engine.on_off_segments) 分組計算各溫度頻道的統計, times/values 為
+    arrays_between 格式。所有區段與頻道一次以 reduceat 計算, 不需逐區段/逐頻道迴圈。
+    回傳 dict:
+      segments: 各區段 start/end (時間戳記), seconds (end - start), on, 以及各頻道 (區段數 x 20) 的
+                count/mean/min/max/std/first/last,
+                swing: On 區段為 first - min (降溫幅度), Off 區段為 max - first (回溫幅度)
+      states  : {True: On, False: Off} 各狀態合併後的 segments/seconds 與各頻道 count/mean/min/max/std,
+                由區段的部分和合併; 頭尾兩個不完整區段不列入 (與 REPORT 的 On/Off 平均時間相同)
+    """
+    if len(times) == 0:
+        return None
+    temps = values[:, :TEMP_CHANNELS]
+    starts, ends, on = on_off_segments(times, values[:, POWER_COLUMN], onoffthrottle)
+    count, total, squares, low, high, center = _segment_sums(temps, starts)
+    mean, std = _moments(count, total, squares, center)
+    low = np.where(count > 0, low, np.nan)
+    high = np.where(count > 0, high, np.nan)
+    first, last = temps[starts], temps[ends]
+    # 區段時間為區段第一筆到最後一筆 (與 ReportAccumulator 的 On/Off 平均時間相同)
+    seconds = times[ends] - times[starts]
+    segments = {
+        "start": times[starts], "end": times[ends], "seconds": seconds, "on": on,
+        "count": count, "mean": mean, "min": low, "max": high, "std": std, "first": first, "last": last,
+        "swing": np.where(on[:, None], first - low, high - first),
+    }
+
+    inner = np.ones(len(starts), dtype=bool)
+    if len(starts) > 2:
+        inner[[0, -1]] = False
+    states = {}
+    for state in (True, False):
+        picked = inner & (on == state)
+        if not picked.any():
+            states[state] = None
+            continue
+        state_count = count[picked].sum(axis=0)
+        state_mean, state_std = _moments(state_count, total[picked].sum(axis=0), squares[picked].sum(axis=0), center)
+        with np.errstate(invalid="ignore"):
+            state_min = np.fmin.reduce(low[picked], axis=0)
+            state_max = np.fmax.reduce(high[picked], axis=0)
+        states[state] = {
+            "segments": int(picked.sum()), "seconds": math.fsum(seconds[picked].tolist()),
+            "count": state_count, "mean": state_mean, "min": state_min, "max": state_max, "std": state_std,
+        }
+    return {"onoffthrottle": onoffthrottle, "segments": segments, "states": states}
@@ -0,0 +1,91 @@
+# SAMPO RD2 LAB Data Collection - Tk 主迴圈停頓監視
+#-------------------------------------------------------------------------------
+# 以 root.after 每 interval 毫秒排一次回呼, 回呼實際執行時間與預定時間 (monotonic) 的差即為
+# 主迴圈延遲, 記錄到 tk_loop_lag_seconds 直方圖 (metrics)。
+# 主執行緒卡住時回呼不會執行, 因此另有監視執行緒: 超過 threshold 秒沒有回呼時, 以
+# sys._current_frames() 擷取主執行緒當下的堆疊 (卡在哪裡), 停頓結束後連同停頓時間一起記錄。
+# 最近的停頓保留在 stalls, 顯示於狀態頁面。
+#-------------------------------------------------------------------------------
+import collections
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from metrics import REGISTRY
+
+LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # 秒
+STACK_LIMIT = 25  # 擷取的堆疊層數 (最內層)
+
+
+class TkStallMonitor:
+    """Tk 主迴圈延遲與停頓堆疊"""
+    def __init__(self, root, interval_ms=100, threshold=0.5, keep=20, on_stall=None, registry=REGISTRY):
+        self.root = root
+        self.interval = interval_ms / 1000
+        self.threshold = threshold
+        self.on_stall = on_stall  # on_stall(停頓秒數, 開始時間, 堆疊文字), 於主執行緒呼叫
+        self.stalls = collections.deque(maxlen=keep)  # (開始時間, 停頓秒數, 堆疊文字)
+        self.lag = registry.histogram("tk_loop_lag_seconds", "Tk 主迴圈延遲 (after 回呼實際與預定時間差)",
+                                      buckets=LAG_BUCKETS)
+        self.stall_count = registry.counter("tk_stalls_total", "Tk 主迴圈停頓超過門檻的次數")
+        self._main_ident = None
+        self._expected = None
+        self._beat = None
+        self._captured = None  # 本次停頓已擷取的 (開始時間, 堆疊文字)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self):
+        """於主執行緒呼叫"""
+        self._main_ident = threading.get_ident()
+        self._beat = time.monotonic()
+        self._expected = self._beat + self.interval
+        self.root.after(int(self.interval * 1000), self._tick)
+        threading.Thread(target=self._watch, name="tk_stall_monitor", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _tick(self):
+        if self._stop.is_set():
+            return
+        now = time.monotonic()
+        lag = max(now - self._expected, 0.0)
+        self.lag.observe(lag)
+        with self._lock:
+            self._beat = now
+            captured, self._captured = self._captured, None
+        if lag >= self.threshold:
+            started = datetime.now().timestamp() - lag
+            stack = captured[1] if captured else "(未擷取到堆疊)"
+            self.stall_count.inc()
+            self.stalls.append((started, lag, stack))
+            if self.on_stall is not None:
+                self.on_stall(lag, started, stack)
+        self._expected = now + self.interval
+        self.root.after(int(self.interval * 1000), self._tick)
+
+    def _watch(self):
+        """主執行緒超過 threshold 秒沒有回呼時擷取它的堆疊 (每次停頓一次)"""
+        while not self._stop.wait(self.threshold / 2):
+            with self._lock:
+                stalled = time.monotonic() - self._beat - self.interval
+                if stalled < self.threshold or self._captured is not None:
+                    continue
+                frame = sys._current_frames().get(self._main_ident)
+                if frame is None:
+                    continue
+                stack = "".join(traceback.format_stack(frame, limit=STACK_LIMIT))
+                self._captured = (time.time() - stalled, stack)
+
+    def summary(self, last=5):
+        """狀態頁面的文字: 最近幾次停頓與堆疊最內層的幾行"""
+        if not self.stalls:
+            return f"Tk 主迴圈: 沒有超過 {self.threshold:g} 秒的停頓"
+        lines = [f"Tk 主迴圈停頓 (超過 {self.threshold:g} 秒) 共 {self.stall_count.value} 次, 最近 {min(last, len(self.stalls))} 次:"]
+        for started, lag, stack in list(self.stalls)[-last:][::-1]:
+            lines.append(f"  {datetime.fromtimestamp(started):%m-%d %H:%M:%S}  {lag:.2f} 秒")
+            lines.extend("    " + line for line in stack.rstrip().splitlines()[-6:])
+        return "\n".join(lines)
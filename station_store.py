@@ -0,0 +1,529 @@
+# SAMPO RD2 LAB Data Collection - 工位時序資料儲存
+#-------------------------------------------------------------------------------
+# 1. 分層彙總 (raw / 1 min / 15 min / 1 h)
+#   每個工位於 append 時即時更新各層的 count / sum / min / max / last,
+#   圖表與報表依需要的解析度挑選最粗且足夠的一層, 不必每次掃描全部原始資料
+# 2. 原始資料 StationHistory
+#   最近 hot_window 秒的資料留在記憶體, 較舊的資料寫入每工位一個 append-only
+#   檔案, 以 memmap 讀取; 對外仍以 plot_data 的 list 介面存取
+#-------------------------------------------------------------------------------
+import bisect
+import collections
+import math
+import os
+import sys
+import threading
+from datetime import datetime
+
+import numpy as np
+
+TEMP_CHANNELS = 20
+# 彙總欄位: 20 個溫度 + 功率 P(W) + 累積功率 WP(Wh)
+ROLLUP_COLUMNS = TEMP_CHANNELS + 2
+POWER_COLUMN = TEMP_CHANNELS
+WP_COLUMN = TEMP_CHANNELS + 1
+
+# 記憶體內保留的原始資料時間長度(秒), 較舊的資料移到磁碟
+HOT_WINDOW_SECONDS = 48 * 3600
+
+# 磁碟檔案每次預先配置的筆數 (約 3.4 MB, 10 秒一筆約 45 小時), 只有容量增加時才重新對應 memmap
+SPILL_CHUNK_ROWS = 16384
+
+# 原始資料磁碟格式: 時間戳記, 20個溫度, [U, I, P, WP], GX20快照序號; None 以 NaN 表示
+HISTORY_RECORD = np.dtype([
+    ("t", "<f8"),
+    ("temp", "<f8", (TEMP_CHANNELS,)),
+    ("power", "<f8", (4,)),
+    ("gx20_seq", "<i8"),
+])
+
+# 各層設定: (名稱, 區間秒數, 保留秒數), 保留秒數為 None 表示不限
+ROLLUP_TIERS = [
+    ("1min", 60, 7 * 24 * 3600),
+    ("15min", 15 * 60, 60 * 24 * 3600),
+    ("1h", 3600, None),
+]
+
+
+def row_to_vector(temps, power):
+    """將 [20個溫度], [U, I, P, WP] 轉為彙總用向量, None 以 NaN 表示"""
+    vec = np.full(ROLLUP_COLUMNS, np.nan)
+    if temps:
+        for i, value in enumerate(temps[:TEMP_CHANNELS]):
+            if value is not None:
+                vec[i] = value
+    if power and len(power) >= 4:
+        if power[2] is not None:
+            vec[POWER_COLUMN] = power[2]
+        if power[3] is not None:
+            vec[WP_COLUMN] = power[3]
+    return vec
+
+
+def rows_to_arrays(rows):
+    """將 plot_data 格式的資料列轉為 (時間戳記陣列, 彙總向量矩陣)"""
+    times = np.array([row[0].timestamp() for row in rows], dtype=float)
+    values = np.empty((len(rows), ROLLUP_COLUMNS))
+    for n, row in enumerate(rows):
+        values[n] = row_to_vector(row[1], row[2])
+    return times, values
+
+
+def rows_between(rows, start_ts, end_ts):
+    """由依時間排序的 plot_data 取出 start_ts <= t < end_ts 的資料列"""
+    if isinstance(rows, StationHistory):
+        return rows.rows_between(start_ts, end_ts)
+    # 以時間戳記比較, 避免轉回 datetime 時捨入到微秒而改變區間邊界
+    lo = bisect.bisect_left(rows, start_ts, key=lambda r: r[0].timestamp())
+    hi = bisect.bisect_left(rows, end_ts, key=lambda r: r[0].timestamp())
+    return rows[lo:hi]
+
+
+def count_between(rows, start_ts, end_ts):
+    """start_ts <= t < end_ts 的資料筆數, 只以 searchsorted/bisect 計算位置, 不轉換資料列"""
+    if isinstance(rows, StationHistory):
+        return rows.count_between(start_ts, end_ts)
+    lo = bisect.bisect_left(rows, start_ts, key=lambda r: r[0].timestamp())
+    hi = bisect.bisect_left(rows, end_ts, key=lambda r: r[0].timestamp())
+    return hi - lo
+
+
+def arrays_between(rows, start_ts, end_ts):
+    """同 rows_between, 但直接回傳 (時間戳記陣列, 彙總向量矩陣)"""
+    if isinstance(rows, StationHistory):
+        return rows.arrays_between(start_ts, end_ts)
+    return rows_to_arrays(rows_between(rows, start_ts, end_ts))
+
+
+class RollupAccumulator:
+    """彙總結果: 每個欄位的 count / sum / min / max"""
+    def __init__(self):
+        self.count = np.zeros(ROLLUP_COLUMNS, dtype=np.int64)
+        self.sum = np.zeros(ROLLUP_COLUMNS)
+        self.min = np.full(ROLLUP_COLUMNS, np.nan)
+        self.max = np.full(ROLLUP_COLUMNS, np.nan)
+
+    def add_values(self, values):
+        """加入原始資料矩陣 (n x ROLLUP_COLUMNS)"""
+        if len(values) == 0:
+            return
+        valid = ~np.isnan(values)
+        self.count += valid.sum(axis=0)
+        self.sum += np.where(valid, values, 0.0).sum(axis=0)
+        self.min = np.fmin(self.min, np.fmin.reduce(values, axis=0))
+        self.max = np.fmax(self.max, np.fmax.reduce(values, axis=0))
+
+    def add_buckets(self, count, total, vmin, vmax):
+        """加入彙總層的 bucket"""
+        if len(count) == 0:
+            return
+        self.count += count.sum(axis=0)
+        self.sum += total.sum(axis=0)
+        self.min = np.fmin(self.min, np.fmin.reduce(vmin, axis=0))
+        self.max = np.fmax(self.max, np.fmax.reduce(vmax, axis=0))
+
+    def mean(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count > 0, self.sum / np.maximum(self.count, 1), np.nan)
+
+
+class RollupTier:
+    """單一彙總層, bucket 以 epoch 秒數對齊, 資料須依時間順序加入"""
+    def __init__(self, name, seconds, retention=None):
+        self.name = name
+        self.seconds = seconds
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._head = 0        # 保留期限內第一個 bucket
+        self._size = 0        # 已使用的 bucket 數
+        self._pruned = False  # 是否曾因保留期限丟棄 bucket
+        self._allocate(256)
+
+    def _allocate(self, capacity):
+        old = getattr(self, "start", None)
+        start = np.empty(capacity)
+        count = np.zeros((capacity, ROLLUP_COLUMNS), dtype=np.int64)
+        total = np.zeros((capacity, ROLLUP_COLUMNS))
+        vmin = np.full((capacity, ROLLUP_COLUMNS), np.nan)
+        vmax = np.full((capacity, ROLLUP_COLUMNS), np.nan)
+        last = np.full((capacity, ROLLUP_COLUMNS), np.nan)
+        if old is not None:
+            # 搬移時一併丟棄保留期限外的 bucket
+            n = self._size - self._head
+            src = slice(self._head, self._size)
+            start[:n] = self.start[src]
+            count[:n] = self.count[src]
+            total[:n] = self.sum[src]
+            vmin[:n] = self.min[src]
+            vmax[:n] = self.max[src]
+            last[:n] = self.last[src]
+            self._size = n
+            self._head = 0
+        self.start, self.count, self.sum = start, count, total
+        self.min, self.max, self.last = vmin, vmax, last
+
+    def append(self, ts, vec):
+        key = math.floor(ts / self.seconds) * self.seconds
+        valid = ~np.isnan(vec)
+        with self._lock:
+            if self._size > self._head and self.start[self._size - 1] >= key:
+                i = int(np.searchsorted(self.start[self._head:self._size], key)) + self._head
+                if i >= self._size or self.start[i] != key:
+                    return  # 早於保留期限或順序錯亂的資料, 原始資料仍保有該筆
+            else:
+                if self._size == len(self.start):
+                    live = self._size - self._head
+                    self._allocate(max(256, live * 2))
+                i = self._size
+                self._size += 1
+                self.start[i] = key
+                self.count[i] = 0
+                self.sum[i] = 0.0
+                self.min[i] = np.nan
+                self.max[i] = np.nan
+                self.last[i] = np.nan
+                self._prune(key)
+            self.count[i] += valid
+            self.sum[i] += np.where(valid, vec, 0.0)
+            np.fmin(self.min[i], vec, out=self.min[i])
+            np.fmax(self.max[i], vec, out=self.max[i])
+            np.copyto(self.last[i], vec, where=valid)
+
+    def extend(self, times, values):
+        """批次加入依時間排序的資料 (時間戳記陣列, 彙總向量矩陣), 以 reduceat 一次計算所有 bucket"""
+        if len(times) == 0:
+            return
+        keys = np.floor(times / self.seconds) * self.seconds
+        starts_idx = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        group_keys = keys[starts_idx]
+        valid = ~np.isnan(values)
+        count = np.add.reduceat(valid.astype(np.int64), starts_idx, axis=0)
+        total = np.add.reduceat(np.where(valid, values, 0.0), starts_idx, axis=0)
+        vmin = np.fmin.reduceat(values, starts_idx, axis=0)
+        vmax = np.fmax.reduceat(values, starts_idx, axis=0)
+        # 每個 bucket 各欄位最後一筆有效值
+        last_idx = np.maximum.reduceat(np.where(valid, np.arange(len(times))[:, None], -1), starts_idx, axis=0)
+        last = values[np.maximum(last_idx, 0), np.arange(ROLLUP_COLUMNS)]
+        last[last_idx < starts_idx[:, None]] = np.nan
+        with self._lock:
+            if self._size > self._head:
+                newest = self.start[self._size - 1]
+                if group_keys[0] == newest:
+                    i = self._size - 1
+                    self.count[i] += count[0]
+                    self.sum[i] += total[0]
+                    np.fmin(self.min[i], vmin[0], out=self.min[i])
+                    np.fmax(self.max[i], vmax[0], out=self.max[i])
+                    np.copyto(self.last[i], last[0], where=~np.isnan(last[0]))
+                keep = group_keys > newest
+                group_keys, count, total = group_keys[keep], count[keep], total[keep]
+                vmin, vmax, last = vmin[keep], vmax[keep], last[keep]
+            m = len(group_keys)
+            if m == 0:
+                return
+            if self._size + m > len(self.start):
+                self._allocate(max(256, (self._size - self._head + m) * 2))
+            sel = slice(self._size, self._size + m)
+            self.start[sel] = group_keys
+            self.count[sel] = count
+            self.sum[sel] = total
+            self.min[sel] = vmin
+            self.max[sel] = vmax
+            self.last[sel] = last
+            self._size += m
+            self._prune(group_keys[-1])
+
+    def _prune(self, newest_key):
+        if self.retention is None:
+            return
+        cutoff = newest_key - self.retention
+        head = int(np.searchsorted(self.start[self._head:self._size], cutoff)) + self._head
+        if head > self._head:
+            self._head = head
+            self._pruned = True
+
+    def covers(self, start_ts):
+        """此層是否仍保有 start_ts 之後的完整資料"""
+        with self._lock:
+            if not self._pruned or self._size == self._head:
+                return True
+            return self.start[self._head] <= start_ts
+
+    def buckets(self, start_ts, end_ts):
+        """回傳與 [start_ts, end_ts) 重疊的 bucket 複本: (起點, count, sum, min, max, last)"""
+        with self._lock:
+            starts = self.start[self._head:self._size]
+            lo = int(np.searchsorted(starts, start_ts - self.seconds, side="right")) + self._head
+            hi = int(np.searchsorted(starts, end_ts, side="left")) + self._head
+            sel = slice(lo, hi)
+            return (self.start[sel].copy(), self.count[sel].copy(), self.sum[sel].copy(),
+                    self.min[sel].copy(), self.max[sel].copy(), self.last[sel].copy())
+
+    def _full_buckets(self, start_ts, end_ts):
+        """完全落在 [start_ts, end_ts) 內的 bucket"""
+        with self._lock:
+            starts = self.start[self._head:self._size]
+            lo = int(np.searchsorted(starts, start_ts, side="left")) + self._head
+            hi = int(np.searchsorted(starts, end_ts - self.seconds, side="right")) + self._head
+            sel = slice(lo, hi)
+            return self.count[sel].copy(), self.sum[sel].copy(), self.min[sel].copy(), self.max[sel].copy()
+
+    def series(self, start_ts, end_ts):
+        """回傳繪圖用的 (bucket 中心時間, 平均值矩陣)"""
+        starts, count, total, _, _, _ = self.buckets(start_ts, end_ts)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+        return starts + self.seconds / 2, mean
+
+    def __len__(self):
+        return self._size - self._head
+
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.start, self.count, self.sum, self.min, self.max, self.last))
+
+
+class StationRollup:
+    """單一工位的各層彙總"""
+    def __init__(self, tiers=None):
+        self.tiers = [RollupTier(*t) for t in (ROLLUP_TIERS if tiers is None else tiers)]
+        self.tiers.sort(key=lambda t: t.seconds)
+
+    def append(self, dt, temps, power):
+        ts = dt.timestamp()
+        vec = row_to_vector(temps, power)
+        for tier in self.tiers:
+            tier.append(ts, vec)
+
+    def extend(self, times, values):
+        """批次加入 (時間戳記陣列, 彙總向量矩陣), 用於由日誌重建"""
+        for tier in self.tiers:
+            tier.extend(times, values)
+
+    def memory_usage(self):
+        """各層配置的陣列大小 (bytes)"""
+        return {tier.name: tier.nbytes() for tier in self.tiers}
+
+    def select_tier(self, start_ts, resolution):
+        """挑選 bucket 不大於 resolution 秒且涵蓋 start_ts 的最粗一層, None 表示使用原始資料"""
+        chosen = None
+        for tier in self.tiers:
+            if tier.seconds <= resolution and tier.covers(start_ts):
+                chosen = tier
+        return chosen
+
+    def aggregate(self, start_ts, end_ts, raw_arrays):
+        """
+        精確計算 [start_ts, end_ts] 內各欄位的 count/sum/min/max。
+        由最粗的一層取完整 bucket, 兩端不足一個 bucket 的部分交給較細一層,
+        最後以 raw_arrays(start_ts, end_ts) 取 start_ts <= t < end_ts 的原始資料補足。
+        """
+        acc = RollupAccumulator()
+        end_excl = float(np.nextafter(end_ts, np.inf))
+        self._aggregate(len(self.tiers) - 1, start_ts, end_excl, raw_arrays, acc)
+        return acc
+
+    def _aggregate(self, level, start_ts, end_ts, raw_arrays, acc):
+        if start_ts >= end_ts:
+            return
+        if level < 0:
+            _, values = raw_arrays(start_ts, end_ts)
+            acc.add_values(values)
+            return
+        tier = self.tiers[level]
+        first = math.ceil(start_ts / tier.seconds) * tier.seconds
+        stop = math.floor(end_ts / tier.seconds) * tier.seconds
+        if first >= stop or not tier.covers(first):
+            self._aggregate(level - 1, start_ts, end_ts, raw_arrays, acc)
+            return
+        acc.add_buckets(*tier._full_buckets(first, stop))
+        self._aggregate(level - 1, start_ts, first, raw_arrays, acc)
+        self._aggregate(level - 1, stop, end_ts, raw_arrays, acc)
+
+
+def _nan_to_none(values):
+    return [None if math.isnan(v) else v for v in values]
+
+
+class StationHistory:
+    """
+    工位原始資料, 取代原本的 plot_data list。
+    每筆資料維持 [datetime, [20個溫度], [U, I, P, WP], GX20快照序號] 格式, 支援 len / 索引 / 切片 / 迭代。
+    超出 hot_window 的資料依序寫入 spill_path, 讀取時以 memmap 對應, 常駐記憶體不隨測試時間增加。
+    spill_path 以 SPILL_CHUNK_ROWS 為單位預先配置, 整個檔案只對應一個 memmap, 查詢時取 [:_spill_count];
+    只有容量擴充時才重新對應。
+    """
+    def __init__(self, spill_path, hot_window=HOT_WINDOW_SECONDS):
+        self.spill_path = spill_path
+        self.hot_window = hot_window
+        self._lock = threading.Lock()
+        self._hot = collections.deque()
+        self._spill_count = 0
+        self._map = None  # 整個預先配置檔案的 memmap (容量 len(self._map) 筆)
+        os.makedirs(os.path.dirname(spill_path), exist_ok=True)
+        open(spill_path, "wb").close()
+
+    def append(self, row):
+        with self._lock:
+            self._hot.append(row)
+            cutoff = row[0].timestamp() - self.hot_window
+            evicted = []
+            while len(self._hot) > 1 and self._hot[0][0].timestamp() < cutoff:
+                evicted.append(self._hot.popleft())
+            if evicted:
+                self._spill(evicted)
+
+    def _spill(self, rows):
+        records = np.empty(len(rows), dtype=HISTORY_RECORD)
+        for n, row in enumerate(rows):
+            records[n] = self._to_record(row)
+        self._write_spill(records)
+
+    def _write_spill(self, records):
+        """依序寫入磁碟資料 (呼叫端須持有 lock); 容量不足時以 SPILL_CHUNK_ROWS 為單位擴充檔案並重新對應"""
+        end = self._spill_count + len(records)
+        if self._map is None or end > len(self._map):
+            capacity = -(-end // SPILL_CHUNK_ROWS) * SPILL_CHUNK_ROWS
+            # r+ 且 shape 大於檔案時 numpy 會延長檔案; 舊的 memmap 由仍在使用的查詢結果持有, 不影響新的對應
+            self._map = np.memmap(self.spill_path, dtype=HISTORY_RECORD, mode="r+", shape=(capacity,))
+        self._map[self._spill_count:end] = records
+        self._spill_count = end
+
+    @staticmethod
+    def _to_record(row):
+        temps = [np.nan if v is None else v for v in row[1][:TEMP_CHANNELS]]
+        temps += [np.nan] * (TEMP_CHANNELS - len(temps))
+        power = [np.nan if v is None else v for v in (row[2] or [])[:4]]
+        power += [np.nan] * (4 - len(power))
+        return (row[0].timestamp(), temps, power, row[3] if len(row) > 3 else -1)
+
+    @staticmethod
+    def _from_record(record):
+        return [datetime.fromtimestamp(float(record["t"])),
+                _nan_to_none(record["temp"].tolist()),
+                _nan_to_none(record["power"].tolist()),
+                int(record["gx20_seq"])]
+
+    def load(self, times, temps, power, gx20_seq):
+        """
+        批次載入依時間排序的資料 (用於由日誌重建): 超出 hot_window 的部分直接寫入磁碟,
+        其餘轉為資料列放入記憶體; temps/power 中的 NaN 表示無資料。
+        """
+        if len(times) == 0:
+            return
+        with self._lock:
+            cutoff = times[-1] - self.hot_window
+            split = min(int(np.searchsorted(times, cutoff, side="left")), len(times) - 1)
+            if self._hot:
+                split = 0  # 已有資料時全部依序放入記憶體, 由 append 流程處理搬移
+            if split > 0:
+                records = np.empty(split, dtype=HISTORY_RECORD)
+                records["t"] = times[:split]
+                records["temp"] = temps[:split]
+                records["power"] = power[:split]
+                records["gx20_seq"] = gx20_seq[:split]
+                self._write_spill(records)
+            for t, row_temps, row_power, seq in zip(times[split:].tolist(), temps[split:].tolist(),
+                                                    power[split:].tolist(), gx20_seq[split:].tolist()):
+                self._hot.append([datetime.fromtimestamp(t), _nan_to_none(row_temps), _nan_to_none(row_power), seq])
+
+    def _spilled(self):
+        """取得已寫入的磁碟資料 (memmap 的唯讀切片, 呼叫端須持有 lock); 之後寫入的位置在切片之外"""
+        if self._spill_count == 0:
+            return np.empty(0, dtype=HISTORY_RECORD)
+        spilled = self._map[:self._spill_count]
+        spilled.flags.writeable = False
+        return spilled
+
+    def _snapshot(self):
+        with self._lock:
+            return self._spilled(), list(self._hot)
+
+    def __len__(self):
+        return self._spill_count + len(self._hot)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        with self._lock:
+            total = self._spill_count + len(self._hot)
+            if index < 0:
+                index += total
+            if not 0 <= index < total:
+                raise IndexError("StationHistory index out of range")
+            if index < self._spill_count:
+                return self._from_record(self._spilled()[index])
+            return self._hot[index - self._spill_count]
+
+    def __iter__(self):
+        spilled, hot = self._snapshot()
+        for record in spilled:
+            yield self._from_record(record)
+        yield from hot
+
+    def rows_between(self, start_ts, end_ts):
+        """取出 start_ts <= t < end_ts 的資料列"""
+        spilled, hot = self._snapshot()
+        times = spilled["t"]
+        lo, hi = np.searchsorted(times, [start_ts, end_ts], side="left")
+        rows = [self._from_record(record) for record in spilled[lo:hi]]
+        return rows + rows_between(hot, start_ts, end_ts)
+
+    def count_between(self, start_ts, end_ts):
+        """start_ts <= t < end_ts 的資料筆數"""
+        spilled, hot = self._snapshot()
+        lo, hi = np.searchsorted(spilled["t"], [start_ts, end_ts], side="left")
+        return int(hi - lo) + count_between(hot, start_ts, end_ts)
+
+    def arrays_between(self, start_ts, end_ts):
+        """取出 start_ts <= t < end_ts 的 (時間戳記陣列, 彙總向量矩陣), 磁碟部分不經過 Python 物件"""
+        spilled, hot = self._snapshot()
+        lo, hi = np.searchsorted(spilled["t"], [start_ts, end_ts], side="left")
+        part = spilled[lo:hi]
+        values = np.empty((len(part), ROLLUP_COLUMNS))
+        values[:, :TEMP_CHANNELS] = part["temp"]
+        values[:, POWER_COLUMN] = part["power"][:, 2]
+        values[:, WP_COLUMN] = part["power"][:, 3]
+        hot_times, hot_values = rows_to_arrays(rows_between(hot, start_ts, end_ts))
+        return np.concatenate([part["t"], hot_times]), np.concatenate([values, hot_values])
+
+    def nearest(self, dt):
+        """回傳時間最接近 dt 的資料列"""
+        spilled, hot = self._snapshot()
+        candidates = []
+        if len(spilled):
+            i = int(np.searchsorted(spilled["t"], dt.timestamp()))
+            candidates += [self._from_record(spilled[j]) for j in (i - 1, i) if 0 <= j < len(spilled)]
+        if hot:
+            i = bisect.bisect_left(hot, dt, key=lambda r: r[0])
+            candidates += [hot[j] for j in (i - 1, i) if 0 <= j < len(hot)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda r: abs(r[0] - dt))
+
+    def memory_usage(self):
+        """記憶體內資料列數與估計大小 (以最後一筆的物件大小推算), 磁碟資料列數與檔案大小"""
+        with self._lock:
+            hot_rows = len(self._hot)
+            sample = self._hot[-1] if self._hot else None
+            spilled_rows = self._spill_count
+        row_bytes = 0
+        if sample is not None:
+            row_bytes = sys.getsizeof(sample) + sum(sys.getsizeof(v) for v in sample)
+            row_bytes += sum(sys.getsizeof(v) for values in sample[1:3] if values for v in values if v is not None)
+        return {"hot_rows": hot_rows, "hot_bytes": hot_rows * row_bytes,
+                "spilled_rows": spilled_rows, "spilled_bytes": spilled_rows * HISTORY_RECORD.itemsize}
+
+    def close(self, remove=True):
+        """關閉並刪除磁碟檔案"""
+        with self._lock:
+            if self._map is not None:
+                self._map.flush()
+            self._map = None
+        if remove:
+            try:
+                os.remove(self.spill_path)
+            except OSError:
+                pass
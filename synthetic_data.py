@@ -0,0 +1,257 @@
+# SAMPO RD2 LAB Data Collection - 合成測試資料產生器
+#-------------------------------------------------------------------------------
+# 以向量化方式產生與 collect_data 存檔完全相同格式的多日測試記錄, 供分析與效能測試使用:
+#   前言 (DateTime:, Model:), 標題 Date,Time,20個頻道別名,U(V),I(A),P(W),WP(Wh),GX20Seq, 資料列
+# 模型: 壓縮機 On/Off 周期 (每個周期長度隨機), 定時除霜 (加熱器功率, 冷凍室回溫後再降溫),
+#       熱電偶斷線 (空白欄位的連續區段, 以及少數 999.9), 未使用的頻道整欄空白, WP 單調遞增。
+# 數值文字與 csv.writer 寫入 round(溫度, 1) 等浮點數的結果相同; CSV 文字以查表與遮罩一次組出,
+# 不逐列呼叫 csv.writer。固定 seed 時結果可重現。
+#
+# 範例:
+#   python synthetic_data.py D:/synthetic --days 30 --stations 6 --seed 0
+#-------------------------------------------------------------------------------
+import argparse
+import functools
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+TEMP_CHANNELS = 20
+GX20_POLL_SECONDS = 5  # GX20 輪詢間隔, GX20Seq 約每 5 秒加 1
+RAW_INVALID = 999.9    # GX20 無效值
+
+
+def _segments(rng, n_seconds, mean_seconds, spread):
+    """長度隨機 (平均 mean_seconds, 相對標準差 spread, 最短 0.3 倍) 的連續區段邊界, 最後一個邊界 >= n_seconds"""
+    count = int(n_seconds / (mean_seconds * 0.3)) + 2
+    lengths = np.maximum(mean_seconds * (1 + spread * rng.standard_normal(count)), mean_seconds * 0.3)
+    starts = np.concatenate([[0.0], np.cumsum(lengths)])
+    return starts[:int(np.searchsorted(starts, n_seconds, side="left")) + 1]
+
+
+def generate_station(days, step=10, seed=0, start=None, unused_channels=2, dropouts_per_day=1.0, invalid_rate=1e-4):
+    """
+    產生單一工位的資料, 回傳 dict:
+      times (時間戳記, 整數秒), temps (N x 20, 斷線為 NaN, 無效值為 999.9), power (N x 4: U, I, P, WP), seq
+    """
+    rng = np.random.default_rng(seed)
+    start = start or datetime(2026, 1, 1)
+    n = int(days * 86400 // step)
+    elapsed = np.arange(n, dtype=np.float64) * step
+    times = start.timestamp() + elapsed
+
+    # 壓縮機: 交替的 On/Off 區段, 每個周期長度隨機
+    on_minutes = rng.uniform(12, 20)
+    off_minutes = rng.uniform(10, 18)
+    cycle = _segments(rng, elapsed[-1] + step, (on_minutes + off_minutes) * 60, 0.1)
+    on_fraction = on_minutes / (on_minutes + off_minutes)
+    index = np.searchsorted(cycle, elapsed, side="right") - 1
+    position = (elapsed - cycle[index]) / (cycle[index + 1] - cycle[index])
+    on = position < on_fraction
+    # 區段內的相位 0~1: On 時由高到低, Off 時由低到高
+    phase = np.where(on, position / on_fraction, (position - on_fraction) / (1 - on_fraction))
+    swing = np.where(on, 1 - phase, phase) - 0.5
+
+    # 除霜: 每 defrost_hours 小時一次, 加熱 defrost_minutes 分鐘, 期間壓縮機關閉; 之後冷凍室溫度指數回降
+    defrost_hours = rng.choice([6, 8, 12])
+    defrost_minutes = rng.uniform(15, 25)
+    first_defrost = rng.uniform(0.2, 1.0) * defrost_hours * 3600
+    since_defrost = (elapsed - first_defrost) % (defrost_hours * 3600)
+    since_defrost[elapsed < first_defrost] = np.inf
+    defrosting = since_defrost < defrost_minutes * 60
+    on &= ~defrosting
+    bump = np.where(defrosting, since_defrost / (defrost_minutes * 60),
+                    np.exp(-np.maximum(since_defrost - defrost_minutes * 60, 0) / 1200))
+
+    freezer_set = -20 + rng.uniform(-2, 2)
+    fridge_set = 3 + rng.uniform(-1, 1)
+    temps = np.empty((n, TEMP_CHANNELS))
+    half = TEMP_CHANNELS // 2
+    offsets = rng.uniform(-1, 1, TEMP_CHANNELS)
+    temps[:, :half] = freezer_set + 2.5 * swing[:, None] + 6 * bump[:, None] + offsets[:half]
+    temps[:, half:] = fridge_set + 1.2 * swing[:, None] + 1.5 * bump[:, None] + offsets[half:]
+    temps += rng.normal(0, 0.08, temps.shape)
+    temps = np.round(temps, 1)
+
+    # 熱電偶斷線: 各頻道隨機的空白區段 (1 分 ~ 2 小時), 少數單筆 999.9; 最後幾個頻道未使用
+    n_dropouts = rng.poisson(dropouts_per_day * days * TEMP_CHANNELS)
+    if n_dropouts:
+        channels = rng.integers(0, TEMP_CHANNELS, n_dropouts)
+        begins = rng.integers(0, n, n_dropouts)
+        lengths = (rng.uniform(60, 7200, n_dropouts) // step).astype(np.int64) + 1
+        marks = np.zeros((n + 1, TEMP_CHANNELS), dtype=np.int32)
+        np.add.at(marks, (begins, channels), 1)
+        np.add.at(marks, (np.minimum(begins + lengths, n), channels), -1)
+        temps[np.cumsum(marks[:-1], axis=0) > 0] = np.nan
+    temps[rng.random(temps.shape) < invalid_rate] = RAW_INVALID
+    if unused_channels:
+        temps[:, TEMP_CHANNELS - unused_channels:] = np.nan
+
+    # 電力: On 時壓縮機功率 (啟動瞬間較大), 除霜時加熱器, Off 時待機
+    on_power = rng.uniform(60, 110)
+    heater_power = rng.uniform(150, 220)
+    on_start = np.where(on, elapsed - cycle[index], 0)
+    power_w = np.where(on, on_power * (1 + 0.3 * np.exp(-on_start / 60)) + rng.normal(0, 0.5, n),
+                       np.where(defrosting, heater_power + rng.normal(0, 1.0, n), 0.8 + rng.normal(0, 0.05, n)))
+    power_w = np.round(np.maximum(power_w, 0), 2)
+    voltage = np.round(110 + 0.8 * np.sin(elapsed / 86400 * 2 * np.pi) + rng.normal(0, 0.2, n), 2)
+    current = np.round(np.where(power_w > 1, power_w / (voltage * 0.9), 0.01), 4)
+    wp = np.round(np.cumsum(power_w) * step / 3600, 4)
+    power = np.stack([voltage, current, power_w, wp], axis=1)
+    seq = (elapsed // GX20_POLL_SECONDS).astype(np.int64) + 1
+    return {"times": times, "temps": temps, "power": power, "seq": seq}
+
+
+def _table(strings):
+    """字串清單 -> L+1 x W uint8 查表, 不足寬度補 0; 最後一列全為 0, 以索引 -1 表示空白欄位"""
+    encoded = [s.encode("ascii") for s in strings] + [b""]
+    width = max(len(s) for s in encoded)
+    return np.frombuffer(b"".join(s.ljust(width, b"\0") for s in encoded), dtype=np.uint8).reshape(len(encoded), width)
+
+
+_SIGN_TABLE = _table(["-"])
+
+
+@functools.lru_cache(maxsize=None)
+def _group_table():
+    """0 ~ 9999 的文字, 接著是補 0 到 4 位的 0000 ~ 9999"""
+    return _table([str(v) for v in range(10000)] + [f"{v:04d}" for v in range(10000)])
+
+
+@functools.lru_cache(maxsize=None)
+def _fraction_table(digits):
+    """小數部分 0 ~ 10**digits-1 的文字查表, 去除多餘的 0 (.5000 -> .5, 0 -> .0)"""
+    return _table(["." + (f"{f:0{digits}d}".rstrip("0") or "0") for f in range(10 ** digits)])
+
+
+@functools.lru_cache(maxsize=None)
+def _time_table():
+    return _table([f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in range(86400)])
+
+
+def _integer_cells(values, keep=None):
+    """非負整數欄位, keep 為 False 的列空白; 每 4 位數一組查表, 較高的組為 0 時不輸出"""
+    keep = np.ones(len(values), dtype=bool) if keep is None else keep
+    high, low = np.divmod(values, 10000)
+    pieces = _integer_cells(high, keep & (high > 0)) if len(values) and high.max() > 0 else []
+    return pieces + [(_group_table(), np.where(keep, low + np.where(high > 0, 10000, 0), -1))]
+
+
+def _decimal_cells(values, digits):
+    """
+    與 csv.writer 寫入 round(v, digits) 相同的文字 (repr, 去除多餘的 0); NaN 為空白。
+    整數部分與小數部分分別查表後組合, 查表大小與資料筆數無關。
+    """
+    valid = ~np.isnan(values)
+    scaled = np.rint(np.where(valid, np.abs(values), 0) * 10 ** digits).astype(np.int64)
+    whole, fraction = np.divmod(scaled, 10 ** digits)
+    negative = (values < 0) & valid & (scaled > 0)
+    return [(_SIGN_TABLE, np.where(negative, 0, -1))] + _integer_cells(whole, valid) + \
+        [(_fraction_table(digits), np.where(valid, fraction, -1))]
+
+
+def _gather(pieces, n):
+    """
+    pieces 為 [(查表, 各列索引)] 或 bytes (每列相同的分隔符號), 依序組成 n 列 CSV 文字。
+    先把各欄填入 n x 總寬度 的 byte 矩陣 (不足寬度為 0), 再一次移除所有的 0。
+    """
+    widths = [len(piece) if isinstance(piece, bytes) else piece[0].shape[1] for piece in pieces]
+    out = np.empty((n, sum(widths)), dtype=np.uint8)
+    column = 0
+    for piece, width in zip(pieces, widths):
+        if isinstance(piece, bytes):
+            out[:, column:column + width] = np.frombuffer(piece, dtype=np.uint8)
+        else:
+            out[:, column:column + width] = piece[0][piece[1]]
+        column += width
+    return out.tobytes().replace(b"\0", b"")
+
+
+def _local_seconds(times):
+    """時間戳記 -> 本地時間的 epoch 秒 (與 datetime.fromtimestamp 相同); 時區偏移有變化時才逐筆計算"""
+    def offset(t):
+        return int((datetime.fromtimestamp(t) - datetime.fromtimestamp(t, timezone.utc).replace(tzinfo=None)).total_seconds())
+    seconds = times.astype(np.int64)
+    if offset(times[0]) == offset(times[-1]):
+        return seconds + offset(times[0])
+    return np.array([t + offset(t) for t in seconds.tolist()], dtype=np.int64)
+
+
+def csv_bytes(data, chunk_rows=100000):
+    """資料列的 CSV 文字 (不含前言與標題), 以 chunk_rows 為單位產生"""
+    times = data["times"]
+    time_table = _time_table()
+    for first in range(0, len(times), chunk_rows):
+        last = min(first + chunk_rows, len(times))
+        n = last - first
+        local = _local_seconds(times[first:last]).astype("datetime64[s]")
+        days = local.astype("datetime64[D]")
+        unique_days, day_index = np.unique(days, return_inverse=True)
+        day_table = _table([str(day) for day in unique_days])
+        second_of_day = (local - days).astype(np.int64)
+        pieces = [(day_table, day_index), b",", (time_table, second_of_day)]
+        for column in range(TEMP_CHANNELS):
+            pieces.append(b",")
+            pieces += _decimal_cells(data["temps"][first:last, column], 1)
+        for column, digits in enumerate((2, 4, 2, 4)):
+            pieces.append(b",")
+            pieces += _decimal_cells(data["power"][first:last, column], digits)
+        seq = data["seq"][first:last]
+        pieces += [b","] + _integer_cells(seq) + [b"\r\n"]
+        yield _gather(pieces, n)
+
+
+def write_csv(path, data, aliases=None, model="NA", preamble=True):
+    """寫入與 collect_data 相同格式的 CSV"""
+    aliases = aliases or [f"Ch{i + 1}" for i in range(TEMP_CHANNELS)]
+    start = datetime.fromtimestamp(data["times"][0])
+    header = ["Date", "Time"] + list(aliases) + ["U(V)", "I(A)", "P(W)", "WP(Wh)", "GX20Seq"]
+    with open(path, "wb") as f:
+        if preamble:
+            f.write(f"DateTime: {start:%Y%m%d_%H%M%S}\r\nModel: {model}\r\n".encode("utf-8"))
+        f.write((",".join(header) + "\r\n").encode("utf-8"))
+        for chunk in csv_bytes(data):
+            f.write(chunk)
+
+
+def generate_dataset(directory, days=30, stations=6, step=10, seed=0, start=None, model="NA",
+                     preamble=True):
+    """產生多個工位的測試記錄, 檔名為 {開始時間}_{工位}.csv, 回傳檔案路徑清單"""
+    os.makedirs(directory, exist_ok=True)
+    start = start or datetime(2026, 1, 1)
+    paths = []
+    for i in range(stations):
+        data = generate_station(days, step, seed * 100 + i, start)
+        half = TEMP_CHANNELS // 2
+        aliases = [f"F{k + 1}" for k in range(half)] + [f"R{k + 1}" for k in range(TEMP_CHANNELS - half)]
+        path = os.path.join(directory, f"{start:%Y%m%d_%H%M%S}_工位{i + 1}.csv")
+        write_csv(path, data, aliases, model, preamble)
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="產生合成的多日測試記錄 CSV")
+    parser.add_argument("directory", help="輸出目錄")
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--stations", type=int, default=6)
+    parser.add_argument("--step", type=int, default=10, help="取樣間隔 (秒)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", help="開始時間 YYYY-mm-dd HH:MM:SS (預設 2026-01-01 00:00:00)")
+    parser.add_argument("--model", default="NA", help="前言的 Model: 欄位")
+    parser.add_argument("--no-preamble", action="store_true", help="不寫 DateTime:/Model: 前言")
+    args = parser.parse_args(argv)
+    start = datetime.strptime(args.start, "%Y-%m-%d %H:%M:%S") if args.start else None
+    started = time.perf_counter()
+    paths = generate_dataset(args.directory, args.days, args.stations, args.step, args.seed, start, args.model,
+                             not args.no_preamble)
+    size = sum(os.path.getsize(p) for p in paths)
+    print(f"{len(paths)} 個檔案, {size / 1e6:.1f} MB, 耗時 {time.perf_counter() - started:.1f} 秒")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,9 @@
+# SAMPO RD2 LAB Data Collection - pytest 共用設定
+#-------------------------------------------------------------------------------
+# 模組都在專案根目錄, 測試時加入 sys.path; 圖表使用 Agg (不需顯示器)。
+#-------------------------------------------------------------------------------
+import os
+import sys
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
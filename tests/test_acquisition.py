@@ -0,0 +1,117 @@
+# SAMPO RD2 LAB Data Collection - 擷取行程: CSV 單一寫入端, GUI 結束時停止, 接續時由 CSV 補回日誌, PW3335 斷路器
+#-------------------------------------------------------------------------------
+import multiprocessing as mp
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import devices
+from acquisition_worker import AcquisitionClient, CsvWriterLock, csv_writer_active
+from csv_catalog import CatalogIndexer, read_rows
+from session_journal import SessionJournal
+from synthetic_data import generate_dataset
+
+
+def test_csv_writer_lock_single_writer(tmp_path):
+    file_name = os.path.join(str(tmp_path), "run.csv")
+    first, second = CsvWriterLock(file_name), CsvWriterLock(file_name)
+    assert first.acquire()
+    assert not second.acquire()
+    assert csv_writer_active(file_name)
+    first.release()
+    assert not csv_writer_active(file_name)
+    assert second.acquire()
+    second.release()
+    assert not os.path.exists(file_name + ".lock")
+
+
+def _gui_exits_while_recording(file_name, header):
+    """模擬 GUI: 啟動擷取行程與一個工位, 有資料後不關閉任何東西直接結束"""
+    client = AcquisitionClient(debug_mode=True)
+    client.start_station("工位1", file_name, header, 1, "127.0.0.2")
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline and client.write_count() < 2:
+        time.sleep(0.2)
+    os._exit(0)
+
+
+def test_worker_stops_when_gui_exits(tmp_path):
+    file_name = os.path.join(str(tmp_path), "20260101_000000_工位1.csv")
+    header = ["Date", "Time"] + [f"Ch{i}" for i in range(1, 21)] + ["U(V)", "I(A)", "P(W)", "WP(Wh)", "GX20Seq"]
+    gui = mp.get_context("spawn").Process(target=_gui_exits_while_recording, args=(file_name, header))
+    gui.start()
+    gui.join(timeout=60)
+    assert gui.exitcode == 0
+    assert len(list(read_rows(file_name))) >= 2
+    deadline = time.monotonic() + 20
+    while csv_writer_active(file_name) and time.monotonic() < deadline:
+        time.sleep(0.2)
+    assert not csv_writer_active(file_name)
+    size = os.path.getsize(file_name)
+    time.sleep(2.5)
+    assert os.path.getsize(file_name) == size
+
+
+def test_recover_csv_tail(tmp_path):
+    import GX20_PW3335 as app_module
+    path = generate_dataset(str(tmp_path), days=0.05, stations=1)[0]
+    rows = list(read_rows(path))
+    journal = SessionJournal.create(os.path.join(str(tmp_path), "journal"), "工位1", {"file_name": path})
+    for row in rows[:100]:
+        journal.append(row)
+    app = app_module.App.__new__(app_module.App)
+    app.catalog_indexer = CatalogIndexer()
+    assert app.recover_csv_tail(journal) == len(rows) - 100
+    assert journal.read_samples()["t"].tolist() == [row[0].timestamp() for row in rows]
+    assert app.recover_csv_tail(journal) == 0
+    journal.close(finished=True)
+
+
+def test_worker_modules_do_not_import_gui():
+    code = ("import sys\n"
+            "sys.modules.update(tkinter=None, matplotlib=None)\n"
+            "import acquisition_worker, devices\n"
+            "assert 'GX20_PW3335' not in sys.modules\n")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], cwd=root, check=True)
+
+
+class _Socket:
+    def sendall(self, data):
+        pass
+
+    def recv(self, size):
+        return b"U +110.14E+0;I +0.0000E+0;P +000.00E+0;WP +00.0000E+0"
+
+    def close(self):
+        pass
+
+
+def test_pw3335_breaker_open_logged_once(monkeypatch):
+    messages = []
+    monkeypatch.setattr(devices, "log_error", lambda message, **fields: messages.append(("error", message)))
+    monkeypatch.setattr(devices, "log_info", lambda message, **fields: messages.append(("info", message)))
+    online = False
+
+    def create_connection(address, timeout=None):
+        if not online:
+            raise ConnectionRefusedError("refused")
+        return _Socket()
+    monkeypatch.setattr(devices.socket, "create_connection", create_connection)
+    pw = devices.PW3335("127.0.0.9")
+    for _ in range(pw.breaker.failure_threshold):
+        with pytest.raises(OSError) as error:
+            pw.query_data()
+        assert not isinstance(error.value, devices.BreakerOpenError)
+    for _ in range(5):
+        with pytest.raises(devices.BreakerOpenError):
+            pw.query_data()
+    assert [level for level, _ in messages] == ["error"]
+    online = True
+    pw.breaker.reset_seconds = 0
+    assert pw.query_data() == [110.14, 0.0, 0.0, 0.0]
+    pw.query_data()
+    assert [level for level, _ in messages] == ["error", "info"]
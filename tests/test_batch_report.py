@@ -0,0 +1,30 @@
+# SAMPO RD2 LAB Data Collection - 批次報告: 行程池在沒有 tkinter/matplotlib 的主機上執行
+#-------------------------------------------------------------------------------
+import csv
+import os
+import subprocess
+import sys
+
+from synthetic_data import generate_dataset
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_batch_report_runs_without_gui_packages(tmp_path):
+    data_dir = os.path.join(str(tmp_path), "runs")
+    generate_dataset(data_dir, days=0.2, stations=2)
+    # 匯入即失敗的 tkinter/matplotlib, 經 PYTHONPATH 套用到所有子行程
+    blocked = os.path.join(str(tmp_path), "blocked")
+    for name in ("tkinter", "matplotlib"):
+        os.makedirs(os.path.join(blocked, name))
+        with open(os.path.join(blocked, name, "__init__.py"), "w") as f:
+            f.write(f"raise ImportError('{name} is not installed')\n")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([blocked, ROOT]))
+    output = os.path.join(str(tmp_path), "summary.csv")
+    subprocess.run([sys.executable, os.path.join(ROOT, "batch_report.py"), data_dir, "--vf", "150", "--vr", "350",
+                    "-j", "2", "-o", output], cwd=str(tmp_path), env=env, check=True, capture_output=True)
+    with open(output, newline="", encoding="utf-8-sig") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 2
+    assert [row["error"] for row in rows] == ["", ""]
+    assert all(row["EF值"] for row in rows)
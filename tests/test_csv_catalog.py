@@ -0,0 +1,71 @@
+# SAMPO RD2 LAB Data Collection - CSV 目錄: 稀疏索引 seek 與從檔頭解析結果一致
+#-------------------------------------------------------------------------------
+import os
+from datetime import timedelta
+
+import pytest
+
+from csv_catalog import INDEX_MINUTES, CatalogIndexer, CsvCatalog, index_file, read_chunks, read_rows
+from synthetic_data import generate_dataset
+
+
+@pytest.fixture()
+def recording(tmp_path):
+    path = generate_dataset(str(tmp_path), days=0.5, stations=1, model="SR-TEST")[0]
+    return path, list(read_rows(path))
+
+
+def test_entry_metadata(recording):
+    path, rows = recording
+    entry = index_file(path)
+    assert entry["station"] == "工位1"
+    assert entry["model"] == "SR-TEST"
+    assert entry["rows"] == len(rows)
+    assert entry["first"] == rows[0][0].timestamp()
+    assert entry["last"] == rows[-1][0].timestamp()
+    assert entry["aliases"][:2] == ["F1", "F2"]
+    # 每 INDEX_MINUTES 分鐘一筆
+    assert len(entry["index"]) == pytest.approx((rows[-1][0] - rows[0][0]).total_seconds() / (INDEX_MINUTES * 60), abs=2)
+
+
+def test_seek_matches_full_scan(recording):
+    path, rows = recording
+    entry = index_file(path)
+    start, end = rows[0][0] + timedelta(hours=3, seconds=5), rows[0][0] + timedelta(hours=7)
+    expected = [row for row in rows if start <= row[0] < end]
+    assert list(read_rows(path, start, end, entry)) == expected
+    assert list(read_rows(path, start, end)) == expected
+    times = [t for chunk in read_chunks(path, start, end, entry, chunk_rows=100) for t in chunk[0]]
+    assert times == [row[0].timestamp() for row in expected]
+
+
+def test_incremental_index_matches_rebuild(recording):
+    path, rows = recording
+    with open(path, "rb") as f:
+        data = f.read()
+    cut = data.index(b"\n", len(data) // 2) + 1
+    partial = path + ".part.csv"
+    with open(partial, "wb") as f:
+        f.write(data[:cut] + data[cut:cut + 20])  # 最後一行寫到一半
+    entry = index_file(partial)
+    with open(partial, "wb") as f:
+        f.write(data)
+    updated = index_file(partial, dict(entry, index=list(entry["index"])))
+    fresh = index_file(partial)
+    for key in ("rows", "first", "last", "index", "scanned"):
+        assert updated[key] == fresh[key]
+
+
+def test_catalog_refresh_and_indexer_join(recording, tmp_path):
+    path, rows = recording
+    catalog = CsvCatalog(str(tmp_path))
+    assert catalog.refresh()
+    assert catalog.entry_for(path)["rows"] == len(rows)
+    os.remove(path)
+    assert catalog.refresh()
+    indexer = CatalogIndexer(interval=0.01)
+    indexer.add_directory(str(tmp_path))
+    indexer.start()
+    indexer.stop()
+    indexer.join(timeout=5)
+    assert not indexer.is_alive()
@@ -0,0 +1,39 @@
+# SAMPO RD2 LAB Data Collection - EnergyCalculator: calculate_array 與 calculate 逐筆完全相同
+#-------------------------------------------------------------------------------
+import numpy as np
+
+from energy_calculator import EnergyCalculator
+
+
+def grid(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    VF = np.round(rng.uniform(0, 250, n), 1)
+    VF[::17] = 0  # 單門冷藏
+    VR = np.round(rng.uniform(50, 500, n), 1)
+    daily = np.round(rng.uniform(0.2, 2.5, n), 3)
+    daily[::29] = 0
+    freezer = np.round(rng.uniform(-24, -15, n), 1)
+    fridge = np.round(rng.uniform(0, 7, n), 1)
+    fan = rng.integers(0, 2, n)
+    return VF, VR, daily, freezer, fridge, fan
+
+
+def test_calculate_array_matches_scalar():
+    calculator = EnergyCalculator()
+    VF, VR, daily, freezer, fridge, fan = grid()
+    arrays = calculator.calculate_array(VF, VR, daily, freezer, fridge, fan)
+    for i in range(len(VF)):
+        scalar = calculator.calculate(float(VF[i]), float(VR[i]), float(daily[i]), float(freezer[i]),
+                                      float(fridge[i]), int(fan[i]))
+        for key, values in arrays.items():
+            assert values[i] == scalar[key], (i, key, values[i], scalar[key])
+
+
+def test_calculate_array_broadcasts_scalars():
+    calculator = EnergyCalculator()
+    daily = np.linspace(0.5, 1.5, 11)
+    arrays = calculator.calculate_array(120.0, 300.0, daily, -18.0, 3.0, 1)
+    assert arrays["EF值"].shape == daily.shape
+    scalar = calculator.calculate(120.0, 300.0, float(daily[4]), -18.0, 3.0, 1)
+    assert arrays["2027年效率等級"][4] == scalar["2027年效率等級"]
+    assert arrays["2018年一級效率百分比(%)"][4] == scalar["2018年一級效率百分比(%)"]
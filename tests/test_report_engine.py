@@ -0,0 +1,39 @@
+# SAMPO RD2 LAB Data Collection - 報告: CSV 分段讀取與記憶體路徑一致
+#-------------------------------------------------------------------------------
+import numpy as np
+import pytest
+
+from csv_catalog import index_file, read_rows
+from report_engine import report_from_arrays, report_from_csv
+from station_store import arrays_between
+from synthetic_data import generate_dataset
+
+
+@pytest.fixture(scope="module")
+def recording(tmp_path_factory):
+    path = generate_dataset(str(tmp_path_factory.mktemp("csv")), days=0.3, stations=1)[0]
+    return path, list(read_rows(path))
+
+
+def memory_report(rows, start, end, onoffthrottle=100):
+    """與 App.snapshot_report 相同: 統計範圍包含結束時間那一筆"""
+    times, values = arrays_between(rows, start.timestamp(), float(np.nextafter(end.timestamp(), np.inf)))
+    return report_from_arrays(times, values, start, end, onoffthrottle)
+
+
+@pytest.mark.parametrize("chunk_rows", [50000, 300, 7])
+def test_csv_report_matches_memory_report(recording, chunk_rows):
+    path, rows = recording
+    start, end = rows[100][0], rows[2000][0]  # 兩端都正好是資料列
+    expected = memory_report(rows, start, end)
+    for entry in (None, index_file(path)):
+        report = report_from_csv(path, start, end, 100, entry=entry, chunk_rows=chunk_rows)
+        assert report["rows"] == 1901
+        assert report == expected
+
+
+def test_csv_report_between_rows(recording):
+    path, rows = recording
+    start = rows[10][0] + (rows[11][0] - rows[10][0]) / 2
+    end = rows[500][0] + (rows[501][0] - rows[500][0]) / 2
+    assert report_from_csv(path, start, end, 100, entry=index_file(path)) == memory_report(rows, start, end)
@@ -0,0 +1,44 @@
+# SAMPO RD2 LAB Data Collection - 周期統計的 On/Off 時間與 REPORT 一致, 穩定判定的漂移與最小平方法一致
+#-------------------------------------------------------------------------------
+import numpy as np
+
+from csv_catalog import read_rows
+from report_engine import RollingSlope, report_from_arrays
+from signal_analysis import SteadyStateDetector, phase_statistics
+from station_store import arrays_between
+from synthetic_data import generate_dataset
+
+
+def test_phase_durations_match_report(tmp_path):
+    rows = list(read_rows(generate_dataset(str(tmp_path), days=0.5, stations=1)[0]))
+    start, end = rows[50][0], rows[-50][0]
+    times, values = arrays_between(rows, start.timestamp(), float(np.nextafter(end.timestamp(), np.inf)))
+    report = report_from_arrays(times, values, start, end, 100)
+    stats = phase_statistics(times, values, 100)
+    segments = stats["segments"]
+    assert (segments["seconds"] == segments["end"] - segments["start"]).all()
+    for state, key in ((True, "above_avg_time"), (False, "below_avg_time")):
+        summary = stats["states"][state]
+        assert summary["seconds"] / summary["segments"] / 60 == report[key]
+
+
+def test_steady_drift_matches_least_squares():
+    rng = np.random.default_rng(0)
+    times = 1.7e9 + np.arange(3000) * 10.0
+    temps = -18 + np.cumsum(rng.normal(0, 0.01, (3000, 3)), axis=0)
+    temps[rng.random((3000, 3)) < 0.05] = np.nan
+    window = 3600
+    detector = SteadyStateDetector(window, 0.25, channels=3)
+    scalar = RollingSlope(window)
+    for t, y in zip(times.tolist(), temps.tolist()):
+        detector.add(t, y)
+        scalar.add(t, y[0])
+    in_window = times >= times[-1] - window
+    expected = [np.polyfit(times[in_window & ~np.isnan(temps[:, ch])], temps[in_window & ~np.isnan(temps[:, ch]), ch], 1)[0]
+                for ch in range(3)]
+    np.testing.assert_allclose(detector.drift(), np.array(expected) * 3600, rtol=1e-6)
+    assert np.isclose(scalar.slope(), detector.regression.slope()[0], rtol=1e-9)
+    bulk = RollingSlope(window, 3)
+    bulk.extend(times, temps)
+    np.testing.assert_allclose(bulk.slope(), detector.regression.slope(), rtol=1e-9)
+    assert bulk.span() == detector.span() == window
@@ -0,0 +1,54 @@
+# SAMPO RD2 LAB Data Collection - StationHistory: 記憶體與磁碟 (memmap) 兩部分的查詢結果一致
+#-------------------------------------------------------------------------------
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import station_store
+from station_store import StationHistory, count_between, rows_between
+
+START = datetime(2026, 1, 1)
+
+
+def make_row(n):
+    return [START + timedelta(seconds=10 * n), [float(n % 7)] * 20, [110.0, 1.0, 50.0, n / 360], n]
+
+
+@pytest.fixture()
+def history(tmp_path):
+    history = StationHistory(os.path.join(str(tmp_path), "spill.bin"), hot_window=600)
+    yield history
+    history.close()
+
+
+def test_count_between_matches_rows_between(history):
+    rows = [make_row(n) for n in range(500)]
+    for row in rows:
+        history.append(row)
+    assert history.memory_usage()["spilled_rows"] > 0
+    ts = [row[0].timestamp() for row in rows]
+    for start_ts, end_ts in ((ts[0], ts[-1]), (ts[10] + 1, ts[450]), (ts[480], ts[-1] + 1), (ts[-1] + 5, ts[-1] + 50)):
+        expected = len(rows_between(rows, start_ts, end_ts))
+        assert count_between(rows, start_ts, end_ts) == expected
+        assert count_between(history, start_ts, end_ts) == expected
+        assert len(rows_between(history, start_ts, end_ts)) == expected
+
+
+def test_spill_map_reused_until_capacity_grows(history, monkeypatch):
+    monkeypatch.setattr(station_store, "SPILL_CHUNK_ROWS", 64)
+    rows = [make_row(n) for n in range(300)]
+    maps = []
+    for row in rows:
+        history.append(row)
+        if history._map is not None and (not maps or maps[-1] is not history._map):
+            maps.append(history._map)
+    spilled = history.memory_usage()["spilled_rows"]
+    # 每 64 筆才重新對應一次
+    assert len(maps) == -(-spilled // 64)
+    assert os.path.getsize(history.spill_path) == len(history._map) * station_store.HISTORY_RECORD.itemsize
+    assert list(history) == rows
+    view = history._spilled()
+    assert not view.flags.writeable
+    np.testing.assert_array_equal(view["gx20_seq"], np.arange(spilled))
@@ -0,0 +1,116 @@
+# SAMPO RD2 LAB Data Collection - UI 批次更新: 只更新有變化的標籤, 隱藏頁面略過, 同周期合併為一次 after
+#-------------------------------------------------------------------------------
+import threading
+
+import pytest
+
+import benchmark
+
+
+class _DeferredRoot:
+    """after 只排入佇列, 由測試在 "主執行緒" 執行"""
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, func, *args):
+        self.pending.append((func, args))
+
+    def run(self):
+        pending, self.pending = self.pending, []
+        for func, args in pending:
+            func(*args)
+
+
+class _Notebook:
+    def __init__(self, selected):
+        self.selected = selected
+
+    def select(self):
+        return self.selected
+
+
+class _Label:
+    def __init__(self):
+        self.configs = 0
+
+    def config(self, **kwargs):
+        self.configs += 1
+        self.text = kwargs["text"]
+
+
+@pytest.fixture()
+def app(tmp_path):
+    app, history = benchmark.bench_app(0.05, str(tmp_path))
+    app.root = _DeferredRoot()
+    yield app
+    history.close()
+
+
+def show_station(app, visible):
+    """工位1 的圖表頁面顯示/隱藏"""
+    station = benchmark.STATION
+    app.frames = {station: "frame"}
+    app.notebook = _Notebook("frame" if visible else "other")
+    setattr(app, f"{station}_station_notebook", _Notebook("plot"))
+    setattr(app, f"{station}_plot_frame", "plot")
+
+
+def test_benchmark_dataset_smoke(tmp_path):
+    results = benchmark.run_dataset(0.05, 1, str(tmp_path))
+    assert "update_plot[30min]@0.05d" in results
+    assert all(value["min"] > 0 for value in results.values())
+
+
+def test_requests_coalesce_into_one_after(app):
+    station = benchmark.STATION
+    show_station(app, True)
+    calls = []
+    app.update_plot = lambda frame, station_name, active_ch_list=None: calls.append(station_name)
+    threads = [threading.Thread(target=app.request_ui_flush, args=(station,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    app.request_ui_flush()
+    assert len(app.root.pending) == 1
+    app.root.run()
+    assert calls == [station]
+    assert not app.ui_flush_pending and not app.dirty_stations
+
+
+def test_only_changed_labels_configured(app):
+    station = benchmark.STATION
+    show_station(app, True)
+    channels = app.gx20_instance.channel_number[station]
+    labels = {channel: _Label() for channel in channels}
+    app.plot_channel_labels[station] = labels
+    texts = [f"{i}.0" for i in range(len(channels))]
+    app.live_temps = {station: texts}
+    app.request_ui_flush()
+    app.root.run()
+    assert all(label.configs == 1 for label in labels.values())
+
+    app.live_temps = {station: texts[:1] + texts[1:]}
+    app.live_temps[station][0] = "99.9"
+    app.request_ui_flush()
+    app.root.run()
+    assert labels[channels[0]].configs == 2 and labels[channels[0]].text == "99.9"
+    assert all(labels[channel].configs == 1 for channel in channels[1:])
+
+
+def test_hidden_station_skipped(app):
+    station = benchmark.STATION
+    show_station(app, False)
+    calls = []
+    app.update_plot = lambda frame, station_name, active_ch_list=None: calls.append(station_name)
+    labels = {channel: _Label() for channel in app.gx20_instance.channel_number[station]}
+    app.plot_channel_labels[station] = labels
+    app.live_temps = {station: ["1.0"] * len(labels)}
+    app.request_ui_flush(station)
+    app.root.run()
+    assert calls == []
+    assert all(label.configs == 0 for label in labels.values())
+    # 切換到該頁面時補上
+    app.notebook.selected = "frame"
+    app.on_tab_changed()
+    assert all(label.configs == 1 for label in labels.values())